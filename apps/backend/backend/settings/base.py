@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import logging.config
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -140,6 +141,25 @@ CELERY_RESULT_BACKEND = os.environ.get(
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 
+# Per-part line/page plans reused across formatting runs (mscz_formatter).
+LAYOUT_PLAN_CACHE_DIR = os.environ.get(
+    "LAYOUT_PLAN_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "divisi-layout-plans"),
+)
+# Set to share plans across workers through Redis (e.g. redis://localhost:6379/2);
+# otherwise each host keeps its own LAYOUT_PLAN_CACHE_DIR.
+LAYOUT_PLAN_CACHE_URL = os.environ.get("LAYOUT_PLAN_CACHE_URL", "")
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+if LAYOUT_PLAN_CACHE_URL:
+    CACHES["layout_plans"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": LAYOUT_PLAN_CACHE_URL,
+        "TIMEOUT": 60 * 60 * 24 * 30,
+    }
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -0,0 +1,68 @@
+"""Forward mscz_formatter stage metrics to the processing log."""
+
+from logging import getLogger
+
+from mscz_formatter.mscz.metrics import MetricsRecorder
+
+LOGGER = getLogger("divisi_processing")
+
+_STAGES = ("unpack", "styles", "metadata", "layout", "write", "repack")
+_PART_STAGES = ("plan_lookup", "load", "lines", "pages", "apply")
+
+
+def _part_seconds(values: dict[str, float]) -> float:
+    return sum(values.get(stage, 0.0) for stage in _PART_STAGES)
+
+
+def log_format_metrics(recorder: MetricsRecorder, input_key: str) -> None:
+    """
+    Log one summary line per formatted file and one line per part, slowest
+    part first. The full breakdown is attached as ``extra["format_metrics"]``
+    for structured log handlers.
+    """
+    stages = {
+        m.name: m.value
+        for m in recorder.metrics
+        if m.part is None and m.kind == "timing"
+    }
+    counts = {
+        m.name: m.value
+        for m in recorder.metrics
+        if m.part is None and m.kind == "count"
+    }
+    parts = recorder.parts()
+
+    LOGGER.info(
+        "Formatted %s in %.3fs (%s; %d part(s), %d bytes)",
+        input_key,
+        stages.get("total", 0.0),
+        ", ".join(f"{s}={stages[s]:.3f}s" for s in _STAGES if s in stages),
+        int(counts.get("parts", 0)),
+        int(counts.get("output_bytes", 0)),
+        extra={
+            "format_metrics": {
+                "input_key": input_key,
+                "stages": stages,
+                "counts": counts,
+                "parts": parts,
+            }
+        },
+    )
+    for part, values in sorted(
+        parts.items(), key=lambda item: _part_seconds(item[1]), reverse=True
+    ):
+        LOGGER.info(
+            "  part %s: %.3fs (%s) measures=%d lines=%d pages=%d "
+            "line_dp_candidates=%d page_dp_groups=%d cache_hit=%s",
+            part,
+            _part_seconds(values),
+            ", ".join(
+                f"{s}={values[s]:.3f}s" for s in _PART_STAGES if s in values
+            ),
+            int(values.get("measure_count", 0)),
+            int(values.get("line_count", 0)),
+            int(values.get("page_count", 0)),
+            int(values.get("line_dp_candidates", 0)),
+            int(values.get("page_dp_groups", 0)),
+            bool(values.get("plan_cache_hit")),
+        )
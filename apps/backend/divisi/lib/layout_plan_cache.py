@@ -0,0 +1,53 @@
+"""mscz_formatter layout-plan caches backed by Django settings."""
+
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import caches
+from mscz_formatter.mscz.plan_cache import DirectoryPlanCache, PlanCache
+
+LOGGER = getLogger("divisi_processing")
+
+LAYOUT_PLAN_CACHE_ALIAS = "layout_plans"
+
+
+class DjangoPlanCache(PlanCache):
+    """
+    Plan store on a Django cache (Redis in production).
+
+    Eviction is the cache backend's job: Redis with ``allkeys-lru`` or
+    Django's ``MAX_ENTRIES`` culling keeps it size-bounded. Only the alias is
+    pickled, so instances can be handed to mscz_formatter worker processes.
+
+    Cache errors (e.g. a Redis timeout) are logged and treated as a miss or a
+    skipped store, so an unavailable cache never fails a format.
+    """
+
+    def __init__(self, alias: str = LAYOUT_PLAN_CACHE_ALIAS, timeout: int | None = None):
+        super().__init__()
+        self.alias = alias
+        self.timeout = timeout
+
+    def _key(self, key: str) -> str:
+        return f"mscz-plan:{key}"
+
+    def _load(self, key: str) -> str | None:
+        try:
+            return caches[self.alias].get(self._key(key))
+        except Exception:
+            # Each backend raises its own client's errors (redis, pymemcache, ...).
+            LOGGER.warning("Could not read layout plan %s from cache", key, exc_info=True)
+            return None
+
+    def _store(self, key: str, text: str) -> None:
+        try:
+            caches[self.alias].set(self._key(key), text, timeout=self.timeout)
+        except Exception:
+            LOGGER.warning("Could not store layout plan %s in cache", key, exc_info=True)
+
+
+def get_layout_plan_cache() -> PlanCache:
+    """The shared Django cache when configured, else a local plan directory."""
+    if LAYOUT_PLAN_CACHE_ALIAS in settings.CACHES:
+        return DjangoPlanCache()
+    return DirectoryPlanCache(settings.LAYOUT_PLAN_CACHE_DIR)
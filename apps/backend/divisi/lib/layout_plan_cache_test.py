@@ -0,0 +1,41 @@
+"""Tests for the Django-backed layout plan cache"""
+
+from unittest.mock import MagicMock, patch
+
+from mscz_formatter.mscx.plan import PagePlan
+
+from divisi.lib.layout_plan_cache import DjangoPlanCache
+
+PLAN = (PagePlan(line_breaks=((3,), (7,))),)
+
+
+@patch("divisi.lib.layout_plan_cache.caches")
+def test_cache_errors_are_a_miss_and_a_skipped_store(mock_caches):
+    """A failing cache backend must not fail the format"""
+    backend = MagicMock()
+    backend.get.side_effect = ConnectionError("Connection refused")
+    backend.set.side_effect = TimeoutError("Timeout reading from socket")
+    mock_caches.__getitem__.return_value = backend
+    cache = DjangoPlanCache()
+
+    cache.put("key", PLAN)
+
+    assert cache.get("key") is None
+    assert cache.stats() == {"hits": 0, "misses": 1}
+    backend.set.assert_called_once()
+
+
+@patch("divisi.lib.layout_plan_cache.caches")
+def test_round_trip_through_django_cache(mock_caches):
+    """Plans are stored as JSON text under a namespaced key"""
+    store = {}
+    backend = MagicMock()
+    backend.get.side_effect = store.get
+    backend.set.side_effect = lambda key, value, timeout=None: store.__setitem__(key, value)
+    mock_caches.__getitem__.return_value = backend
+    cache = DjangoPlanCache()
+
+    cache.put("key", PLAN)
+
+    assert list(store) == ["mscz-plan:key"]
+    assert cache.get("key") == PLAN
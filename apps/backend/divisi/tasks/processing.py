@@ -7,7 +7,10 @@ from celery import shared_task
 from django.core.files import File
 from django.core.files.storage import default_storage
 from mscz_formatter.mscz.format import format_mscz
+from mscz_formatter.mscz.metrics import MetricsRecorder
 
+from divisi.lib.format_metrics import log_format_metrics
+from divisi.lib.layout_plan_cache import get_layout_plan_cache
 from divisi.lib.musescore_headless import export_all_mpos
 from divisi.models import UploadSession
 from ensembles.formatting_steps_constants import normalize_formatting_steps
@@ -84,7 +87,17 @@ def _format_mscz_file(
                 }
             LOGGER.info("Exported %d part .mpos file(s)", len(part_mpos))
 
-        success = format_mscz(tmp_in_path, tmp_out_path, part_mpos, v2_params)
+        # Unchanged parts (same measures + .mpos) reuse their previous plan.
+        metrics = MetricsRecorder()
+        success = format_mscz(
+            tmp_in_path,
+            tmp_out_path,
+            part_mpos,
+            v2_params,
+            plan_cache=get_layout_plan_cache(),
+            metrics=metrics,
+        )
+        log_format_metrics(metrics, input_key)
 
         if success is False:
             LOGGER.error("Error from mscz_formatter (part-formatter-v2)")
@@ -3,19 +3,18 @@
 from __future__ import annotations
 
 import logging
-import xml.etree.ElementTree as ET
 from collections import deque
 from copy import deepcopy
 from dataclasses import dataclass
 from enum import Enum
 
 from .utils import (
-    _hash_measure,
+    MeasureHashes,
     _make_cutaway,
     _make_placeholder_staff,
-    _sanitize_measure,
     get_parts_staff_elements,
 )
+from .xml_backend import ET
 
 logger = logging.getLogger(__name__)
 
@@ -73,29 +72,31 @@ class StaffAlignment:
         ]
 
 
-def _staff_fingerprint(staff: ET.Element) -> str:
-    hashes: list[str] = []
-    for measure in staff.findall("Measure")[:_RENAME_FINGERPRINT_MEASURES]:
-        hashes.append(_hash_measure(_sanitize_measure(measure)))
-    return "|".join(hashes) if hashes else ""
+def _staff_fingerprint(staff: ET.Element, hashes: MeasureHashes) -> str:
+    measures = staff.findall("Measure")[:_RENAME_FINGERPRINT_MEASURES]
+    return "|".join(hashes.of(measure) for measure in measures)
 
 
-def _part_fingerprint(staves: list[ET.Element]) -> str:
-    return "::".join(_staff_fingerprint(s) for s in staves)
+def _part_fingerprint(staves: list[ET.Element], hashes: MeasureHashes) -> str:
+    return "::".join(_staff_fingerprint(s, hashes) for s in staves)
 
 
 def _make_staff_key(part_name: str, staff_index: int) -> StaffKey:
     return StaffKey(part_name=part_name, staff_index=staff_index)
 
 
-def align_staves(score1: ET.Element, score2: ET.Element) -> StaffAlignment:
+def align_staves(
+    score1: ET.Element, score2: ET.Element, *, hashes: MeasureHashes | None = None
+) -> StaffAlignment:
     """
     Align parts and staves between two scores.
 
     score1 is the reference (left). Parts match on ``<trackName>`` first; unmatched
     parts may pair via content fingerprint (rename heuristic). Staves within a matched
     part pair in order; extra staves become ``LEFT_ONLY`` / ``RIGHT_ONLY`` rows.
+    Pass the run's ``hashes`` to share measure hashes with the diff that follows.
     """
+    hashes = hashes if hashes is not None else MeasureHashes()
     parts1 = get_parts_staff_elements(score1)
     parts2 = get_parts_staff_elements(score2)
 
@@ -124,13 +125,13 @@ def align_staves(score1: ET.Element, score2: ET.Element) -> StaffAlignment:
     used2: set[int] = set()
     rename_pairings: list[tuple[int, int]] = []
     for idx1 in list(unmatched1):
-        fp1 = _part_fingerprint(parts1[idx1][1])
+        fp1 = _part_fingerprint(parts1[idx1][1], hashes)
         if not fp1:
             continue
         for idx2 in unmatched2:
             if idx2 in used2:
                 continue
-            fp2 = _part_fingerprint(parts2[idx2][1])
+            fp2 = _part_fingerprint(parts2[idx2][1], hashes)
             if fp1 == fp2:
                 rename_pairings.append((idx1, idx2))
                 used2.add(idx2)
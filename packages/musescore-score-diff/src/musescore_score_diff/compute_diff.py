@@ -1,9 +1,18 @@
+import multiprocessing
+import os
 from collections import defaultdict
+from collections.abc import Hashable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
 
-import xml.etree.ElementTree as ET
 
-from .alignment import RowKind, StaffAlignment, align_staves
-from .utils import State, extract_measures
+from .alignment import AlignmentRow, RowKind, StaffAlignment, align_staves
+from .utils import MeasureHashes, State, _hash_measure, extract_measures
+from .xml_backend import ET, parse
+
+# Below this many measures (both sides, matched staves) a worker pool costs
+# more to start and feed than the diff itself.
+PARALLEL_MIN_MEASURES = 4000
 
 
 def _pair_staves(score1: ET.Element, score2: ET.Element) -> list[tuple[ET.Element, ET.Element]]:
@@ -11,37 +20,79 @@ def _pair_staves(score1: ET.Element, score2: ET.Element) -> list[tuple[ET.Elemen
     return align_staves(score1, score2).matched_pairs()
 
 
-def lcs(seq1: list[str], seq2: list[str]) -> list[list[int]]:
-    """Compute LCS DP table."""
+def _lcs_rows(seq1: Sequence[Hashable], seq2: Sequence[Hashable]) -> list[int]:
+    """
+    Bit-parallel LCS table (Allison–Dix / Hyyrö), one int per row.
+
+    Bit ``j`` of ``rows[i]`` is clear when ``L[i][j + 1] == L[i][j] + 1``, so
+    ``L[i][j]`` is the number of clear bits below ``j``. Each row costs a few
+    big-int operations instead of ``len(seq2)`` Python steps.
+    """
+    full = (1 << len(seq2)) - 1
+    matches: dict[Hashable, int] = {}
+    for j, h in enumerate(seq2):
+        matches[h] = matches.get(h, 0) | (1 << j)
+
+    row = full
+    rows = [row]
+    for h in seq1:
+        u = row & matches.get(h, 0)
+        row = ((row + u) | (row - u)) & full
+        rows.append(row)
+    return rows
+
+
+def diff_sequences(seq1: Sequence[Hashable], seq2: Sequence[Hashable]) -> list[State]:
+    """
+    Ordered edit script (left-to-right) turning per-bar keys ``seq1`` into ``seq2``
+    (measure hashes, or tuples of them for a whole part).
+
+    Walks back from the end of both sequences: equal hashes are UNCHANGED,
+    different hashes at the same measure number are MODIFIED, otherwise an
+    INSERTED / REMOVED step that keeps the longest common subsequence (INSERTED
+    on ties).
+
+    Equal lengths never leave the diagonal, so they are compared bar by bar.
+    Otherwise only the part between the common prefix and suffix gets an LCS
+    table: the suffix is matched before the walk reaches the middle, and within
+    the prefix ``L[i][j]`` is just ``min(i, j)``. A one-bar insert costs O(n).
+    """
     n, m = len(seq1), len(seq2)
-    L = [[0] * (m + 1) for _ in range(n + 1)]
-    for i in range(n):
-        for j in range(m):
-            if seq1[i] == seq2[j]:
-                L[i + 1][j + 1] = L[i][j] + 1
-            else:
-                L[i + 1][j + 1] = max(L[i][j + 1], L[i + 1][j])
-    return L
-
-
-def backtrack(L: list[list[int]], measures1, measures2) -> list[State]:
-    """Backtrack through LCS to reconstruct an ordered edit script (left-to-right)."""
-    ops: list[State] = []
-    i, j = len(measures1), len(measures2)
+    if n == m:
+        return [State.UNCHANGED if a == b else State.MODIFIED for a, b in zip(seq1, seq2)]
 
+    limit = min(n, m)
+    prefix = 0
+    while prefix < limit and seq1[prefix] == seq2[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and seq1[n - 1 - suffix] == seq2[m - 1 - suffix]:
+        suffix += 1
+
+    rows = _lcs_rows(seq1[prefix : n - suffix], seq2[prefix : m - suffix])
+
+    def lcs_at(i: int, j: int) -> int:
+        """``L[i][j]``: LCS length of ``seq1[:i]`` and ``seq2[:j]``."""
+        if i <= prefix or j <= prefix:
+            return min(i, j)
+        j -= prefix
+        return prefix + j - (rows[i - prefix] & ((1 << j) - 1)).bit_count()
+
+    ops: list[State] = []
+    i, j = n, m
     while i > 0 or j > 0:
-        if i > 0 and j > 0 and measures1[i - 1][1] == measures2[j - 1][1]:
+        if i > 0 and j > 0 and seq1[i - 1] == seq2[j - 1]:
             ops.append(State.UNCHANGED)
             i -= 1
             j -= 1
-        elif i > 0 and j > 0 and measures1[i - 1][0] == measures2[j - 1][0]:
+        elif i == j:
             ops.append(State.MODIFIED)
             i -= 1
             j -= 1
-        elif j > 0 and (i == 0 or L[i][j - 1] >= L[i - 1][j]):
+        elif j > 0 and (i == 0 or lcs_at(i, j - 1) >= lcs_at(i - 1, j)):
             ops.append(State.INSERTED)
             j -= 1
-        elif i > 0 and (j == 0 or L[i][j - 1] < L[i - 1][j]):
+        else:
             ops.append(State.REMOVED)
             i -= 1
 
@@ -49,18 +100,21 @@ def backtrack(L: list[list[int]], measures1, measures2) -> list[State]:
     return ops
 
 
-def _measure_diff_ops(staff1: ET.Element, staff2: ET.Element) -> list[State]:
-    measures1, measures2 = extract_measures(staff1), extract_measures(staff2)
-    seq1 = [h for (_, h, _) in measures1]
-    seq2 = [h for (_, h, _) in measures2]
-    L = lcs(seq1, seq2)
-    return backtrack(L, measures1, measures2)
+def _staff_hashes(staff: ET.Element | None, hashes: MeasureHashes | None) -> list[str]:
+    assert staff is not None
+    return [h for (_, h, _) in extract_measures(staff, hashes)]
+
+
+def _measure_diff_ops(
+    staff1: ET.Element, staff2: ET.Element, hashes: MeasureHashes | None = None
+) -> list[State]:
+    return diff_sequences(_staff_hashes(staff1, hashes), _staff_hashes(staff2, hashes))
 
 
-def _ops_for_row(row) -> list[State]:
+def _ops_for_row(row, hashes: MeasureHashes | None = None) -> list[State]:
     if row.kind in (RowKind.MATCHED, RowKind.RENAMED):
         assert row.staff_left is not None and row.staff_right is not None
-        return _measure_diff_ops(row.staff_left, row.staff_right)
+        return _measure_diff_ops(row.staff_left, row.staff_right, hashes)
     if row.kind == RowKind.LEFT_ONLY:
         assert row.staff_left is not None
         n = len(row.staff_left.findall("Measure"))
@@ -72,49 +126,111 @@ def _ops_for_row(row) -> list[State]:
     raise ValueError(f"Unknown alignment row kind: {row.kind}")
 
 
-def _synchronize_ops_across_part_staves(
-    alignment: StaffAlignment, diffs: dict[int, list[State]]
-) -> None:
+def _part_ops_from_hashes(
+    left: list[list[str]], right: list[list[str]]
+) -> list[list[State]]:
     """
-    Align INSERTED/REMOVED steps across staves in the same part.
+    Edit scripts for the matched staves of one part (one hash list per staff and
+    side), diffed once on a combined per-bar key: the tuple of every staff's
+    measure hash for that bar.
 
-    Per-staff LCS can place insert/delete at different indices; bar lines must line
-    up in the score. MODIFIED vs UNCHANGED stays per staff (bass may be unchanged
-    while treble differs).
+    INSERTED/REMOVED land on the same bar in every staff, since bar lines must
+    line up in the score. MODIFIED vs UNCHANGED stays per staff (bass may be
+    unchanged while treble differs).
     """
-    groups: dict[int, list[tuple[int, AlignmentRow]]] = defaultdict(list)
-    for pair_id, row in enumerate(alignment.rows, start=1):
-        if row.kind not in (RowKind.MATCHED, RowKind.RENAMED):
-            continue
-        if row.part_index_left is None:
-            continue
-        groups[row.part_index_left].append((pair_id, row))
-
-    for members in groups.values():
-        if len(members) < 2:
-            continue
-        ref_pid, ref_row = members[0]
-        assert ref_row.staff_left is not None and ref_row.staff_right is not None
-        structural = _measure_diff_ops(ref_row.staff_left, ref_row.staff_right)
-
-        for pair_id, row in members:
-            own = diffs[pair_id]
-            synced: list[State] = []
-            for step, struct in enumerate(structural):
-                if struct in (State.INSERTED, State.REMOVED):
-                    synced.append(struct)
-                elif step < len(own) and own[step] in (State.INSERTED, State.REMOVED):
-                    # Per-staff LCS mis-placed insert/delete; keep bar alignment only.
-                    synced.append(State.UNCHANGED)
-                elif step < len(own):
-                    synced.append(own[step])
-                else:
-                    synced.append(State.UNCHANGED)
-            diffs[pair_id] = synced
+    bars_left = list(zip_longest(*left))
+    bars_right = list(zip_longest(*right))
+
+    per_staff: list[list[State]] = [[] for _ in left]
+    i = j = 0
+    for op in diff_sequences(bars_left, bars_right):
+        if op == State.INSERTED:
+            j += 1
+            for ops in per_staff:
+                ops.append(op)
+        elif op == State.REMOVED:
+            i += 1
+            for ops in per_staff:
+                ops.append(op)
+        else:
+            for ops, left_hash, right_hash in zip(per_staff, bars_left[i], bars_right[j]):
+                ops.append(State.UNCHANGED if left_hash == right_hash else State.MODIFIED)
+            i += 1
+            j += 1
+    return per_staff
+
+
+def _part_diff_ops(
+    rows: list[AlignmentRow], hashes: MeasureHashes | None = None
+) -> list[list[State]]:
+    """``_part_ops_from_hashes`` for the aligned rows of one part."""
+    return _part_ops_from_hashes(
+        [_staff_hashes(row.staff_left, hashes) for row in rows],
+        [_staff_hashes(row.staff_right, hashes) for row in rows],
+    )
+
+
+# Staves a fork-started diff worker inherited from its parent (see ``_init_diff_worker``).
+_worker_staves: list[ET.Element] = []
+
+
+def _init_diff_worker(staves: list[ET.Element]) -> None:
+    global _worker_staves
+    _worker_staves = staves
+
+
+def _diff_part_in_worker(
+    left: list[int], right: list[int]
+) -> tuple[list[list[str]], list[list[str]], list[list[State]]]:
+    """
+    Hash and diff one part from staff indices into ``_worker_staves``. Returns
+    the hash lists too, for the parent's memo.
+    """
+    left_hashes = [[_hash_measure(m) for m in _worker_staves[i].findall("Measure")] for i in left]
+    right_hashes = [
+        [_hash_measure(m) for m in _worker_staves[i].findall("Measure")] for i in right
+    ]
+    return left_hashes, right_hashes, _part_ops_from_hashes(left_hashes, right_hashes)
+
+
+def _diff_parts_in_pool(
+    parts: list[list[AlignmentRow]], hashes: MeasureHashes, workers: int
+) -> list[list[list[State]]]:
+    """
+    ``_part_diff_ops`` for every part across fork-started worker processes, in
+    ``parts`` order.
+
+    Workers inherit the parsed staves when they fork and get only staff indices
+    per part; serializing staves for them would cost more than hashing does.
+    The hash lists they send back are recorded in ``hashes``.
+    """
+    staves: list[ET.Element] = []
+    jobs: list[tuple[list[int], list[int]]] = []
+    for rows in parts:
+        left = list(range(len(staves), len(staves) + len(rows)))
+        staves.extend(row.staff_left for row in rows)
+        right = list(range(len(staves), len(staves) + len(rows)))
+        staves.extend(row.staff_right for row in rows)
+        jobs.append((left, right))
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_diff_worker,
+        initargs=(staves,),
+    ) as pool:
+        results = list(pool.map(_diff_part_in_worker, *zip(*jobs)))
+
+    part_ops: list[list[list[State]]] = []
+    for (left, right), (left_hashes, right_hashes, ops) in zip(jobs, results):
+        for i, values in zip(left + right, left_hashes + right_hashes):
+            hashes.update(staves[i].findall("Measure"), values)
+        part_ops.append(ops)
+    return part_ops
 
 
 def _load_score(path: str) -> ET.Element:
-    tree = ET.parse(path)
+    tree = parse(path)
     score = tree.getroot().find("Score")
     if score is None:
         raise ValueError("No <Score> tag found in the XML.")
@@ -122,31 +238,85 @@ def _load_score(path: str) -> ET.Element:
 
 
 def compute_diff_with_alignment(
-    file1: str, file2: str
+    file1: str,
+    file2: str,
+    *,
+    hashes: MeasureHashes | None = None,
+    max_workers: int | None = 1,
 ) -> tuple[dict[int, list[State]], StaffAlignment]:
     """
     Compare two MuseScore files staff-by-staff.
 
     Returns ``(diffs, alignment)`` where ``diffs`` maps 1-based pair index (union
-    display order) to measure edit states.
+    display order) to measure edit states. Matched staves are diffed a part at a
+    time (see ``_part_diff_ops``). Alignment and every edit script share one
+    ``MeasureHashes`` memo (``hashes``, or a fresh one).
+
+    ``max_workers`` other than 1 hashes and diffs parts across that many worker
+    processes (``None`` = one per CPU) once the matched staves hold at least
+    ``PARALLEL_MIN_MEASURES`` measures. Workers are forked, so platforms without
+    ``fork`` stay serial. The result is the same either way.
     """
-    score1 = _load_score(file1)
-    score2 = _load_score(file2)
-    alignment = align_staves(score1, score2)
+    return compute_diff_of_scores(
+        _load_score(file1), _load_score(file2), hashes=hashes, max_workers=max_workers
+    )
+
+
+def compute_diff_of_scores(
+    score1: ET.Element,
+    score2: ET.Element,
+    *,
+    hashes: MeasureHashes | None = None,
+    max_workers: int | None = 1,
+) -> tuple[dict[int, list[State]], StaffAlignment]:
+    """
+    ``compute_diff_with_alignment`` for already-parsed ``<Score>`` elements, so
+    a caller holding the trees (and their ``hashes``) does not re-parse or rehash.
+    """
+    hashes = hashes if hashes is not None else MeasureHashes()
+    alignment = align_staves(score1, score2, hashes=hashes)
 
     res: dict[int, list[State]] = {}
+    parts: dict[int, list[tuple[int, AlignmentRow]]] = defaultdict(list)
     for pair_id, row in enumerate(alignment.rows, start=1):
-        res[pair_id] = _ops_for_row(row)
-    _synchronize_ops_across_part_staves(alignment, res)
-    return res, alignment
+        if row.kind in (RowKind.MATCHED, RowKind.RENAMED) and row.part_index_left is not None:
+            parts[row.part_index_left].append((pair_id, row))
+        else:
+            res[pair_id] = _ops_for_row(row, hashes)
+
+    part_rows = [[row for _, row in members] for members in parts.values()]
+    measure_count = sum(
+        len(staff.findall("Measure"))
+        for rows in part_rows
+        for row in rows
+        for staff in (row.staff_left, row.staff_right)
+        if staff is not None
+    )
+    workers = min(max_workers or os.cpu_count() or 1, len(part_rows))
+    if (
+        workers > 1
+        and measure_count >= PARALLEL_MIN_MEASURES
+        and "fork" in multiprocessing.get_all_start_methods()
+    ):
+        part_ops = _diff_parts_in_pool(part_rows, hashes, workers)
+    else:
+        part_ops = [_part_diff_ops(rows, hashes) for rows in part_rows]
+
+    for members, ops_by_staff in zip(parts.values(), part_ops):
+        for (pair_id, _), ops in zip(members, ops_by_staff):
+            res[pair_id] = ops
+    return dict(sorted(res.items())), alignment
 
 
-def compute_diff(file1: str, file2: str) -> dict[int, list[State]]:
+def compute_diff(
+    file1: str, file2: str, *, max_workers: int | None = 1
+) -> dict[int, list[State]]:
     """
     Compare two MuseScore files staff-by-staff.
 
     Returns ``{pair_index: [State, ...]}`` where pair index follows alignment row
-    order (same order as unified diff display / merge).
+    order (same order as unified diff display / merge). See
+    ``compute_diff_with_alignment`` for ``max_workers``.
     """
-    diffs, _ = compute_diff_with_alignment(file1, file2)
+    diffs, _ = compute_diff_with_alignment(file1, file2, max_workers=max_workers)
     return diffs
@@ -1,6 +1,5 @@
 import logging
 import sys
-import xml.etree.ElementTree as ET
 import zipfile
 import os
 import shutil
@@ -23,6 +22,7 @@ from .utils import (
 )
 from .alignment import RowKind, align_staves
 from .compute_diff import compute_diff, compute_diff_with_alignment
+from .xml_backend import ET, parse, write_document
 
 
 def merge_musescore_files_for_diff(f1_path: str, f2_path: str) -> Tuple[ET.ElementTree, List[str]]:
@@ -32,8 +32,8 @@ def merge_musescore_files_for_diff(f1_path: str, f2_path: str) -> Tuple[ET.Eleme
     Each part is followed by a duplicate part (``trackName`` + ``-1``) holding the
     second score's staves, with score-level staves interleaved and IDs kept in sync.
     """
-    tree1 = ET.parse(f1_path)
-    tree2 = ET.parse(f2_path)
+    tree1 = parse(f1_path)
+    tree2 = parse(f2_path)
 
     score1 = tree1.getroot().find("Score")
     score2 = tree2.getroot().find("Score")
@@ -55,7 +55,7 @@ def new_merge_musescore_files(f1_path, f2_path, output_path=None):
     """Alias for unified diff merge (kept for compatibility)."""
     diff_score_tree, part_names = merge_musescore_files_for_diff(f1_path, f2_path)
     if output_path:
-        diff_score_tree.write(output_path, encoding="UTF-8", xml_declaration=True)
+        write_document(diff_score_tree, output_path)
     return (diff_score_tree, part_names)
 
 
@@ -239,14 +239,14 @@ def compare_musescore_files(file1_path: str, file2_path: str, output_path: str|N
 
         mark_diffs_unified(diff_score, diffs)
 
-        diff_score_tree.write(output_path, encoding="UTF-8", xml_declaration=True)
+        write_document(diff_score_tree, output_path)
         
         logger.info("Diff score saved as: %s", output_path)
         return output_path
     
     else:
-        tree1 = ET.parse(file1_path)
-        tree2 = ET.parse(file2_path)
+        tree1 = parse(file1_path)
+        tree2 = parse(file2_path)
 
         root1 = tree1.getroot()
         root2 = tree2.getroot()
@@ -259,10 +259,10 @@ def compare_musescore_files(file1_path: str, file2_path: str, output_path: str|N
         mark_diffs_separate(score1, score2, diffs)
 
         lhs_output = f"{output_path}-lhs.mscx"
-        tree1.write(lhs_output, encoding="UTF-8", xml_declaration=True)
+        write_document(tree1, lhs_output)
         
         rhs_output = f"{output_path}-rhs.mscx"
-        tree2.write(rhs_output, encoding="UTF-8", xml_declaration=True)
+        write_document(tree2, rhs_output)
 
 
 def _extract_mscz_main_mscx(mscz_path: str, extract_dir: str) -> tuple[str, str]:
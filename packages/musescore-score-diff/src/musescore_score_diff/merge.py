@@ -1,19 +1,25 @@
+from __future__ import annotations
+
 import logging
 import os
 import shutil
 import tempfile
-import xml.etree.ElementTree as ET
 import zipfile
 from dataclasses import dataclass, replace
 
 from musescore_score_diff.alignment import RowKind, StaffKey, align_staves
-from musescore_score_diff.compute_diff import compute_diff, _ops_for_row
+from musescore_score_diff.compute_diff import (
+    _ops_for_row,
+    compute_diff,
+    compute_diff_of_scores,
+)
 from musescore_score_diff.display_diff import compare_musescore_files, compare_mscz_files
 from musescore_score_diff.utils import (
+    MeasureHashes,
     State,
     _hash_measure,
-    _sanitize_measure,
 )
+from musescore_score_diff.xml_backend import ET, parse, write_document
 
 logger = logging.getLogger(__name__)
 
@@ -53,13 +59,19 @@ class MergeConflictDetail:
 
 
 class MergeConflictException(Exception):
-    """Raised when head and user versions cannot be auto-merged."""
+    """
+    Raised when head and user versions cannot be auto-merged.
+
+    ``head_user_diffs`` is the head → user ``compute_diff`` of the conflicting
+    file when the merge already had it at hand (for the unified conflict score).
+    """
 
     def __init__(
         self,
         conflicts: list[MergeConflictDetail] | None = None,
         *,
         source_mscx: str | None = None,
+        head_user_diffs: dict[int, list[State]] | None = None,
     ) -> None:
         details = list(conflicts or [])
         if source_mscx is not None:
@@ -68,6 +80,7 @@ class MergeConflictException(Exception):
             ]
         self.conflicts = details
         self.source_mscx = source_mscx
+        self.head_user_diffs = head_user_diffs
         super().__init__(self._format_message())
 
     @classmethod
@@ -187,7 +200,7 @@ def _remove_excerpts_from_mscz_dir(mscz_dir: str) -> None:
     if not os.path.isfile(container_path):
         return
 
-    tree = ET.parse(container_path)
+    tree = parse(container_path)
     rootfiles = tree.getroot().find("rootfiles")
     if rootfiles is None:
         return
@@ -197,43 +210,53 @@ def _remove_excerpts_from_mscz_dir(mscz_dir: str) -> None:
         if full_path.startswith("Excerpts/"):
             rootfiles.remove(rootfile)
 
-    tree.write(container_path, encoding="UTF-8", xml_declaration=True)
+    write_document(tree, container_path)
 
 
 def _measures_equivalent(
-    head_measure: ET.Element | None, user_measure: ET.Element | None
+    head_measure: ET.Element | None,
+    user_measure: ET.Element | None,
+    hashes: MeasureHashes | None = None,
 ) -> bool:
     """True when both measures exist and have the same canonical content hash."""
     if head_measure is None or user_measure is None:
         return False
-    head_hash = _hash_measure(_sanitize_measure(head_measure))
-    user_hash = _hash_measure(_sanitize_measure(user_measure))
-    return head_hash == user_hash
+    hash_of = hashes.of if hashes is not None else _hash_measure
+    return hash_of(head_measure) == hash_of(user_measure)
 
 
-def _load_score_element(mscx_path: str) -> ET.Element:
-    tree = ET.parse(mscx_path)
+def _score_of(tree: ET.ElementTree, mscx_path: str) -> ET.Element:
     score = tree.getroot().find("Score")
     if score is None:
         raise ValueError(f"No <Score> in {mscx_path}")
     return score
 
 
-def base_diffs_by_staff_key(
-    base_mscx_path: str, other_mscx_path: str
+def _load_score_element(mscx_path: str) -> ET.Element:
+    return _score_of(parse(mscx_path), mscx_path)
+
+
+def _diffs_by_staff_key(
+    base: ET.Element, other: ET.Element, hashes: MeasureHashes
 ) -> dict[StaffKey, list[State]]:
-    """Measure edit scripts from base to other, keyed by base staff identity."""
-    base = _load_score_element(base_mscx_path)
-    other = _load_score_element(other_mscx_path)
-    alignment = align_staves(base, other)
+    alignment = align_staves(base, other, hashes=hashes)
     by_key: dict[StaffKey, list[State]] = {}
     for row in alignment.rows:
         key = row.key_left if row.key_left is not None else row.key_right
         if key is not None:
-            by_key[key] = _ops_for_row(row)
+            by_key[key] = _ops_for_row(row, hashes)
     return by_key
 
 
+def base_diffs_by_staff_key(
+    base_mscx_path: str, other_mscx_path: str
+) -> dict[StaffKey, list[State]]:
+    """Measure edit scripts from base to other, keyed by base staff identity."""
+    base = _load_score_element(base_mscx_path)
+    other = _load_score_element(other_mscx_path)
+    return _diffs_by_staff_key(base, other, MeasureHashes())
+
+
 def _unchanged_ops_for_staff(staff: ET.Element) -> list[State]:
     return [State.UNCHANGED] * len(staff.findall("Measure"))
 
@@ -300,6 +323,8 @@ def three_way_merge_mscz(base_mscz_path, head_mscz_path, user_mscz_path, output_
     )
 
     merge_error: Exception | None = None
+    # Head → user diffs of the main score, when its merge computed them.
+    main_diffs: dict[int, list[State]] | None = None
 
     with tempfile.TemporaryDirectory() as work_dir:
         extract_dirs = {
@@ -352,22 +377,29 @@ def three_way_merge_mscz(base_mscz_path, head_mscz_path, user_mscz_path, output_
                 )
             except MergeConflictException as exc:
                 merge_error = MergeConflictException(
-                    exc.conflicts, source_mscx=user_arc
+                    exc.conflicts,
+                    source_mscx=user_arc,
+                    head_user_diffs=exc.head_user_diffs,
                 )
+                if user_arc == user_main:
+                    main_diffs = exc.head_user_diffs
             except ComplicatedMergeException as exc:
                 if not isinstance(merge_error, MergeConflictException):
                     merge_error = exc
 
         if isinstance(merge_error, MergeConflictException):
-            head_mscx = os.path.join(extract_dirs["head"], head_main)
-            user_mscx = os.path.join(extract_dirs["user"], user_main)
-            head_user_diffs = compute_diff(head_mscx, user_mscx)
+            if main_diffs is None:
+                # The conflict is in an excerpt; the main score merged (and was
+                # rewritten), so diff it from the extracted files.
+                head_mscx = os.path.join(extract_dirs["head"], head_main)
+                user_mscx = os.path.join(extract_dirs["user"], user_main)
+                main_diffs = compute_diff(head_mscx, user_mscx)
             compare_mscz_files(
                 head_mscz_path,
                 user_mscz_path,
                 output_mscz_path,
                 unified_diff=True,
-                diffs=head_user_diffs,
+                diffs=main_diffs,
             )
         else:
             _write_mscz_from_dir(output_dir, output_mscz_path)
@@ -395,27 +427,42 @@ def three_way_merge_musescore(
     """
 
 
-    # Check if there are merge conflicts
-
+    # Check if there are merge conflicts. Each document is parsed once and
+    # every measure hashed once across both diffs and the merge itself.
+    hashes = MeasureHashes()
     try:
-        base_2_head = base_diffs_by_staff_key(base_mscx_path, head_mscx_path)
-        base_2_user = base_diffs_by_staff_key(base_mscx_path, user_mscx_path)
+        base = _load_score_element(base_mscx_path)
+        head_tree = parse(head_mscx_path)
+        user_tree = parse(user_mscx_path)
+        base_2_head = _diffs_by_staff_key(
+            base, _score_of(head_tree, head_mscx_path), hashes
+        )
+        base_2_user = _diffs_by_staff_key(
+            base, _score_of(user_tree, user_mscx_path), hashes
+        )
     except ValueError as exc:
         logger.error("Cannot merge scores: %s", exc, exc_info=True)
         raise ComplicatedMergeException(str(exc)) from exc
 
     try:
-        auto_merge_musescore_files(
-            head_mscx_path,
-            user_mscx_path,
-            output_mscx_path,
+        _merge_trees(
+            head_tree,
+            user_tree,
             base_2_head,
             base_2_user,
             mscx_path=mscx_path or os.path.basename(head_mscx_path),
+            hashes=hashes,
         )
+        write_document(user_tree, output_mscx_path)
     except MergeConflictException as exc:
+        # _merge_trees leaves both trees untouched on conflict, and every
+        # measure in them is already hashed.
+        head_user_diffs, _ = compute_diff_of_scores(
+            _score_of(head_tree, head_mscx_path),
+            _score_of(user_tree, user_mscx_path),
+            hashes=hashes,
+        )
         if write_conflict_diff:
-            head_user_diffs = compute_diff(head_mscx_path, user_mscx_path)
             compare_musescore_files(
                 head_mscx_path,
                 user_mscx_path,
@@ -423,7 +470,9 @@ def three_way_merge_musescore(
                 unified_diff=True,
                 diffs=head_user_diffs,
             )
-        raise MergeConflictException(exc.conflicts, source_mscx=mscx_path) from exc
+        raise MergeConflictException(
+            exc.conflicts, source_mscx=mscx_path, head_user_diffs=head_user_diffs
+        ) from exc
 
 
 
@@ -436,7 +485,35 @@ def merge_staff_pair(
     staff_id: int,
     staff_name: str | None = None,
     mscx_path: str | None = None,
+    hashes: MeasureHashes | None = None,
 ) -> None:
+    _replace_measures(
+        user_staff,
+        _merged_measures(
+            head_staff,
+            user_staff,
+            head_ops,
+            user_ops,
+            staff_id=staff_id,
+            staff_name=staff_name,
+            mscx_path=mscx_path,
+            hashes=hashes,
+        ),
+    )
+
+
+def _merged_measures(
+    head_staff,
+    user_staff,
+    head_ops: list[State],
+    user_ops: list[State],
+    *,
+    staff_id: int,
+    staff_name: str | None = None,
+    mscx_path: str | None = None,
+    hashes: MeasureHashes | None = None,
+) -> list[ET.Element]:
+    """The merged staff's measures; raises ``MergeConflictException`` without touching either staff."""
     measures1 = list(head_staff.findall("Measure"))
     measures2 = list(user_staff.findall("Measure"))
     head_measure_total = len(measures1)
@@ -465,7 +542,7 @@ def merge_staff_pair(
                 if m1 is not None:
                     m_processed.append(m1)
             case (State.MODIFIED, State.MODIFIED):
-                if _measures_equivalent(m1, m2):
+                if _measures_equivalent(m1, m2, hashes):
                     if m2 is not None:
                         m_processed.append(m2)
                 else:
@@ -482,7 +559,7 @@ def merge_staff_pair(
                         )
                     )
             case (State.INSERTED, State.INSERTED):
-                if _measures_equivalent(m1, m2):
+                if _measures_equivalent(m1, m2, hashes):
                     if m2 is not None:
                         m_processed.append(m2)
                 elif m2 is not None:
@@ -524,10 +601,13 @@ def merge_staff_pair(
                 raise AssertionError(
                     f"Unknown merge case: head={head_state} user={user_state}"
                 )
+    return m_processed
+
 
+def _replace_measures(user_staff, measures: list[ET.Element]) -> None:
     for m2 in user_staff.findall("Measure"):
         user_staff.remove(m2)
-    for m2 in m_processed:
+    for m2 in measures:
         user_staff.append(m2)
 
 
@@ -540,19 +620,42 @@ def auto_merge_musescore_files(
     *,
     mscx_path: str | None = None,
 ):
-    head_tree = ET.parse(head_mscx_path)
-    root = head_tree.getroot()
-    score = root.find("Score")
+    head_tree = parse(head_mscx_path)
+    user_tree = parse(user_mscx_path)
+    _merge_trees(
+        head_tree,
+        user_tree,
+        base_2_head,
+        base_2_user,
+        mscx_path=mscx_path,
+        hashes=MeasureHashes(),
+    )
+    write_document(user_tree, output_mscx_path)
+
+
+def _merge_trees(
+    head_tree: ET.ElementTree,
+    user_tree: ET.ElementTree,
+    base_2_head: dict[StaffKey, list[State]],
+    base_2_user: dict[StaffKey, list[State]],
+    *,
+    mscx_path: str | None,
+    hashes: MeasureHashes,
+) -> None:
+    """
+    Merge head into ``user_tree`` in place, staff by staff. Every staff is
+    merged before any is rewritten, so a conflict leaves both trees as parsed.
+    """
+    score = head_tree.getroot().find("Score")
     if score is None:
         raise ValueError("No <Score> tag found in the XML.")
 
-    user_tree = ET.parse(user_mscx_path)
-    user_root = user_tree.getroot()
-    user_score = user_root.find("Score")
+    user_score = user_tree.getroot().find("Score")
     if user_score is None:
         raise ValueError("No <Score> tag found in the XML.")
 
-    align_hu = align_staves(score, user_score)
+    align_hu = align_staves(score, user_score, hashes=hashes)
+    merged: list[tuple[ET.Element, list[ET.Element]]] = []
     staff_id = 0
     for row in align_hu.rows:
         if row.kind not in (RowKind.MATCHED, RowKind.RENAMED):
@@ -569,7 +672,7 @@ def auto_merge_musescore_files(
             head_ops = _unchanged_ops_for_staff(row.staff_left)
         if user_ops is None:
             user_ops = _unchanged_ops_for_staff(row.staff_right)
-        merge_staff_pair(
+        measures = _merged_measures(
             row.staff_left,
             row.staff_right,
             head_ops,
@@ -577,9 +680,12 @@ def auto_merge_musescore_files(
             staff_id=staff_id,
             staff_name=key.part_name,
             mscx_path=mscx_path,
+            hashes=hashes,
         )
+        merged.append((row.staff_right, measures))
 
-    user_tree.write(output_mscx_path, encoding="UTF-8", xml_declaration=True)
+    for user_staff, measures in merged:
+        _replace_measures(user_staff, measures)
 
 
 """
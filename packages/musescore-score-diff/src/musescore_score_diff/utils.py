@@ -1,11 +1,11 @@
 import logging
-import xml.etree.ElementTree as ET
 import hashlib
 import os
 from collections import deque
-from copy import deepcopy
 from enum import Enum
 
+from .xml_backend import ET, parse
+
 logger = logging.getLogger(__name__)
 
 ALPHA_VALUE = 100
@@ -48,18 +48,6 @@ _SORTABLE_SIBLING_TAGS = frozenset(
 )
 
 
-def _element_sort_key(elem: ET.Element) -> tuple[str, str]:
-    """Stable key for ordering reorderable siblings."""
-    raw = ET.tostring(elem, encoding="utf-8")
-    normalized = b"".join(raw.split())
-    return (elem.tag, normalized.decode("utf-8", errors="replace"))
-
-
-def _sort_attribs(elem: ET.Element) -> None:
-    if elem.attrib:
-        elem.attrib = dict(sorted(elem.attrib.items()))
-
-
 def _is_courtesy_or_invisible_timesig(elem: ET.Element) -> bool:
     """Time signatures used only for layout (not a real meter change)."""
     if elem.tag != "TimeSig":
@@ -73,53 +61,110 @@ def _is_courtesy_or_invisible_timesig(elem: ET.Element) -> bool:
     return False
 
 
-def _canonicalize_measure_tree(elem: ET.Element) -> None:
-    """
-    Normalize measure XML so inconsequential sibling order differences hash the same.
-
-    Recurses into children, sorts attributes, and sorts contiguous runs of
-    annotation-like siblings (e.g. StaffText vs RehearsalMark) without moving
-    them past Chord/Rest timeline events.
-    """
-    for child in list(elem):
-        _canonicalize_measure_tree(child)
-    _sort_attribs(elem)
+def _is_hash_noise(elem: ET.Element) -> bool:
+    """Children ``_sanitize_measure`` drops: IDs, layout-only tags, courtesy TimeSigs."""
+    return (
+        elem.tag in ("eid", "linkedMain")
+        or elem.tag in _HASH_IGNORE_TAGS
+        or _is_courtesy_or_invisible_timesig(elem)
+    )
 
-    children = list(elem)
-    if not children:
-        return
 
-    new_children: list[ET.Element] = []
-    sortable_run: list[ET.Element] = []
+# The hash used to be an MD5 of the serialized measure with all whitespace
+# removed, so text and tails drop ASCII whitespace. Attribute values are
+# escaped before that (newlines become ``&#10;``), so they only drop spaces.
+_TEXT_WHITESPACE = {ord(c): None for c in " \t\n\r\x0b\x0c"}
+_ATTRIB_WHITESPACE = {ord(" "): None}
 
-    def flush_sortable_run() -> None:
-        if not sortable_run:
-            return
-        sortable_run.sort(key=_element_sort_key)
-        new_children.extend(sortable_run)
-        sortable_run.clear()
 
-    for child in children:
+def _feed_canonical(elem: ET.Element, h) -> None:
+    """
+    Feed ``elem`` (tag, sorted attributes, text, children, tail) into ``h``,
+    skipping hash noise. Contiguous runs of ``_SORTABLE_SIBLING_TAGS`` are fed
+    as sub-digests sorted by (tag, digest), so their order does not matter.
+    Fields are NUL-separated; XML text cannot contain NUL.
+    """
+    h.update(b"<\0" + elem.tag.encode())
+    for name, value in sorted(elem.attrib.items()):
+        h.update(b"\0@" + name.encode() + b"\0" + value.translate(_ATTRIB_WHITESPACE).encode())
+    text = elem.text
+    stripped = text.translate(_TEXT_WHITESPACE) if text else ""
+    if stripped:
+        h.update(b"\0t" + stripped.encode())
+
+    has_children = False
+    run: list[tuple[str, bytes]] = []
+    for child in elem:
+        if _is_hash_noise(child):
+            continue
+        has_children = True
         if child.tag in _SORTABLE_SIBLING_TAGS:
-            sortable_run.append(child)
-        else:
-            flush_sortable_run()
-            new_children.append(child)
-    flush_sortable_run()
-    elem[:] = new_children
+            sub = hashlib.md5()
+            _feed_canonical(child, sub)
+            run.append((child.tag, sub.digest()))
+            continue
+        if run:
+            _feed_sorted_run(run, h)
+        _feed_canonical(child, h)
+    if run:
+        _feed_sorted_run(run, h)
+
+    # ``<a/>`` and ``<a> </a>`` serialized differently, so empty elements
+    # keep whether they had any text at all.
+    h.update(b"\0>" if has_children or text else b"\0/")
+    tail = elem.tail.translate(_TEXT_WHITESPACE) if elem.tail else ""
+    if tail:
+        h.update(b"\0~" + tail.encode())
+
+
+def _feed_sorted_run(run: list[tuple[str, bytes]], h) -> None:
+    run.sort()
+    for _tag, digest in run:
+        h.update(b"\0#" + digest)
+    run.clear()
 
 
 def _hash_measure(measure: ET.Element) -> str:
     """
     Return a stable hash of the measure's XML content.
     Allows for quick comparison
+
+    Streams the measure into the hash in one walk: nothing is copied or
+    serialized, and noise ``_sanitize_measure`` would remove is skipped.
+    """
+    h = hashlib.md5()
+    _feed_canonical(measure, h)
+    return h.hexdigest()
+
+class MeasureHashes:
+    """
+    ``_hash_measure`` memo for one diff / merge run, keyed on element
+    identity: each measure of a parsed document is hashed once, however many
+    alignments, edit scripts and conflict checks look at it.
+
+    Measures must not be edited while the memo is in use. Sanitizing is fine,
+    since hashes already skip what ``_sanitize_measure`` removes.
     """
-    copy = deepcopy(measure)
-    _sanitize_measure(copy)
-    _canonicalize_measure_tree(copy)
-    raw = ET.tostring(copy, encoding="utf-8")
-    normalized = b"".join(raw.split())
-    return hashlib.md5(normalized).hexdigest()
+
+    def __init__(self) -> None:
+        # The element is kept alongside its hash so its id() cannot be reused.
+        self._by_id: dict[int, tuple[ET.Element, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def of(self, measure: ET.Element) -> str:
+        entry = self._by_id.get(id(measure))
+        if entry is None:
+            entry = (measure, _hash_measure(measure))
+            self._by_id[id(measure)] = entry
+        return entry[1]
+
+    def update(self, measures: list[ET.Element], values: list[str]) -> None:
+        """Record hashes computed elsewhere (e.g. in a worker process) for ``measures``."""
+        for measure, value in zip(measures, values):
+            self._by_id[id(measure)] = (measure, value)
+
 
 def _sanitize_measure(measure: ET.Element) -> ET.Element:
     """Remove IDs, layout-only elements, and other non-musical noise before hashing."""
@@ -127,11 +172,7 @@ def _sanitize_measure(measure: ET.Element) -> ET.Element:
     to_remove: list[tuple[ET.Element, ET.Element]] = []
     for elem in measure.iter():
         for child in list(elem):
-            if child.tag in ("eid", "linkedMain"):
-                to_remove.append((elem, child))
-            elif child.tag in _HASH_IGNORE_TAGS:
-                to_remove.append((elem, child))
-            elif _is_courtesy_or_invisible_timesig(child):
+            if _is_hash_noise(child):
                 to_remove.append((elem, child))
 
     for parent, child in to_remove:
@@ -139,8 +180,7 @@ def _sanitize_measure(measure: ET.Element) -> ET.Element:
     return measure
 
 def get_staves(filename: str) -> list[ET.Element]:
-    parser = ET.XMLParser()
-    tree = ET.parse(filename, parser)
+    tree = parse(filename)
     root = tree.getroot()
     score = root.find("Score")
     if score is None:
@@ -284,11 +324,14 @@ def pair_staves_by_track_name(score1: ET.Element, score2: ET.Element) -> list[tu
     return pairs
 
 
-def extract_measures(staff: ET.Element) -> list[tuple[int, str, ET.Element]]:
+def extract_measures(
+    staff: ET.Element, hashes: MeasureHashes | None = None
+) -> list[tuple[int, str, ET.Element]]:
     """Return ``(1-based index, content hash, measure element)`` without mutating the staff."""
+    hash_of = hashes.of if hashes is not None else _hash_measure
     measures: list[tuple[int, str, ET.Element]] = []
     for i, measure in enumerate(staff.findall("Measure"), start=1):
-        measures.append((i, _hash_measure(measure), measure))
+        measures.append((i, hash_of(measure), measure))
     return measures
 
 
@@ -0,0 +1,74 @@
+"""
+ElementTree implementation used for every MSCX tree.
+
+``ET`` is ``lxml.etree`` when ``MSCZ_XML_BACKEND=lxml`` (or ``auto``) and lxml
+is installed, else the stdlib ``xml.etree.ElementTree``. The variable is the
+same one ``mscz_formatter`` reads. Modules build elements through ``ET`` so
+trees never mix implementations, and parse / write through the helpers here
+so written files are byte-identical whichever backend is active.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import xml.etree.ElementTree as STDLIB
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+
+def _select_backend() -> ModuleType:
+    wanted = os.environ.get("MSCZ_XML_BACKEND", "stdlib").strip().lower()
+    if wanted in ("lxml", "auto"):
+        try:
+            from lxml import etree
+        except ImportError:
+            if wanted == "lxml":
+                logger.warning("MSCZ_XML_BACKEND=lxml but lxml is not installed; using stdlib")
+        else:
+            return etree
+    return STDLIB
+
+
+ET = _select_backend()
+BACKEND = "stdlib" if ET is STDLIB else "lxml"
+
+
+def parse(source, *, etree: ModuleType = ET):
+    """Parse a path or binary file object. Comments and PIs are dropped, as stdlib does."""
+    if etree is STDLIB:
+        return etree.parse(source, etree.XMLParser())
+    return etree.parse(source, etree.XMLParser(remove_comments=True, remove_pis=True))
+
+
+def serialize_document(tree, encoding: str = "UTF-8", *, etree: ModuleType = ET) -> bytes:
+    """
+    ``tree.write(f, encoding=encoding, xml_declaration=True)`` bytes, exactly
+    as the stdlib writes them (lxml spells empty tags ``<a/>``, attribute tabs
+    ``&#9;`` and the declaration differently, and writes ``text == ""`` as
+    ``<a></a>`` where stdlib treats it like ``None``; nothing else differs).
+    """
+    if etree is STDLIB:
+        buffer = io.BytesIO()
+        tree.write(buffer, encoding=encoding, xml_declaration=True)
+        return buffer.getvalue()
+
+    # Serialize ``text == ""`` as ``None`` (a short tag), then put it back.
+    emptied = [elem for elem in tree.getroot().iter() if elem.text == ""]
+    for elem in emptied:
+        elem.text = None
+    try:
+        body = etree.tostring(tree.getroot(), encoding=encoding, xml_declaration=False)
+    finally:
+        for elem in emptied:
+            elem.text = ""
+    body = body.replace(b"/>", b" />").replace(b"&#9;", b"&#09;")
+    return f"<?xml version='1.0' encoding='{encoding}'?>\n".encode(encoding) + body
+
+
+def write_document(tree, path: str, encoding: str = "UTF-8") -> None:
+    """Drop-in for ``tree.write(path, encoding=encoding, xml_declaration=True)``."""
+    with open(path, "wb") as f:
+        f.write(serialize_document(tree, encoding))
@@ -77,6 +77,32 @@ def test_hash_measure_ignores_courtesy_timesig():
     )
 
 
+def test_hash_measure_skips_noise_without_mutating():
+    import xml.etree.ElementTree as ET
+
+    from musescore_score_diff.utils import _hash_measure, _sanitize_measure
+
+    source = """
+        <Measure>
+          <voice>
+            <StaffText><eid>12</eid><text>A</text></StaffText>
+            <eid>13</eid>
+            <RehearsalMark><text>B</text></RehearsalMark>
+            <Chord><linkedMain/><durationType>quarter</durationType>
+              <Note><pitch>60</pitch></Note>
+            </Chord>
+          </voice>
+        </Measure>
+        """
+    measure = ET.fromstring(source)
+    before = ET.tostring(measure)
+
+    h = _hash_measure(measure)
+
+    assert ET.tostring(measure) == before
+    assert h == _hash_measure(_sanitize_measure(ET.fromstring(source)))
+
+
 def test_hash_measure_ignores_layout_break():
     import xml.etree.ElementTree as ET
 
@@ -199,3 +225,103 @@ def test_diff_computes_correctly():
             assert state == State.INSERTED, f"step {idx}: {state}"
         else:
             assert state == State.UNCHANGED, f"step {idx}: {state}"
+
+
+def _table_diff(seq1, seq2):
+    """Reference: full LCS table, then the same backtrack as ``diff_sequences``."""
+    n, m = len(seq1), len(seq2)
+    L = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n):
+        for j in range(m):
+            if seq1[i] == seq2[j]:
+                L[i + 1][j + 1] = L[i][j] + 1
+            else:
+                L[i + 1][j + 1] = max(L[i][j + 1], L[i + 1][j])
+
+    ops, i, j = [], n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and seq1[i - 1] == seq2[j - 1]:
+            ops.append(State.UNCHANGED)
+            i, j = i - 1, j - 1
+        elif i == j:
+            ops.append(State.MODIFIED)
+            i, j = i - 1, j - 1
+        elif j > 0 and (i == 0 or L[i][j - 1] >= L[i - 1][j]):
+            ops.append(State.INSERTED)
+            j -= 1
+        else:
+            ops.append(State.REMOVED)
+            i -= 1
+    return ops[::-1]
+
+
+def test_diff_sequences_matches_full_lcs_table():
+    import random
+
+    from musescore_score_diff.compute_diff import diff_sequences
+
+    rng = random.Random(0)
+    for _ in range(3000):
+        alphabet = rng.randint(1, 5)
+        seq1 = [str(rng.randint(0, alphabet)) for _ in range(rng.randint(0, 12))]
+        seq2 = list(seq1)
+        for _ in range(rng.randint(0, 4)):
+            pos = rng.randint(0, len(seq2))
+            if rng.random() < 0.5 and pos < len(seq2):
+                del seq2[pos]
+            else:
+                seq2.insert(pos, str(rng.randint(0, alphabet)))
+        assert diff_sequences(seq1, seq2) == _table_diff(seq1, seq2), (seq1, seq2)
+
+    # Repeated bars inside the common prefix still match where the table says.
+    assert diff_sequences(["a", "b", "c"], ["a", "x", "a", "b", "c", "d"]) == _table_diff(
+        ["a", "b", "c"], ["a", "x", "a", "b", "c", "d"]
+    )
+
+
+def test_parallel_diff_matches_serial(monkeypatch):
+    import importlib
+
+    from musescore_score_diff.compute_diff import compute_diff_with_alignment
+    from musescore_score_diff.utils import MeasureHashes
+
+    # ``musescore_score_diff.compute_diff`` is shadowed by the re-exported function.
+    module = importlib.import_module("musescore_score_diff.compute_diff")
+    monkeypatch.setattr(module, "PARALLEL_MIN_MEASURES", 0)
+    file1 = "tests/fixtures/Test-Score/Test-Score.mscx"
+    file2 = "tests/fixtures/Test-Score-2/Test-Score-2.mscx"
+
+    serial_hashes, pooled_hashes = MeasureHashes(), MeasureHashes()
+    serial, _ = compute_diff_with_alignment(file1, file2, hashes=serial_hashes)
+    pooled, _ = compute_diff_with_alignment(
+        file1, file2, hashes=pooled_hashes, max_workers=2
+    )
+
+    assert list(pooled.items()) == list(serial.items())
+    assert len(pooled_hashes) == len(serial_hashes)
+
+
+def test_grand_staff_is_diffed_as_one_part(tmp_path):
+    from musescore_score_diff.compute_diff import compute_diff_with_alignment
+    from musescore_score_diff.xml_backend import ET
+
+    from .test_alignment import _MEASURE_A, _MEASURE_B, _minimal_score
+
+    def write(score: ET.Element, name: str) -> str:
+        root = ET.Element("museScore", version="4.00")
+        root.append(score)
+        path = tmp_path / name
+        ET.ElementTree(root).write(path)
+        return str(path)
+
+    a, b = _MEASURE_A, _MEASURE_B
+    # A bar goes in at index 1. On its own, the treble staff would put the
+    # insert at index 0 (its new bar repeats the one before).
+    left = write(_minimal_score([("Piano", 1, [[a, b], [a, a]])]), "left.mscx")
+    right = write(_minimal_score([("Piano", 1, [[a, a, b], [a, b, a]])]), "right.mscx")
+
+    diffs, alignment = compute_diff_with_alignment(left, right)
+
+    assert len(alignment.rows) == 2
+    expected = [State.UNCHANGED, State.INSERTED, State.UNCHANGED]
+    assert diffs == {1: expected, 2: expected}
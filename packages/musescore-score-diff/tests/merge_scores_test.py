@@ -7,6 +7,7 @@ from musescore_score_diff.merge import (
     MergeConflictException,
     three_way_merge_mscz,
 )
+from musescore_score_diff.utils import State
 
 from .test_utils import assert_scores_match
 
@@ -81,4 +82,59 @@ def test_merge_conflict_measure_added_raises():
     warnings.warn(
         "Merge conflict was raised as expected. Open in MuseScore and verify the "
         f"unified conflict score looks correct: {output_path}"
-    )
\ No newline at end of file
+    )
+
+def test_merge_hashes_each_measure_once(tmp_path, monkeypatch):
+    from musescore_score_diff import utils
+
+    hash_measure = utils._hash_measure
+    hashed = []  # keeps the measures alive, so ids stay unique
+
+    def counting_hash(measure):
+        hashed.append(measure)
+        return hash_measure(measure)
+
+    monkeypatch.setattr(utils, "_hash_measure", counting_hash)
+    base_path, head_path, user_path, _ = _merge_paths("big-testcase")
+
+    three_way_merge_mscz(base_path, head_path, user_path, str(tmp_path / "out.mscz"))
+
+    assert hashed
+    assert len(hashed) == len({id(measure) for measure in hashed})
+
+
+def test_conflict_score_reuses_the_merge_diff(tmp_path, monkeypatch):
+    from musescore_score_diff import merge
+
+    def rediff(*args, **kwargs):
+        raise AssertionError("head and user were parsed and hashed again")
+
+    monkeypatch.setattr(merge, "compute_diff", rediff)
+    base_path, head_path, user_path, _ = _merge_paths("merge-conflict-single-measure")
+    output_path = tmp_path / "conflict.mscz"
+
+    with pytest.raises(MergeConflictException) as exc_info:
+        three_way_merge_mscz(base_path, head_path, user_path, str(output_path))
+
+    assert output_path.is_file()
+    diffs = exc_info.value.head_user_diffs
+    assert any(State.MODIFIED in ops for ops in diffs.values())
+
+
+def test_merged_score_keeps_unique_eids(tmp_path):
+    import zipfile
+
+    from musescore_score_diff.xml_backend import ET
+
+    base_path, head_path, user_path, _ = _merge_paths("big-testcase")
+    output_path = tmp_path / "out.mscz"
+
+    three_way_merge_mscz(base_path, head_path, user_path, str(output_path))
+
+    with zipfile.ZipFile(output_path) as z:
+        for name in z.namelist():
+            if not name.endswith(".mscx"):
+                continue
+            eids = [e.text for e in ET.fromstring(z.read(name)).iter("eid")]
+            assert eids, name
+            assert len(eids) == len(set(eids)), name
@@ -1,8 +1,7 @@
-import xml.etree.ElementTree as ET
-
 from musescore_score_diff.alignment import RowKind, align_staves, build_union_from_alignment
 from musescore_score_diff.compute_diff import compute_diff
 from musescore_score_diff.utils import State
+from musescore_score_diff.xml_backend import ET
 
 
 def _minimal_score(parts: list[tuple[str, int, list[list[str]]]]) -> ET.Element:
@@ -94,3 +93,4 @@ def test_union_layout_matches_row_count():
     parts, staves, _ = build_union_from_alignment(s1, s2, alignment)
     assert len(staves) == sum(len(p.findall("Staff")) for p in parts)
     assert len(staves) == 4  # piano lhs+rhs, flute lhs+rhs
+
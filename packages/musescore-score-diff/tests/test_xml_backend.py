@@ -0,0 +1,36 @@
+"""Byte-for-byte output compatibility of the XML backends."""
+
+import io
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+from musescore_score_diff.xml_backend import STDLIB, parse, serialize_document
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+MSCX_FILES = sorted(FIXTURES.glob("Test-Score-2/**/*.mscx"))
+
+
+def _serialized(etree, path: Path) -> bytes:
+    tree = parse(str(path), etree=etree)
+    root = tree.getroot()
+    # Same kinds of edits the diff / merge make: new elements, attributes, empty text.
+    etree.SubElement(root, "color", {"r": "255", "g": "0", "b": "0", "a": "100"})
+    etree.SubElement(root, "Text", {"note": 'tab\there "quoted" <&>'}).text = "A & B <1>"
+    etree.SubElement(root, "text").text = ""
+    return serialize_document(tree, etree=etree)
+
+
+def test_stdlib_serialization_matches_tree_write():
+    tree = ET.parse(MSCX_FILES[0])
+    buffer = io.BytesIO()
+    tree.write(buffer, encoding="UTF-8", xml_declaration=True)
+
+    assert serialize_document(tree, etree=STDLIB) == buffer.getvalue()
+
+
+def test_lxml_output_is_byte_identical_to_stdlib():
+    lxml_etree = pytest.importorskip("lxml.etree")
+
+    for path in MSCX_FILES:
+        assert _serialized(lxml_etree, path) == _serialized(STDLIB, path), path.name
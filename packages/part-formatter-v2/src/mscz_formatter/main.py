@@ -4,9 +4,18 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import sys
+import time
 
-from mscz_formatter.mscz import Style, format_mscz
+from mscz_formatter.mscz import DirectoryPlanCache, Style, format_mscz
+from mscz_formatter.mscz.batch import (
+    batch_report,
+    jobs_from_directory,
+    load_manifest,
+    run_batch,
+)
+from mscz_formatter.mscz.plan_cache import default_plan_cache_dir
 
 
 def _parse_part_mpos(values: list[str] | None) -> dict[str, str]:
@@ -37,35 +46,8 @@ def _parse_part_mpos(values: list[str] | None) -> dict[str, str]:
     return result
 
 
-def main(argv: list[str] | None = None) -> int:
-    """
-    Example::
-
-        python -m mscz_formatter.main in.mscz out.mscz \\
-            --part-mpos 0_Trumpet_in_Bb=trumpet.mpos \\
-            --part-mpos Trombone=trombone.mpos \\
-            --style broadway \\
-            --show-title \"Skule Nite\" --show-number \"12\" --version-num v1.0.0
-    """
-    parser = argparse.ArgumentParser(
-        description=(
-            "Format a MuseScore .mscz file. Provide one .mpos file for each "
-            "part you expect to export (unless --no-layout)."
-        )
-    )
-    parser.add_argument("input", help="Path to input .mscz file")
-    parser.add_argument("output", help="Path to output .mscz file")
-    parser.add_argument(
-        "--part-mpos",
-        action="append",
-        default=None,
-        metavar="PART=PATH",
-        help=(
-            "Part key and its .mpos path (repeatable). Part keys may be excerpt "
-            "folder names, names without index, or indices. "
-            "Alternatively pass a single JSON object. Required unless --no-layout."
-        ),
-    )
+def _add_format_arguments(parser: argparse.ArgumentParser) -> None:
+    """Style, metadata, step-toggle and plan-cache options shared by both commands."""
     parser.add_argument(
         "--style",
         dest="selected_style",
@@ -125,22 +107,24 @@ def main(argv: list[str] | None = None) -> int:
         ),
     )
 
-    args = parser.parse_args(argv)
-
-    try:
-        part_mpos = _parse_part_mpos(args.part_mpos)
-    except (ValueError, json.JSONDecodeError) as e:
-        print(f"Error parsing --part-mpos: {e}", file=sys.stderr)
-        return 1
+    parser.add_argument(
+        "--plan-cache-dir",
+        default=None,
+        metavar="DIR",
+        help=(
+            "Directory for cached line/page plans "
+            f"(default: {default_plan_cache_dir()})"
+        ),
+    )
+    parser.add_argument(
+        "--no-plan-cache",
+        action="store_true",
+        help="Always re-plan layout; do not read or write cached plans",
+    )
 
-    if not args.no_layout and not part_mpos:
-        print(
-            "Error: --part-mpos is required unless --no-layout is set.",
-            file=sys.stderr,
-        )
-        return 1
 
-    params = {
+def _params_from_args(args: argparse.Namespace) -> dict:
+    return {
         "selected_style": args.selected_style,
         "staff_spacing_strategy": args.staff_spacing_strategy,
         "staff_spacing_value": args.staff_spacing_value,
@@ -158,8 +142,169 @@ def main(argv: list[str] | None = None) -> int:
         "optimize_for_page_turns": not args.no_page_turns,
     }
 
+
+def _plan_cache_from_args(args: argparse.Namespace) -> DirectoryPlanCache | None:
+    return None if args.no_plan_cache else DirectoryPlanCache(args.plan_cache_dir)
+
+
+def batch_main(argv: list[str]) -> int:
+    """
+    Example::
+
+        python -m mscz_formatter.main batch shows/ --output-dir formatted/ \\
+            --jobs 8 --report report.json --show-title "Skule Nite"
+
+        python -m mscz_formatter.main batch manifest.json --jobs 0
+    """
+    parser = argparse.ArgumentParser(
+        prog="mscz-formatter batch",
+        description=(
+            "Format many .mscz files across worker processes. SOURCE is a "
+            "directory of scores (each with its parts' .mpos files alongside) "
+            "or a .json / .csv manifest of input, output, part_mpos and params. "
+            "Options below are defaults that manifest params override."
+        ),
+    )
+    parser.add_argument("source", help="Directory of .mscz files, or a manifest")
+    parser.add_argument(
+        "--output-dir",
+        default=None,
+        metavar="DIR",
+        help="Where formatted scores go (required for a directory source)",
+    )
+    _add_format_arguments(parser)
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Format N scores at once (0 = one per CPU; default: 1)",
+    )
+    parser.add_argument(
+        "--report",
+        default=None,
+        metavar="PATH",
+        help="Write a JSON report with per-file timings and failures",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.jobs < 0:
+        print("Error: --jobs must be 0 or greater.", file=sys.stderr)
+        return 1
+
+    params = _params_from_args(args)
     try:
-        success = format_mscz(args.input, args.output, part_mpos, params)
+        if os.path.isdir(args.source):
+            if not args.output_dir:
+                print("Error: --output-dir is required for a directory.", file=sys.stderr)
+                return 1
+            jobs = jobs_from_directory(args.source, args.output_dir, params)
+        else:
+            jobs = load_manifest(args.source, params)
+    except (OSError, ValueError) as e:
+        print(f"Error reading {args.source}: {e}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    results = run_batch(
+        jobs, max_workers=args.jobs or None, plan_cache=_plan_cache_from_args(args)
+    )
+    report = batch_report(results, time.perf_counter() - start)
+
+    for result in results:
+        if result.ok:
+            print(f"ok      {result.seconds:7.2f}s  {result.output_path}")
+        else:
+            print(f"FAILED  {result.seconds:7.2f}s  {result.input_path}: {result.error}")
+    print(
+        f"{report['succeeded']}/{report['jobs']} formatted "
+        f"in {report['seconds']:.2f}s"
+    )
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    return 0 if report["failed"] == 0 else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Example::
+
+        python -m mscz_formatter.main in.mscz out.mscz \\
+            --part-mpos 0_Trumpet_in_Bb=trumpet.mpos \\
+            --part-mpos Trombone=trombone.mpos \\
+            --style broadway \\
+            --show-title \"Skule Nite\" --show-number \"12\" --version-num v1.0.0
+
+    ``main(["batch", ...])`` formats many scores at once (see ``batch_main``).
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["batch"]:
+        return batch_main(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Format a MuseScore .mscz file. Provide one .mpos file for each "
+            "part you expect to export (unless --no-layout)."
+        )
+    )
+    parser.add_argument("input", help="Path to input .mscz file")
+    parser.add_argument("output", help="Path to output .mscz file")
+    parser.add_argument(
+        "--part-mpos",
+        action="append",
+        default=None,
+        metavar="PART=PATH",
+        help=(
+            "Part key and its .mpos path (repeatable). Part keys may be excerpt "
+            "folder names, names without index, or indices. "
+            "Alternatively pass a single JSON object. Required unless --no-layout."
+        ),
+    )
+    _add_format_arguments(parser)
+
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Format parts across N worker processes (0 = one per CPU; default: 1)",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.max_workers < 0:
+        print("Error: --max-workers must be 0 or greater.", file=sys.stderr)
+        return 1
+
+    try:
+        part_mpos = _parse_part_mpos(args.part_mpos)
+    except (ValueError, json.JSONDecodeError) as e:
+        print(f"Error parsing --part-mpos: {e}", file=sys.stderr)
+        return 1
+
+    if not args.no_layout and not part_mpos:
+        print(
+            "Error: --part-mpos is required unless --no-layout is set.",
+            file=sys.stderr,
+        )
+        return 1
+
+    params = _params_from_args(args)
+
+    try:
+        success = format_mscz(
+            args.input,
+            args.output,
+            part_mpos,
+            params,
+            max_workers=args.max_workers or None,
+            plan_cache=_plan_cache_from_args(args),
+        )
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         return 1
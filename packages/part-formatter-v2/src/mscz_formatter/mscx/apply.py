@@ -2,10 +2,18 @@
 
 from __future__ import annotations
 
-import xml.etree.ElementTree as ET
+from bisect import bisect_right, insort
 from logging import getLogger
 
-from mscz_formatter.mscx.models import MAX_PAGE_HEIGHT, SPATIUM_MPOS_UNITS, Page, RenderedMeasure
+from mscz_formatter.mscx.edits import (
+    append_child,
+    insert_child,
+    remove_child,
+    remove_children,
+)
+from mscz_formatter.mscx.models import MAX_PAGE_HEIGHT, SPATIUM_MPOS_UNITS, Page
+from mscz_formatter.mscx.plan import LayoutPlan, plan_from_pages
+from mscz_formatter.xml_backend import ET
 
 LOGGER = getLogger("mscz_formatter")
 
@@ -69,20 +77,18 @@ def _insert_before_voice(measure: ET.Element, child: ET.Element) -> None:
             index = i
             break
         index = i + 1
-    measure.insert(index, child)
+    insert_child(measure, index, child)
 
 
 def scrub_layout_breaks(staff: ET.Element) -> None:
     for measure in staff.findall("Measure"):
         for lb in list(measure.findall("LayoutBreak")):
-            measure.remove(lb)
+            remove_child(measure, lb)
 
 
 def scrub_vs_blank_frames(staff: ET.Element) -> None:
     """Remove previously inserted V.S. blank-page frames (not title VBoxes)."""
-    for child in list(staff):
-        if _is_vs_blank_frame(child):
-            staff.remove(child)
+    remove_children(staff, _is_vs_blank_frame)
 
 
 def _set_break_on_measure(measure: ET.Element, subtype: str) -> None:
@@ -90,45 +96,47 @@ def _set_break_on_measure(measure: ET.Element, subtype: str) -> None:
     if existing is not None:
         st = existing.find("subtype")
         if st is None:
-            st = ET.SubElement(existing, "subtype")
+            st = ET.Element("subtype")
+            append_child(existing, st)
         st.text = subtype
         return
     _insert_before_voice(measure, _make_layout_break(subtype))
 
 
-def _break_target_hashes(measure: RenderedMeasure) -> list[int]:
+class _StaffIndex:
     """
-    Hashes of MSCX measures that need the layout break for this RenderedMeasure.
+    Staff child positions, built once per apply and kept valid across inserts.
 
-    For a normal bar: just the source measure.
-    For an MM rest: both the visible span measure and the last hidden measure
-    covered by that rest (MuseScore keeps both in sync).
+    Positions are those at build time; ``_inserted`` holds (sorted) the build
+    positions that have had an element inserted after them, so a child's
+    current position is its build position plus the inserts up to it. Saves
+    rescanning the staff for every V.S. frame on long parts.
     """
-    hashes = [measure.source_measure_hash]
-    if measure.is_mm_rest and measure.mm_rest_hashes:
-        hashes.append(measure.mm_rest_hashes[-1])
-    return hashes
 
+    def __init__(self, staff: ET.Element) -> None:
+        self.staff = staff
+        self._positions = {child: i for i, child in enumerate(staff)}
+        self._inserted: list[int] = []
 
-def _staff_index_of_measure(staff: ET.Element, measure: ET.Element) -> int | None:
-    for i, child in enumerate(staff):
-        if child is measure:
-            return i
-    return None
+    def insert_after(self, child: ET.Element, new: ET.Element) -> bool:
+        built = self._positions.get(child)
+        if built is None:
+            return False
+        # After ``child`` and anything already inserted after it.
+        insert_child(self.staff, built + bisect_right(self._inserted, built) + 1, new)
+        insort(self._inserted, built)
+        return True
 
 
-def _insert_vs_blank_after_measure(staff: ET.Element, measure: ET.Element) -> None:
-    idx = _staff_index_of_measure(staff, measure)
-    if idx is None:
+def _insert_vs_blank_after_measure(index: _StaffIndex, measure: ET.Element) -> None:
+    if not index.insert_after(measure, _make_vs_blank_frame()):
         LOGGER.warning("Could not locate measure for V.S. blank frame; skipping")
-        return
-    staff.insert(idx + 1, _make_vs_blank_frame())
 
 
 def apply_pages_to_staff(
     staff: ET.Element,
     pages: list[Page],
-    measures_by_hash: dict[int, ET.Element],
+    measures: list[ET.Element],
 ) -> None:
     """
     Scrub existing layout breaks, then write line breaks at the end of each line
@@ -137,28 +145,38 @@ def apply_pages_to_staff(
     Blank ``is_blank_vs`` pages become a full-page VBox with ``V.S.`` text
     inserted after the preceding page's last measure.
 
-    ``measures_by_hash`` must refer to the same Element objects under ``staff``.
+    ``measures`` maps ``SourceMeasure.index`` to the same Element objects
+    under ``staff``.
     """
+    apply_plan_to_staff(staff, plan_from_pages(pages), measures)
+
+
+def apply_plan_to_staff(
+    staff: ET.Element,
+    plan: LayoutPlan,
+    measures: list[ET.Element],
+) -> None:
+    """``apply_pages_to_staff`` for an already-reduced (e.g. cached) plan."""
     scrub_vs_blank_frames(staff)
     scrub_layout_breaks(staff)
+    index = _StaffIndex(staff)
 
-    for page_idx, page in enumerate(pages):
+    for page_idx, page in enumerate(plan):
         if page.is_blank_vs:
             continue
 
-        trailing = pages[page_idx + 1 :]
+        trailing = plan[page_idx + 1 :]
         is_last_music_page = not any(not p.is_blank_vs for p in trailing)
 
-        for line_idx, line in enumerate(page.lines):
-            if not line.measures:
+        for line_idx, targets in enumerate(page.line_breaks):
+            if not targets:
                 continue
-            last = line.measures[-1]
 
-            is_last_line = line_idx == len(page.lines) - 1
+            is_last_line = line_idx == len(page.line_breaks) - 1
             next_is_blank = (
                 is_last_line
-                and page_idx + 1 < len(pages)
-                and pages[page_idx + 1].is_blank_vs
+                and page_idx + 1 < len(plan)
+                and plan[page_idx + 1].is_blank_vs
             )
             if is_last_line and (not is_last_music_page or next_is_blank):
                 subtype = "page"
@@ -168,28 +186,32 @@ def apply_pages_to_staff(
                 continue
 
             target_measure: ET.Element | None = None
-            for measure_hash in _break_target_hashes(last):
-                measure = measures_by_hash.get(measure_hash)
-                if measure is None:
+            for measure_idx in targets:
+                if not 0 <= measure_idx < len(measures):
                     LOGGER.warning(
-                        "Missing measure for hash %s; skipping layout break",
-                        measure_hash,
+                        "Missing measure for index %s; skipping layout break",
+                        measure_idx,
                     )
                     continue
+                measure = measures[measure_idx]
                 _set_break_on_measure(measure, subtype)
                 target_measure = measure
 
             if next_is_blank and target_measure is not None:
-                _insert_vs_blank_after_measure(staff, target_measure)
+                _insert_vs_blank_after_measure(index, target_measure)
 
 
 def apply_layout_to_tree(
     tree: ET.ElementTree,
-    pages: list[Page],
-    measures_by_hash: dict[int, ET.Element],
+    pages: list[Page] | LayoutPlan,
+    measures: list[ET.Element],
     mscx_path: str,
 ) -> None:
-    """Mutate ``tree`` in place and write it back to ``mscx_path``."""
+    """
+    Mutate ``tree`` in place with ``pages`` (or their ``LayoutPlan``).
+    ``mscx_path`` is only used in messages; the caller serializes the tree
+    (see ``MscxDocuments.write_all``).
+    """
     root = tree.getroot()
     score = root.find("Score")
     if score is None:
@@ -198,8 +220,5 @@ def apply_layout_to_tree(
     if not staves:
         raise ValueError(f"No <Staff> tag found in {mscx_path}")
 
-    apply_pages_to_staff(staves[0], pages, measures_by_hash)
-
-    with open(mscx_path, "wb") as f:
-        ET.indent(tree, space="  ", level=0)
-        tree.write(f, encoding="utf-8", xml_declaration=True)
+    plan = pages if isinstance(pages, tuple) else plan_from_pages(pages)
+    apply_plan_to_staff(staves[0], plan, measures)
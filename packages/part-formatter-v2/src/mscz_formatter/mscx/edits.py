@@ -0,0 +1,80 @@
+"""
+Child inserts / removals that keep an indented MSCX tree indented.
+
+MuseScore writes MSCX two spaces per level. Editing through these helpers
+leaves the whitespace around the edit exactly as ``ET.indent`` would, so
+write-back serializes the tree as-is instead of re-indenting every element
+of a multi-megabyte score for a handful of breaks and frames.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from mscz_formatter.xml_backend import ET
+
+INDENT = "  "
+
+
+def _is_blank(text: str | None) -> bool:
+    return text is None or not text.strip()
+
+
+def _child_indentation(parent: ET.Element) -> str:
+    """Newline + indentation of ``parent``'s children."""
+    if len(parent) and _is_blank(parent.text) and parent.text:
+        return parent.text
+    # Childless parent: its own indentation is its tail unless it is the
+    # last child, which MuseScore never leaves empty for the tags we edit.
+    tail = parent.tail if parent.tail and _is_blank(parent.tail) else "\n"
+    return tail + INDENT
+
+
+def insert_child(parent: ET.Element, index: int, child: ET.Element) -> None:
+    """``parent.insert(index, child)``, indenting ``child`` and its neighbours."""
+    indentation = _child_indentation(parent)
+    closing = indentation[: -len(INDENT)]
+    count = len(parent)
+    index = max(0, min(index, count))
+
+    ET.indent(child, space=INDENT, level=(len(indentation) - 1) // len(INDENT))
+    if count == 0:
+        if _is_blank(parent.text):
+            parent.text = indentation
+        child.tail = closing
+    elif index == count:
+        # Keep whatever closing whitespace the file had.
+        last_tail = parent[-1].tail
+        child.tail = last_tail if last_tail and _is_blank(last_tail) else closing
+        parent[-1].tail = indentation
+    else:
+        child.tail = indentation
+    parent.insert(index, child)
+
+
+def append_child(parent: ET.Element, child: ET.Element) -> None:
+    insert_child(parent, len(parent), child)
+
+
+def remove_child(parent: ET.Element, child: ET.Element) -> None:
+    """``parent.remove(child)``; a new last child takes over the closing tail."""
+    if len(parent) > 1 and parent[-1] is child:
+        parent[-2].tail = child.tail
+    parent.remove(child)
+
+
+def remove_children(parent: ET.Element, predicate: Callable[[ET.Element], bool]) -> int:
+    """
+    Remove every child matching ``predicate`` in one pass over ``parent``
+    (``remove_child`` in a loop rescans the children for each removal).
+    Returns how many were removed.
+    """
+    children = list(parent)
+    kept = [child for child in children if not predicate(child)]
+    removed = len(children) - len(kept)
+    if not removed:
+        return 0
+    if kept and kept[-1] is not children[-1]:
+        kept[-1].tail = children[-1].tail
+    parent[:] = kept
+    return removed
@@ -1,7 +1,14 @@
 # Dynamic Programming approach to solving line breaks
-from collections.abc import Callable
+#
+# Candidate lines are inclusive (start, end) index ranges over a
+# MeasureColumns; the measure after the line (if any) is end + 1.
+#
+# The per-candidate functions are the reference implementation. The
+# ``*_batch`` variants score every candidate end for one start in a single
+# call (what the DP uses) and must return bit-identical values.
+from collections.abc import Callable, Sequence
 
-from mscz_formatter.mscx.models import Line, RenderedMeasure
+from mscz_formatter.mscx.models import MeasureColumns
 
 MEASURES_PER_LINE = 6
 ALTERNATE_LINE_LENGTH = 4
@@ -18,16 +25,16 @@ def conceptual_length_fits(c_count: int) -> bool:
     )
 
 
-def _line_has_mm_rest(line: Line) -> bool:
-    return any(m.is_mm_rest for m in line.measures)
+def _line_has_mm_rest(cols: MeasureColumns, start: int, end: int) -> bool:
+    return cols.line_mm_rest_count(start, end) > 0
 
 
-def allows_over_soft_c_count(line: Line) -> bool:
+def allows_over_soft_c_count(cols: MeasureColumns, start: int, end: int) -> bool:
     """Past MAX_LINE_C_COUNT, keep growing only when the line has an MM rest."""
-    return _line_has_mm_rest(line)
+    return _line_has_mm_rest(cols, start, end)
 
 
-def get_length_penalty(line: Line, next_measure: RenderedMeasure) -> float:
+def get_length_penalty(cols: MeasureColumns, start: int, end: int) -> float:
     """
     Prefer packing non-final lines to mpl.
 
@@ -35,15 +42,15 @@ def get_length_penalty(line: Line, next_measure: RenderedMeasure) -> float:
     allowed with only a mild penalty — that matches the "break before"
     MM-rest rule.
     """
-    c = line.c_count
+    c = cols.line_c_count(start, end)
     if c == MEASURES_PER_LINE:
         return 0.0
 
     # Greedy-equivalent: flush before a mid-line MM rest when misaligned
-    if next_measure.is_mm_rest and c % MEASURES_PER_LINE != 0:
+    if cols.is_mm_rest[end + 1] and c % MEASURES_PER_LINE != 0:
         return 0.2 * abs(c - MEASURES_PER_LINE) / MEASURES_PER_LINE
 
-    if conceptual_length_fits(c) and any(m.is_mm_rest for m in line.measures):
+    if conceptual_length_fits(c) and _line_has_mm_rest(cols, start, end):
         return 0.5 * abs(c - MEASURES_PER_LINE) / MEASURES_PER_LINE
 
     if conceptual_length_fits(c):
@@ -53,7 +60,7 @@ def get_length_penalty(line: Line, next_measure: RenderedMeasure) -> float:
     return 5.0
 
 
-def get_rehearsal_mark_penalty(line: Line, next_measure: RenderedMeasure) -> float:
+def get_rehearsal_mark_penalty(cols: MeasureColumns, start: int, end: int) -> float:
     """
     Rehearsal marks should start new lines.
     - Penalize RMs that appear mid-line
@@ -62,27 +69,20 @@ def get_rehearsal_mark_penalty(line: Line, next_measure: RenderedMeasure) -> flo
     Exception: an RM on a later MM rest in a consecutive MM-rest run does
     not count as a buried mid-line mark (pairing the rests is preferred).
     """
-    penalty = 0.0
-    for i, m in enumerate(line.measures):
-        if not m.has_rehearsal_mark or i == 0:
-            continue
-        prev = line.measures[i - 1]
-        if m.is_mm_rest and prev.is_mm_rest:
-            continue
-        penalty += 1.0
-    if next_measure.has_rehearsal_mark:
+    penalty = float(cols.line_buried_rehearsal_marks(start, end))
+    if cols.has_rehearsal_mark[end + 1]:
         penalty -= 1.0
     return penalty
 
 
-def get_double_bar_boost(line: Line, next_measure: RenderedMeasure) -> float:
+def get_double_bar_boost(cols: MeasureColumns, start: int, end: int) -> float:
     """Prefer ending a line on a double bar."""
-    if line.measures[-1].has_double_bar:
+    if cols.has_double_bar[end]:
         return 1.0
     return 0.0
 
 
-def get_mm_rest_penalty(line: Line, next_measure: RenderedMeasure) -> float:
+def get_mm_rest_penalty(cols: MeasureColumns, start: int, end: int) -> float:
     """
     MM-rest preferences:
     - Don't split consecutive MM rests
@@ -90,22 +90,24 @@ def get_mm_rest_penalty(line: Line, next_measure: RenderedMeasure) -> float:
       the combined conceptual length still fits (unless the line already
       has a pair of MM rests — those should end cleanly)
     """
-    last = line.measures[-1]
+    last_is_mm_rest = cols.is_mm_rest[end]
+    next_is_mm_rest = cols.is_mm_rest[end + 1]
+    c = cols.line_c_count(start, end)
     penalty = 0.0
-    mm_count = sum(1 for m in line.measures if m.is_mm_rest)
+    mm_count = cols.line_mm_rest_count(start, end)
 
-    if last.is_mm_rest and next_measure.is_mm_rest:
+    if last_is_mm_rest and next_is_mm_rest:
         # Strong enough to beat break-before-RM + DB when pairing 8+8 etc.
         penalty += 1.25
 
     # Prefer not breaking right after MM rests when the next measures
     # would still fit on an aligned over-mpl line
     if (
-        last.is_mm_rest
-        and not next_measure.is_mm_rest
+        last_is_mm_rest
+        and not next_is_mm_rest
         and mm_count < 2
-        and conceptual_length_fits(line.c_count)
-        and line.c_count < MAX_LINE_C_COUNT
+        and conceptual_length_fits(c)
+        and c < MAX_LINE_C_COUNT
     ):
         # Mild nudge to keep going when remaining room exists
         penalty += 0.25
@@ -113,21 +115,21 @@ def get_mm_rest_penalty(line: Line, next_measure: RenderedMeasure) -> float:
     return penalty
 
 
-def get_paired_mm_rest_boost(line: Line, next_measure: RenderedMeasure) -> float:
+def get_paired_mm_rest_boost(cols: MeasureColumns, start: int, end: int) -> float:
     """
     Prefer ending a line that places two MM rests together.
 
     Rewards a clean break after the pair (line ends on an MM rest) so
     trailing music is not absorbed just to fill space.
     """
-    if not line.measures[-1].is_mm_rest:
+    if not cols.is_mm_rest[end]:
         return 0.0
-    mm_count = sum(1 for m in line.measures if m.is_mm_rest)
+    mm_count = cols.line_mm_rest_count(start, end)
     return 1.25 if mm_count >= 2 else 0.0
 
 
 MULTIPLIERS_AND_FUNCTIONS: list[
-    tuple[float, Callable[[Line, RenderedMeasure], float]]
+    tuple[float, Callable[[MeasureColumns, int, int], float]]
 ] = [
     (100, get_length_penalty),
     (50, get_rehearsal_mark_penalty),
@@ -137,16 +139,16 @@ MULTIPLIERS_AND_FUNCTIONS: list[
 ]
 
 
-def _is_unsplittable_mm_rest_line(line: Line) -> bool:
+def _is_unsplittable_mm_rest_line(cols: MeasureColumns, start: int, end: int) -> bool:
     """A lone MM rest cannot be subdivided, even if its span exceeds the soft ceiling."""
     return (
-        len(line.measures) == 1
-        and line.measures[0].is_mm_rest
-        and (line.measures[0].mm_rest_span or 0) > 0
+        start == end
+        and bool(cols.is_mm_rest[start])
+        and cols.mm_rest_span[start] > 0
     )
 
 
-def line_is_candidate(line: Line) -> bool:
+def line_is_candidate(cols: MeasureColumns, start: int, end: int) -> bool:
     """
     Soft structural filter used by the DP loop (in addition to width).
 
@@ -156,22 +158,23 @@ def line_is_candidate(line: Line) -> bool:
     and lone unsplittable MM rests remain eligible; everything else is cut
     off by ABSOLUTE_MAX_LINE_C_COUNT in the DP loop.
     """
-    if not line.measures:
+    if end < start:
         return False
-    if not line.is_valid():
+    if not cols.line_is_valid(start, end):
         return False
-    if line.c_count > ABSOLUTE_MAX_LINE_C_COUNT:
-        return _is_unsplittable_mm_rest_line(line)
-    if _is_unsplittable_mm_rest_line(line):
+    c = cols.line_c_count(start, end)
+    if c > ABSOLUTE_MAX_LINE_C_COUNT:
+        return _is_unsplittable_mm_rest_line(cols, start, end)
+    if _is_unsplittable_mm_rest_line(cols, start, end):
         return True
-    if line.c_count <= MEASURES_PER_LINE:
+    if c <= MEASURES_PER_LINE:
         return True
-    return conceptual_length_fits(line.c_count) and _line_has_mm_rest(line)
+    return conceptual_length_fits(c) and _line_has_mm_rest(cols, start, end)
 
 
-def _last_line_cost(line: Line) -> float:
+def _last_line_cost(cols: MeasureColumns, start: int, end: int) -> float:
     """Mild underfull / misalignment cost so we still prefer packed endings."""
-    c = line.c_count
+    c = cols.line_c_count(start, end)
     if c == MEASURES_PER_LINE:
         return 0.0
     if conceptual_length_fits(c):
@@ -180,11 +183,140 @@ def _last_line_cost(line: Line) -> float:
     return abs(MEASURES_PER_LINE - c) * 0.5
 
 
-def line_cost(line: Line, next_measure: RenderedMeasure | None) -> float:
-    if next_measure is None:
-        return _last_line_cost(line)
+def line_cost(cols: MeasureColumns, start: int, end: int) -> float:
+    """Cost of a line over measures[start..end] (inclusive)."""
+    if end + 1 >= len(cols):
+        return _last_line_cost(cols, start, end)
 
     cost = 0.0
     for multiplier, func in MULTIPLIERS_AND_FUNCTIONS:
-        cost += multiplier * func(line, next_measure)
+        cost += multiplier * func(cols, start, end)
     return cost
+
+
+# --- Batch scoring: one start, many candidate ends ---
+
+
+def get_length_penalty_batch(
+    cols: MeasureColumns, start: int, ends: Sequence[int]
+) -> list[float]:
+    c_prefix = cols.c_count_prefix
+    mm_prefix = cols.mm_rest_prefix
+    is_mm_rest = cols.is_mm_rest
+    c_base = c_prefix[start]
+    mm_base = mm_prefix[start]
+    res: list[float] = []
+    for end in ends:
+        c = c_prefix[end + 1] - c_base
+        if c == MEASURES_PER_LINE:
+            res.append(0.0)
+        elif is_mm_rest[end + 1] and c % MEASURES_PER_LINE != 0:
+            res.append(0.2 * abs(c - MEASURES_PER_LINE) / MEASURES_PER_LINE)
+        elif conceptual_length_fits(c) and mm_prefix[end + 1] - mm_base > 0:
+            res.append(0.5 * abs(c - MEASURES_PER_LINE) / MEASURES_PER_LINE)
+        elif conceptual_length_fits(c):
+            res.append(2.0)
+        else:
+            res.append(5.0)
+    return res
+
+
+def get_rehearsal_mark_penalty_batch(
+    cols: MeasureColumns, start: int, ends: Sequence[int]
+) -> list[float]:
+    buried_prefix = cols.buried_rehearsal_mark_prefix
+    has_rehearsal_mark = cols.has_rehearsal_mark
+    base = buried_prefix[start + 1]
+    return [
+        float(buried_prefix[end + 1] - base) - (1.0 if has_rehearsal_mark[end + 1] else 0.0)
+        for end in ends
+    ]
+
+
+def get_double_bar_boost_batch(
+    cols: MeasureColumns, start: int, ends: Sequence[int]
+) -> list[float]:
+    has_double_bar = cols.has_double_bar
+    return [1.0 if has_double_bar[end] else 0.0 for end in ends]
+
+
+def get_mm_rest_penalty_batch(
+    cols: MeasureColumns, start: int, ends: Sequence[int]
+) -> list[float]:
+    c_prefix = cols.c_count_prefix
+    mm_prefix = cols.mm_rest_prefix
+    is_mm_rest = cols.is_mm_rest
+    c_base = c_prefix[start]
+    mm_base = mm_prefix[start]
+    res: list[float] = []
+    for end in ends:
+        penalty = 0.0
+        if is_mm_rest[end]:
+            if is_mm_rest[end + 1]:
+                penalty += 1.25
+            else:
+                c = c_prefix[end + 1] - c_base
+                if (
+                    mm_prefix[end + 1] - mm_base < 2
+                    and conceptual_length_fits(c)
+                    and c < MAX_LINE_C_COUNT
+                ):
+                    penalty += 0.25
+        res.append(penalty)
+    return res
+
+
+def get_paired_mm_rest_boost_batch(
+    cols: MeasureColumns, start: int, ends: Sequence[int]
+) -> list[float]:
+    mm_prefix = cols.mm_rest_prefix
+    is_mm_rest = cols.is_mm_rest
+    mm_base = mm_prefix[start]
+    return [
+        1.25 if is_mm_rest[end] and mm_prefix[end + 1] - mm_base >= 2 else 0.0
+        for end in ends
+    ]
+
+
+_BATCH_FUNCTIONS: dict[
+    Callable[[MeasureColumns, int, int], float],
+    Callable[[MeasureColumns, int, Sequence[int]], list[float]],
+] = {
+    get_length_penalty: get_length_penalty_batch,
+    get_rehearsal_mark_penalty: get_rehearsal_mark_penalty_batch,
+    get_double_bar_boost: get_double_bar_boost_batch,
+    get_mm_rest_penalty: get_mm_rest_penalty_batch,
+    get_paired_mm_rest_boost: get_paired_mm_rest_boost_batch,
+}
+
+# MULTIPLIERS_AND_FUNCTIONS with each term swapped for its column-wise twin,
+# so the weights live in one place.
+BATCH_MULTIPLIERS_AND_FUNCTIONS: list[
+    tuple[float, Callable[[MeasureColumns, int, Sequence[int]], list[float]]]
+] = [
+    (multiplier, _BATCH_FUNCTIONS[func])
+    for multiplier, func in MULTIPLIERS_AND_FUNCTIONS
+]
+
+
+def line_costs(cols: MeasureColumns, start: int, ends: Sequence[int]) -> list[float]:
+    """
+    ``[line_cost(cols, start, end) for end in ends]``, scored column-wise.
+
+    ``ends`` must be ascending. Terms are accumulated in the same order as
+    ``line_cost`` so each value is bit-identical to the scalar path.
+    """
+    n = len(cols)
+    # Only the final candidate can be the last line of the part.
+    body = list(ends)
+    last: float | None = None
+    if body and body[-1] + 1 >= n:
+        last = _last_line_cost(cols, start, body.pop())
+
+    costs = [0.0] * len(body)
+    for multiplier, batch in BATCH_MULTIPLIERS_AND_FUNCTIONS:
+        for k, value in enumerate(batch(cols, start, body)):
+            costs[k] += multiplier * value
+    if last is not None:
+        costs.append(last)
+    return costs
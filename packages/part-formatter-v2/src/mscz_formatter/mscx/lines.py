@@ -1,7 +1,7 @@
 """
 File for formatting measures into lines via dynamic programming.
 """
-from functools import lru_cache
+from array import array
 from math import inf
 
 from mscz_formatter.mscx.lib.line_cost import (
@@ -9,11 +9,15 @@ from mscz_formatter.mscx.lib.line_cost import (
     ALTERNATE_LINE_LENGTH,
     MAX_LINE_C_COUNT,
     MEASURES_PER_LINE,
-    allows_over_soft_c_count,
-    line_cost,
+    line_costs,
     line_is_candidate,
 )
-from mscz_formatter.mscx.models import Line, RenderedMeasure
+from mscz_formatter.mscx.models import (
+    MAX_LINE_WIDTH,
+    Line,
+    MeasureColumns,
+    RenderedMeasure,
+)
 
 # Re-export for callers / tests
 __all__ = [
@@ -25,64 +29,135 @@ __all__ = [
 ]
 
 
-def add_line_breaks(measures: list[RenderedMeasure]) -> list[Line]:
-    @lru_cache(maxsize=None)
-    def solve(start_idx: int) -> tuple[float, tuple[Line, ...]]:
-        if start_idx >= len(measures):
-            return 0.0, ()
-
-        best_cost = inf
-        best_lines: tuple[Line, ...] = ()
-
-        current = Line(measures=[], rm_count=0, c_count=0)
-
-        for end_idx in range(start_idx, len(measures)):
-            current.add_measure(measures[end_idx])
-
-            # Width only grows; stop. Soft c_count ceiling still allows MM
-            # lines to grow toward an aligned length (e.g. 15+1 → 16) and
-            # lone oversized MM rests (cannot be split across lines).
-            if not current.is_valid():
-                break
-            if current.c_count > ABSOLUTE_MAX_LINE_C_COUNT and not (
-                len(current.measures) == 1 and current.measures[0].is_mm_rest
-            ):
-                break
-            if (
-                current.c_count > MAX_LINE_C_COUNT
-                and not allows_over_soft_c_count(current)
-            ):
-                break
-
-            # Hard rule: never end a line mid multi-measure % repeat.
-            # Keep growing until the group completes (do not break).
-            if current.measures[-1].continues_measure_repeat:
-                continue
-
-            if not line_is_candidate(current):
-                continue
-
-            candidate = Line(
-                measures=current.measures.copy(),
-                rm_count=current.rm_count,
-                c_count=current.c_count,
-            )
-
-            next_measure = (
-                measures[end_idx + 1] if end_idx + 1 < len(measures) else None
+def _lines_from_ends(
+    measures: list[RenderedMeasure],
+    cols: MeasureColumns,
+    best_end: array,
+) -> list[Line]:
+    """Follow the DP's best-break chain from 0 and materialize each Line once."""
+    lines: list[Line] = []
+    start = 0
+    while start < len(cols):
+        end = best_end[start]
+        lines.append(
+            Line(
+                measures=measures[start : end + 1],
+                rm_count=end + 1 - start,
+                c_count=cols.line_c_count(start, end),
             )
-            current_cost = line_cost(candidate, next_measure)
-            remaining_cost, remaining_lines = solve(end_idx + 1)
-            total_cost = current_cost + remaining_cost
-
-            if total_cost < best_cost:
-                best_cost = total_cost
-                best_lines = (candidate,) + remaining_lines
-
-        return best_cost, best_lines
-
-    _, lines = solve(0)
-    return list(lines)
+        )
+        start = end + 1
+    return lines
+
+
+def _furthest_feasible_ends(cols: MeasureColumns) -> array:
+    """
+    ``limit[s]``: the last end a line starting at ``s`` may grow to before
+    the width, hard c_count or soft c_count ceiling stops it.
+
+    A line stops growing at the first end where it is too wide, passes
+    ABSOLUTE_MAX_LINE_C_COUNT (unless it is a lone MM rest), or passes
+    MAX_LINE_C_COUNT with no MM rest in it (see ``allows_over_soft_c_count``).
+    Each of those first ends is non-decreasing in ``s``, so one forward
+    pointer per ceiling finds all of them in O(n).
+    """
+    n = len(cols)
+    first_mm_rest = array("q", [n] * (n + 1))
+    for i in range(n - 1, -1, -1):
+        first_mm_rest[i] = i if cols.is_mm_rest[i] else first_mm_rest[i + 1]
+
+    limit = array("q", [-1] * n)
+    width_end = hard_end = soft_end = 0
+    for s in range(n):
+        width_end = max(width_end, s)
+        while width_end < n and cols.line_width(s, width_end) <= MAX_LINE_WIDTH:
+            width_end += 1
+        hard_end = max(hard_end, s)
+        while hard_end < n and cols.line_c_count(s, hard_end) <= ABSOLUTE_MAX_LINE_C_COUNT:
+            hard_end += 1
+        soft_end = max(soft_end, s)
+        while soft_end < n and cols.line_c_count(s, soft_end) <= MAX_LINE_C_COUNT:
+            soft_end += 1
+
+        # A lone MM rest may exceed the hard ceiling; the next bar cannot.
+        stop_hard = s + 1 if hard_end == s and cols.is_mm_rest[s] else hard_end
+        # Past the soft ceiling only lines that already hold an MM rest grow.
+        stop_soft = soft_end if soft_end < first_mm_rest[s] else n
+        limit[s] = min(width_end, stop_hard, stop_soft) - 1
+    return limit
+
+
+def _breakable_ends(cols: MeasureColumns) -> tuple[list[int], array]:
+    """
+    Ends a line may break after, and for each index ``i`` the position in
+    that list of the first breakable end ``>= i`` (length n + 1).
+
+    Hard rule: never end a line mid multi-measure % repeat, so repeat
+    interiors are simply absent from the list.
+    """
+    n = len(cols)
+    ends = [i for i in range(n) if not cols.continues_measure_repeat[i]]
+    position = array("q", [len(ends)] * (n + 1))
+    k = len(ends)
+    for i in range(n - 1, -1, -1):
+        if not cols.continues_measure_repeat[i]:
+            k -= 1
+        position[i] = k
+    return ends, position
+
+
+def add_line_breaks(
+    measures: list[RenderedMeasure],
+    *,
+    stats: dict[str, int] | None = None,
+) -> list[Line]:
+    """
+    Right-to-left DP over line start indices.
+
+    ``best_cost[i]`` is the cheapest way to lay out measures[i:], and
+    ``best_end[i]`` the (inclusive) end index of the first line in that
+    layout. Memory is O(n) and there is no recursion, so long concatenated
+    parts cannot hit the interpreter's recursion limit.
+
+    Per start, only breakable ends up to the precomputed furthest feasible
+    end are visited (``_furthest_feasible_ends``, ``_breakable_ends``).
+
+    When given, ``stats`` receives ``line_dp_states`` (start indices) and
+    ``line_dp_candidates`` (scored (start, end) windows).
+    """
+    cols = MeasureColumns.from_measures(measures)
+    n = len(cols)
+    best_cost = array("d", [inf] * (n + 1))
+    best_end = array("q", [-1] * (n + 1))
+    best_cost[n] = 0.0
+    limit = _furthest_feasible_ends(cols)
+    breakable, position = _breakable_ends(cols)
+    scored = 0
+
+    for start_idx in range(n - 1, -1, -1):
+        candidate_ends = [
+            end_idx
+            for end_idx in breakable[position[start_idx] : position[limit[start_idx] + 1]]
+            if line_is_candidate(cols, start_idx, end_idx)
+        ]
+
+        # Score every candidate for this start in one batch, then pick the
+        # first strict minimum (same tie-breaking as scanning ends in order).
+        costs = line_costs(cols, start_idx, candidate_ends)
+        scored += len(candidate_ends)
+        for end_idx, current_cost in zip(candidate_ends, costs):
+            total_cost = current_cost + best_cost[end_idx + 1]
+            if total_cost < best_cost[start_idx]:
+                best_cost[start_idx] = total_cost
+                best_end[start_idx] = end_idx
+
+    if stats is not None:
+        stats["line_dp_states"] = stats.get("line_dp_states", 0) + n
+        stats["line_dp_candidates"] = stats.get("line_dp_candidates", 0) + scored
+
+    if best_cost[0] == inf:
+        return []
+    return _lines_from_ends(measures, cols, best_end)
 
 
 # Backwards-compatible alias for tests
@@ -2,25 +2,29 @@
 Code to load mscx files into memory and return the dataclasses
 """
 
+from __future__ import annotations
+
 from typing import TypedDict
-import xml.etree.ElementTree as ET
 
 from mscz_formatter.mscx.models import (
     MEASURE_REPEAT_WIDTH_FACTOR,
+    MeasureFeatures,
     RenderedMeasure,
     SourceMeasure,
 )
+from mscz_formatter.xml_backend import ET, parse
 
 
 class MusescoreFileData(TypedDict):
     tree: ET.ElementTree
-    measures_by_hash: dict[int, ET.Element]
+    # SourceMeasure.index → <Measure> element on the first staff
+    measures: list[ET.Element]
     source_measures: list[SourceMeasure]
     rendered_measures: list[RenderedMeasure]
 
 
 def _load_xml_tree(path: str) -> ET.ElementTree:
-    return ET.parse(path, ET.XMLParser())
+    return parse(path)
 
 
 def _load_xml_file(path: str) -> ET.Element:
@@ -31,40 +35,11 @@ def measure_is_mm_rest_start(m: ET.Element) -> int:
     """
     Returns the length of the MM rest, and 0 if it is not a MM rest
     """
-    len_prop = m.attrib.get("len", None)
-    mm_tag = m.find("multiMeasureRest")
-
-    if mm_tag is not None:
-        return int(mm_tag.text)
-    if len_prop is not None:
-        top, bottom = len_prop.split("/")
-        res = int(top) / int(bottom)
-        assert res.is_integer(), f"MM Rest 'len' property was not a whole number: found {len_prop}"
-        return int(res)
-    return 0
-
-
-def _measure_repeat_count(m: ET.Element) -> int | None:
-    """Position within a % measure-repeat run (1..N), or None if not in one."""
-    tag = m.find("measureRepeatCount")
-    if tag is None or not tag.text:
-        return None
-    return int(tag.text)
-
-
-def _measure_repeat_subtype(m: ET.Element) -> int | None:
-    """N for an N-bar measure repeat symbol, typically on count==2 for N=4."""
-    mr = m.find(".//MeasureRepeat")
-    if mr is None:
-        return None
-    subtype = mr.find("subtype")
-    if subtype is None or not subtype.text:
-        return None
-    return int(subtype.text)
+    return MeasureFeatures.from_element(m).mm_rest_len
 
 
 def _measure_repeat_annotations(
-    ordered_xml_measures: list[ET.Element],
+    features: list[MeasureFeatures],
 ) -> list[tuple[int | None, int | None]]:
     """
     For each MSCX measure, return (span, 1-based index) if it belongs to a
@@ -74,22 +49,22 @@ def _measure_repeat_annotations(
     ``measureRepeatCount`` 1..N; the ``MeasureRepeat`` symbol (subtype=N)
     usually sits on count 2.
     """
-    n = len(ordered_xml_measures)
+    n = len(features)
     annotations: list[tuple[int | None, int | None]] = [(None, None)] * n
     i = 0
     while i < n:
-        if _measure_repeat_count(ordered_xml_measures[i]) != 1:
+        if features[i].measure_repeat_count != 1:
             i += 1
             continue
 
         subtype: int | None = None
         j = i
         while j < n:
-            count = _measure_repeat_count(ordered_xml_measures[j])
+            count = features[j].measure_repeat_count
             expected = j - i + 1
             if count != expected:
                 break
-            found = _measure_repeat_subtype(ordered_xml_measures[j])
+            found = features[j].measure_repeat_subtype
             if found is not None:
                 subtype = found
             j += 1
@@ -110,7 +85,7 @@ def _measure_repeat_annotations(
     return annotations
 
 
-def _hidden_by_mm_rest_flags(ordered_xml_measures: list[ET.Element]) -> list[bool]:
+def _hidden_by_mm_rest_flags(features: list[MeasureFeatures]) -> list[bool]:
     """
     MuseScore stores each multi-measure rest as:
 
@@ -120,10 +95,10 @@ def _hidden_by_mm_rest_flags(ordered_xml_measures: list[ET.Element]) -> list[boo
     pairing against .mpos elements. Older logic only hid the trailing bars, which
     left the first underlying as a ghost rendered measure (e.g. M2R before M3*(8)R).
     """
-    n = len(ordered_xml_measures)
+    n = len(features)
     hidden = [False] * n
-    for i, m in enumerate(ordered_xml_measures):
-        mm_rest_len = measure_is_mm_rest_start(m)
+    for i, f in enumerate(features):
+        mm_rest_len = f.mm_rest_len
         if mm_rest_len == 0:
             continue
         if i > 0:
@@ -134,56 +109,61 @@ def _hidden_by_mm_rest_flags(ordered_xml_measures: list[ET.Element]) -> list[boo
     return hidden
 
 
-def load_mscx_file(
-    mscx_path: str,
-) -> tuple[ET.ElementTree, dict[int, ET.Element], list[SourceMeasure]]:
-    """
-    Load in mscx file, return the parse tree plus measure metadata.
-    """
-    tree = _load_xml_tree(mscx_path)
-    root = tree.getroot()
-    score = root.find("Score")
+def first_staff_measures(tree: ET.ElementTree) -> list[ET.Element]:
+    """The ``<Measure>`` elements of the first staff: what layout breaks go on."""
+    score = tree.getroot().find("Score")
     if score is None:
         raise ValueError("No <Score> tag found in the XML.")
 
     staves = score.findall("Staff")
     staff = staves[0]  # noqa  -- only add layout breaks to the first staff
+    return list(staff.findall("Measure"))
+
+
+def load_mscx_file(
+    mscx_path: str,
+    tree: ET.ElementTree | None = None,
+) -> tuple[ET.ElementTree, list[ET.Element], list[SourceMeasure]]:
+    """
+    Load in mscx file, return the parse tree, the first staff's measure
+    elements (indexed by ``SourceMeasure.index``) and the measure metadata.
+
+    Pass an already-parsed ``tree`` to skip reading ``mscx_path`` again.
 
-    ordered_xml_measures = list(staff.findall("Measure"))
-    hidden_flags = _hidden_by_mm_rest_flags(ordered_xml_measures)
-    repeat_annotations = _measure_repeat_annotations(ordered_xml_measures)
+    Each ``<Measure>`` subtree is walked exactly once (see
+    ``MeasureFeatures.from_element``); everything the planner needs is cached
+    on the returned ``SourceMeasure`` objects.
+    """
+    if tree is None:
+        tree = _load_xml_tree(mscx_path)
+
+    ordered_xml_measures = first_staff_measures(tree)
+    features = [MeasureFeatures.from_element(m) for m in ordered_xml_measures]
+    hidden_flags = _hidden_by_mm_rest_flags(features)
+    repeat_annotations = _measure_repeat_annotations(features)
     ordered_source_measures: list[SourceMeasure] = []
     measure_num = 1
 
-    for i, m in enumerate(ordered_xml_measures):
-        mm_rest_len = measure_is_mm_rest_start(m)
+    for i, (m, f) in enumerate(zip(ordered_xml_measures, features)):
+        mm_rest_len = f.mm_rest_len
         is_mm_rest_span = mm_rest_len != 0
         is_hidden_by_mm_rest = hidden_flags[i]
         repeat_span, repeat_index = repeat_annotations[i]
 
-        # Full-bar rests live under <voice>. MuseScore 4 stores durationType
-        # as a child element; older files may use an attribute.
-        def _duration_type(rest: ET.Element) -> str | None:
-            child = rest.find("durationType")
-            if child is not None and child.text:
-                return child.text.strip()
-            return rest.get("durationType")
-
-        measure_rests = [
-            r for r in m.findall(".//Rest") if _duration_type(r) == "measure"
-        ]
-        is_rest = bool(measure_rests) and m.find(".//Chord") is None
-
         ordered_source_measures.append(
             SourceMeasure(
                 num=measure_num,
-                hash_key=hash(m),
+                index=i,
                 is_mm_rest_span=is_mm_rest_span,
                 is_hidden_by_mm_rest=is_hidden_by_mm_rest,
                 mm_rest_count=mm_rest_len if is_mm_rest_span else None,
-                is_rest=is_rest,
+                is_rest=f.is_rest,
                 measure_repeat_span=repeat_span,
                 measure_repeat_index=repeat_index,
+                has_double_bar=f.has_double_bar,
+                has_rehearsal_mark=f.has_rehearsal_mark,
+                has_existing_line_break=f.has_line_break,
+                outgoing_slur_or_tie_span=f.outgoing_slur_or_tie_span,
             )
         )
 
@@ -192,15 +172,19 @@ def load_mscx_file(
         elif not is_hidden_by_mm_rest:
             measure_num += 1
 
-    measures_by_hash = {hash(m): m for m in ordered_xml_measures}
-    return tree, measures_by_hash, ordered_source_measures
+    return tree, ordered_xml_measures, ordered_source_measures
 
 
 def load_mpos_file(
     mpos_path: str,
-    measures_by_hash: dict[int, ET.Element],
     ordered_source_measures: list[SourceMeasure],
 ) -> list[RenderedMeasure]:
+    """
+    Pair each .mpos element with its visible source measure.
+
+    All line-break props come from the ``SourceMeasure`` cache, so the MSCX
+    tree is not consulted here and the result holds no XML references.
+    """
     root = _load_xml_file(mpos_path)
     elements = root.find("elements")
     if elements is None:
@@ -223,9 +207,8 @@ def load_mpos_file(
             )
 
         sm = ordered_source_measures[source_measure_idx]
-        etm = measures_by_hash[sm.hash_key]
         is_mm_rest = sm.is_mm_rest_span
-        mm_rest_hashes: list[int] = []
+        mm_rest_indices: list[int] = []
         following_hidden = 0
 
         if is_mm_rest:
@@ -235,22 +218,20 @@ def load_mpos_file(
                 source_measure_idx > 0
                 and ordered_source_measures[source_measure_idx - 1].is_hidden_by_mm_rest
             ):
-                mm_rest_hashes.append(
-                    ordered_source_measures[source_measure_idx - 1].hash_key
+                mm_rest_indices.append(
+                    ordered_source_measures[source_measure_idx - 1].index
                 )
             idx = source_measure_idx + 1
             while (
-                len(mm_rest_hashes) < expected_underlyings
+                len(mm_rest_indices) < expected_underlyings
                 and idx < len(ordered_source_measures)
                 and ordered_source_measures[idx].is_hidden_by_mm_rest
             ):
-                mm_rest_hashes.append(ordered_source_measures[idx].hash_key)
+                mm_rest_indices.append(ordered_source_measures[idx].index)
                 following_hidden += 1
                 idx += 1
 
-        outgoing_slur_tie_spans.append(
-            SourceMeasure.get_outgoing_slur_or_tie_span(etm)
-        )
+        outgoing_slur_tie_spans.append(sm.outgoing_slur_or_tie_span)
         width = float(elem.attrib["sx"])
         # Multi-measure % repeats pack tighter than raw .mpos sum suggests.
         if sm.measure_repeat_span is not None and sm.measure_repeat_span >= 2:
@@ -260,13 +241,13 @@ def load_mpos_file(
                 num=measure_num,
                 width=width,
                 height=float(elem.attrib["sy"]),
-                source_measure_hash=sm.hash_key,
+                source_measure_index=sm.index,
                 source_measure=sm,
-                has_double_bar=SourceMeasure.get_has_double_bar(etm),
-                has_rehearsal_mark=SourceMeasure.get_has_rehearsal_mark(etm),
-                has_existing_line_break=SourceMeasure.get_has_line_break(etm),
+                has_double_bar=sm.has_double_bar,
+                has_rehearsal_mark=sm.has_rehearsal_mark,
+                has_existing_line_break=sm.has_existing_line_break,
                 is_mm_rest=is_mm_rest,
-                mm_rest_hashes=mm_rest_hashes,
+                mm_rest_indices=mm_rest_indices,
                 mm_rest_span=sm.mm_rest_count if is_mm_rest else None,
                 measure_repeat_span=sm.measure_repeat_span,
                 measure_repeat_index=sm.measure_repeat_index,
@@ -287,12 +268,16 @@ def load_mpos_file(
     return rendered_measures
 
 
-def load_in(mscx_path: str, mpos_path: str) -> MusescoreFileData:
-    tree, measures_by_hash, ordered_source_measures = load_mscx_file(mscx_path)
-    rendered_measures = load_mpos_file(mpos_path, measures_by_hash, ordered_source_measures)
+def load_in(
+    mscx_path: str,
+    mpos_path: str,
+    tree: ET.ElementTree | None = None,
+) -> MusescoreFileData:
+    tree, measures, ordered_source_measures = load_mscx_file(mscx_path, tree)
+    rendered_measures = load_mpos_file(mpos_path, ordered_source_measures)
     return MusescoreFileData(
         tree=tree,
-        measures_by_hash=measures_by_hash,
+        measures=measures,
         source_measures=ordered_source_measures,
         rendered_measures=rendered_measures,
     )
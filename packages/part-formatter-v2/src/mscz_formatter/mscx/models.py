@@ -1,5 +1,8 @@
+from array import array
 from dataclasses import dataclass
-import xml.etree.ElementTree as ET
+from itertools import accumulate
+
+from mscz_formatter.xml_backend import ET
 
 # MuseScore .mpos sx/sy are in the same units as layout positions.
 # Across letter-size part systems in the e2e fixtures, a full system content
@@ -20,11 +23,129 @@ SPATIUM_MPOS_UNITS = 1000
 MIN_SYSTEM_DISTANCE_SPATIA = 8.5
 SYSTEM_DISTANCE = int(MIN_SYSTEM_DISTANCE_SPATIA * SPATIUM_MPOS_UNITS)
 
+@dataclass(frozen=True)
+class MeasureFeatures:
+    """
+    Every per-measure flag the planner needs, extracted from one MSCX
+    ``<Measure>`` in a single walk of its subtree.
+    """
+
+    # Length of the synthetic multi-measure rest, 0 if this is not one
+    mm_rest_len: int = 0
+    # Full-bar rest (durationType "measure") with no chords
+    is_rest: bool = False
+    # Position within a % measure-repeat run, and the N of an N-bar symbol
+    measure_repeat_count: int | None = None
+    measure_repeat_subtype: int | None = None
+    has_double_bar: bool = False
+    has_rehearsal_mark: bool = False
+    has_line_break: bool = False
+    outgoing_slur_or_tie_span: int = 0
+
+    @classmethod
+    def from_element(cls, m: ET.Element) -> "MeasureFeatures":
+        """
+        Walk ``m`` once. Tags that only count as direct children of the
+        measure (``multiMeasureRest``, ``measureRepeatCount``) are checked on
+        the first level; everything else matches at any depth, like the
+        ``.//Tag`` lookups this replaces.
+        """
+        mm_rest_len = 0
+        len_prop = m.attrib.get("len", None)
+        measure_repeat_count: int | None = None
+        measure_repeat_subtype: int | None = None
+        has_measure_rest = False
+        has_chord = False
+        has_double_bar = False
+        has_rehearsal_mark = False
+        has_line_break = False
+        outgoing_span = 0
+        found_mm_tag = False
+        found_repeat_count = False
+        found_repeat_symbol = False
+
+        for child in m:
+            if child.tag == "multiMeasureRest" and not found_mm_tag:
+                found_mm_tag = True
+                mm_rest_len = int(child.text)
+            elif child.tag == "measureRepeatCount" and not found_repeat_count:
+                found_repeat_count = True
+                if child.text:
+                    measure_repeat_count = int(child.text)
+
+            for el in child.iter():
+                tag = el.tag
+                if tag == "Chord":
+                    has_chord = True
+                elif tag == "Rest":
+                    if not has_measure_rest and _rest_duration_type(el) == "measure":
+                        has_measure_rest = True
+                elif tag == "BarLine":
+                    has_double_bar = True
+                elif tag == "RehearsalMark":
+                    has_rehearsal_mark = True
+                elif tag == "LayoutBreak":
+                    has_line_break = True
+                elif tag == "Spanner":
+                    span = _slur_or_tie_span(el)
+                    if span > outgoing_span:
+                        outgoing_span = span
+                elif tag == "MeasureRepeat" and not found_repeat_symbol:
+                    # Only the first symbol in document order counts
+                    found_repeat_symbol = True
+                    subtype = el.find("subtype")
+                    if subtype is not None and subtype.text:
+                        measure_repeat_subtype = int(subtype.text)
+
+        if not found_mm_tag and len_prop is not None:
+            top, bottom = len_prop.split("/")
+            res = int(top) / int(bottom)
+            assert res.is_integer(), f"MM Rest 'len' property was not a whole number: found {len_prop}"
+            mm_rest_len = int(res)
+
+        return cls(
+            mm_rest_len=mm_rest_len,
+            is_rest=has_measure_rest and not has_chord,
+            measure_repeat_count=measure_repeat_count,
+            measure_repeat_subtype=measure_repeat_subtype,
+            has_double_bar=has_double_bar,
+            has_rehearsal_mark=has_rehearsal_mark,
+            has_line_break=has_line_break,
+            outgoing_slur_or_tie_span=outgoing_span,
+        )
+
+
+def _rest_duration_type(rest: ET.Element) -> str | None:
+    # Full-bar rests live under <voice>. MuseScore 4 stores durationType
+    # as a child element; older files may use an attribute.
+    child = rest.find("durationType")
+    if child is not None and child.text:
+        return child.text.strip()
+    return rest.get("durationType")
+
+
+def _slur_or_tie_span(spanner: ET.Element) -> int:
+    """
+    Number of measures a Slur/Tie Spanner continues past its bar.
+
+    MuseScore encodes cross-bar ties/slurs with
+    ``<next><location><measures>N</measures>…`` where N >= 1.
+    Same-bar spanners only have ``<fractions>`` and return 0.
+    """
+    if spanner.get("type") not in ("Slur", "Tie"):
+        return 0
+    measures_el = spanner.find("./next/location/measures")
+    if measures_el is None or not measures_el.text:
+        return 0
+    return int(measures_el.text)
+
+
 @dataclass
 class SourceMeasure:
-    # Maps to a mscx measure in the list
     num: int
-    hash_key: int
+    # Position in the first staff's <Measure> list; indexes the element array
+    # returned by load_mscx_file. Stable and picklable, unlike hash(Element).
+    index: int
 
     # If the measure is not a MM rest but it is a single bar of rest
     is_rest: bool
@@ -38,39 +159,29 @@ class SourceMeasure:
     measure_repeat_span: int | None = None
     measure_repeat_index: int | None = None
 
-    # TODO: Could these be properties?
+    # Line break props, cached from MeasureFeatures at load so the .mpos
+    # pass never has to go back to the XML.
+    has_double_bar: bool = False
+    has_rehearsal_mark: bool = False
+    has_existing_line_break: bool = False
+    outgoing_slur_or_tie_span: int = 0
+
     @classmethod
     def get_has_double_bar(cls, m: ET.Element):
-        return m.find(".//BarLine") is not None
+        return MeasureFeatures.from_element(m).has_double_bar
 
     @classmethod
     def get_has_rehearsal_mark(cls, m: ET.Element):
-        return m.find(".//RehearsalMark") is not None
+        return MeasureFeatures.from_element(m).has_rehearsal_mark
 
     @classmethod
     def get_has_line_break(cls, m: ET.Element):
-        return m.find(".//LayoutBreak") is not None
+        return MeasureFeatures.from_element(m).has_line_break
 
     @classmethod
     def get_outgoing_slur_or_tie_span(cls, m: ET.Element) -> int:
-        """
-        Largest number of measures a Slur/Tie Spanner continues past this bar.
-
-        MuseScore encodes cross-bar ties/slurs with
-        ``<next><location><measures>N</measures>…`` where N >= 1.
-        Same-bar spanners only have ``<fractions>`` and return 0.
-        """
-        max_span = 0
-        for spanner in m.findall(".//Spanner"):
-            if spanner.get("type") not in ("Slur", "Tie"):
-                continue
-            measures_el = spanner.find("./next/location/measures")
-            if measures_el is None or not measures_el.text:
-                continue
-            span = int(measures_el.text)
-            if span > max_span:
-                max_span = span
-        return max_span
+        """Largest number of measures a Slur/Tie Spanner continues past this bar."""
+        return MeasureFeatures.from_element(m).outgoing_slur_or_tie_span
 
 
 
@@ -82,7 +193,7 @@ class RenderedMeasure:
     width: float
     height: float
 
-    source_measure_hash: int
+    source_measure_index: int
     source_measure: SourceMeasure # do we need this
 
     # line break props
@@ -91,9 +202,9 @@ class RenderedMeasure:
     has_rehearsal_mark: bool
 
     is_mm_rest: bool
-    # Only if is_mm_rest: hashes of the N underlying MSCX measures covered by
+    # Only if is_mm_rest: indices of the N underlying MSCX measures covered by
     # the synthetic multi-measure rest (leading rest + N-1 trailing), in order.
-    mm_rest_hashes: list[int]
+    mm_rest_indices: list[int]
     mm_rest_span: int | None = None
     # True when a slur/tie continues from this measure into the next;
     # used to discourage line breaks across the barline.
@@ -118,6 +229,97 @@ class RenderedMeasure:
 
 
 
+@dataclass(frozen=True)
+class MeasureColumns:
+    """
+    Column-per-property view of an ordered RenderedMeasure list.
+
+    The line DP scores candidate lines as inclusive ``(start, end)`` index
+    ranges over these arrays; prefix sums make width / c_count / MM-rest
+    counts O(1) per candidate instead of re-summing a materialized ``Line``.
+    """
+
+    width: array
+    height: array
+    # Conceptual bars per rendered measure (MM rest span, else 1)
+    c_count: array
+    is_mm_rest: array
+    mm_rest_span: array
+    is_rest: array
+    has_rehearsal_mark: array
+    has_double_bar: array
+    continues_measure_repeat: array
+    # 1 where a rehearsal mark is "buried" if this measure is not the first
+    # on its line (an RM on an MM rest right after another MM rest is not).
+    buried_rehearsal_mark: array
+
+    # Prefix sums, length n + 1: prefix[end + 1] - prefix[start]
+    width_prefix: array
+    c_count_prefix: array
+    mm_rest_prefix: array
+    buried_rehearsal_mark_prefix: array
+
+    @classmethod
+    def from_measures(cls, measures: list[RenderedMeasure]) -> "MeasureColumns":
+        width = array("d", (m.width for m in measures))
+        c_count = array("q", (m.mm_rest_span if m.is_mm_rest else 1 for m in measures))
+        is_mm_rest = array("b", (m.is_mm_rest for m in measures))
+        has_rehearsal_mark = array("b", (m.has_rehearsal_mark for m in measures))
+        buried = array(
+            "b",
+            (
+                has_rehearsal_mark[i]
+                and not (i > 0 and is_mm_rest[i] and is_mm_rest[i - 1])
+                for i in range(len(measures))
+            ),
+        )
+        return cls(
+            width=width,
+            height=array("d", (m.height for m in measures)),
+            c_count=c_count,
+            is_mm_rest=is_mm_rest,
+            mm_rest_span=array("q", (m.mm_rest_span or 0 for m in measures)),
+            is_rest=array("b", (m.is_rest for m in measures)),
+            has_rehearsal_mark=has_rehearsal_mark,
+            has_double_bar=array("b", (m.has_double_bar for m in measures)),
+            continues_measure_repeat=array(
+                "b", (m.continues_measure_repeat for m in measures)
+            ),
+            buried_rehearsal_mark=buried,
+            width_prefix=array("d", accumulate(width, initial=0.0)),
+            c_count_prefix=array("q", accumulate(c_count, initial=0)),
+            mm_rest_prefix=array("q", accumulate(is_mm_rest, initial=0)),
+            buried_rehearsal_mark_prefix=array("q", accumulate(buried, initial=0)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.width)
+
+    def line_width(self, start: int, end: int) -> float:
+        return self.width_prefix[end + 1] - self.width_prefix[start]
+
+    def line_height(self, start: int, end: int) -> float:
+        """Same as ``Line.height`` for measures[start..end]."""
+        return max(self.height[start : end + 1]) + SYSTEM_DISTANCE
+
+    def line_c_count(self, start: int, end: int) -> int:
+        return self.c_count_prefix[end + 1] - self.c_count_prefix[start]
+
+    def line_mm_rest_count(self, start: int, end: int) -> int:
+        return self.mm_rest_prefix[end + 1] - self.mm_rest_prefix[start]
+
+    def line_buried_rehearsal_marks(self, start: int, end: int) -> int:
+        """Rehearsal marks after the first measure of the line that count as mid-line."""
+        return (
+            self.buried_rehearsal_mark_prefix[end + 1]
+            - self.buried_rehearsal_mark_prefix[start + 1]
+        )
+
+    def line_is_valid(self, start: int, end: int) -> bool:
+        """Same as ``Line.is_valid`` for measures[start..end]."""
+        return self.line_width(start, end) <= MAX_LINE_WIDTH
+
+
 @dataclass
 class Line:
     measures: list[RenderedMeasure]
@@ -8,11 +8,15 @@ facing spreads at a height midpoint.
 When an even page can end on a good rest but continuing onto the facing odd
 page would force a bad later turn, we may emit that even page of music plus a
 blank odd page with a full-page "V.S." frame (volti subito).
+
+Line heights are summed once into per-start running tables (see
+``_LineHeights``), so page fits, group heights and spread splits are table
+lookups rather than re-summed ``Page`` objects.
 """
 from __future__ import annotations
 
+from array import array
 from dataclasses import dataclass
-from functools import lru_cache
 from math import inf
 from typing import Literal
 
@@ -27,13 +31,17 @@ from mscz_formatter.mscx.models import (
 # Match Page.is_valid(): first-page height + is_valid both add TITLE_BOX_OFFSET.
 FIRST_PAGE_BUDGET = MAX_PAGE_HEIGHT - 2 * TITLE_BOX_OFFSET
 LATER_PAGE_BUDGET = MAX_PAGE_HEIGHT
+# No group (single, spread or music + blank) is taller than two later pages.
+_MAX_GROUP_HEIGHT = 2 * LATER_PAGE_BUDGET
 
 GroupKind = Literal["single", "spread", "music_plus_blank"]
 
 
 @dataclass(frozen=True)
 class PageGroup:
-    lines: tuple[Line, ...]
+    # Inclusive line index range
+    start: int
+    end: int
     kind: GroupKind
     is_first_page: bool
     turn_required: bool
@@ -50,129 +58,209 @@ class PageGroup:
         return 2 * LATER_PAGE_BUDGET
 
     @property
-    def height(self) -> float:
-        return sum(line.height for line in self.lines)
-
-
-def _page(lines: list[Line], is_first: bool) -> Page:
-    return Page(lines=lines, is_first_page=is_first)
+    def size(self) -> int:
+        return self.end + 1 - self.start
 
 
-def _lines_fit_page(lines: list[Line], is_first: bool) -> bool:
-    return bool(lines) and _page(lines, is_first).is_valid()
+def _fits_page(height: float, is_first: bool) -> bool:
+    """``Page(lines, is_first).is_valid()`` for non-empty lines of total ``height``."""
+    if is_first:
+        return height + TITLE_BOX_OFFSET + TITLE_BOX_OFFSET <= MAX_PAGE_HEIGHT
+    return height <= MAX_PAGE_HEIGHT
 
 
-def _height_mid_split(
-    lines: list[Line],
-    *,
-    left_is_first: bool,
-    split_after: int | None = None,
-) -> tuple[list[Line], list[Line]] | None:
+class _LineHeights:
     """
-    Bipartition where both sides are valid pages.
+    Running line-height sums and page-fit bounds for one line list.
 
-    If split_after is set, use that cut (must be valid).
-    Otherwise pick the cut closest to half the group height.
-    If everything fits on one page, right is empty.
+    ``height(s, e)`` is summed left to right from ``s`` exactly like
+    ``sum(line.height for line in lines[s:e + 1])`` (so costs and ties match
+    the per-Page computation bit for bit). Each start only keeps sums up to
+    the first one past ``_MAX_GROUP_HEIGHT``; nothing taller is ever a group.
     """
-    if not lines:
-        return None
-    if _lines_fit_page(lines, left_is_first):
-        return lines, []
-
-    if split_after is not None:
-        left, right = lines[:split_after], lines[split_after:]
-        if (
-            left
-            and right
-            and _lines_fit_page(left, left_is_first)
-            and _lines_fit_page(right, is_first=False)
-        ):
-            return left, right
-        return None
-
-    total = sum(line.height for line in lines)
-    best: tuple[list[Line], list[Line]] | None = None
-    best_dist = inf
-
-    for k in range(1, len(lines)):
-        left, right = lines[:k], lines[k:]
-        if not _lines_fit_page(left, left_is_first):
-            continue
-        if not _lines_fit_page(right, is_first=False):
-            continue
-        left_h = sum(line.height for line in left)
-        dist = abs(left_h - total / 2.0)
-        if dist < best_dist:
-            best_dist = dist
-            best = (left, right)
 
-    return best
+    def __init__(self, lines: list[Line]) -> None:
+        self.n = n = len(lines)
+        heights = [line.height for line in lines]
+        self._runs: list[array] = []
+        # Last end index whose [s..end] fits one page (s - 1 if none).
+        self.last_fit_first = array("q", [0] * n)
+        self.last_fit_later = array("q", [0] * n)
+
+        for s in range(n):
+            run = array("d")
+            total = 0.0
+            last_first = last_later = s - 1
+            for e in range(s, n):
+                total = heights[e] if e == s else total + heights[e]
+                run.append(total)
+                if _fits_page(total, True):
+                    last_first = e
+                if _fits_page(total, False):
+                    last_later = e
+                if total > _MAX_GROUP_HEIGHT:
+                    break
+            self._runs.append(run)
+            self.last_fit_first[s] = last_first
+            self.last_fit_later[s] = last_later
+
+    def covers(self, s: int, e: int) -> bool:
+        """True if ``height(s, e)`` is tabulated (else it exceeds two pages)."""
+        return e - s < len(self._runs[s])
+
+    def height(self, s: int, e: int) -> float:
+        return self._runs[s][e - s]
+
+    def suffix_height(self, s: int) -> float:
+        """Height of lines[s:], or inf when it is taller than two pages."""
+        if self.covers(s, self.n - 1):
+            return self.height(s, self.n - 1)
+        return inf
+
+    def fits(self, s: int, e: int, is_first: bool) -> bool:
+        if e < s:
+            return False
+        last = self.last_fit_first[s] if is_first else self.last_fit_later[s]
+        return e <= last
+
+
+class _SpreadSplits:
+    """Memoized facing-spread bipartitions (see ``split``)."""
+
+    def __init__(self, heights: _LineHeights) -> None:
+        self._heights = heights
+        self._best: dict[tuple[int, int, bool], int | None] = {}
+
+    def split(
+        self,
+        s: int,
+        e: int,
+        *,
+        left_is_first: bool,
+        split_after: int | None = None,
+    ) -> int | None:
+        """
+        Number of lines on the left page for a spread over lines[s..e].
+
+        Both sides must be valid pages. If ``split_after`` is set, use that
+        cut. Otherwise pick the cut closest to half the group height. If
+        everything fits on one page, the whole group goes left (returns the
+        group size). ``None`` when no valid cut exists.
+        """
+        hs = self._heights
+        size = e + 1 - s
+        if hs.fits(s, e, left_is_first):
+            return size
+
+        if split_after is not None:
+            if (
+                0 < split_after < size
+                and hs.fits(s, s + split_after - 1, left_is_first)
+                and hs.fits(s + split_after, e, is_first=False)
+            ):
+                return split_after
+            return None
+
+        key = (s, e, left_is_first)
+        if key in self._best:
+            return self._best[key]
+
+        half = hs.height(s, e) / 2.0 if hs.covers(s, e) else inf
+        best: int | None = None
+        best_dist = inf
+        last_left = hs.last_fit_first[s] if left_is_first else hs.last_fit_later[s]
+        for k in range(1, min(size - 1, last_left + 1 - s) + 1):
+            if not hs.fits(s + k, e, is_first=False):
+                continue
+            dist = abs(hs.height(s, s + k - 1) - half)
+            if dist < best_dist:
+                best_dist = dist
+                best = k
+
+        self._best[key] = best
+        return best
+
+    def emitted_page_count(self, group: PageGroup) -> int:
+        if group.kind == "music_plus_blank":
+            return 2
+        if group.kind == "single":
+            return 1
+        k = self.split(
+            group.start,
+            group.end,
+            left_is_first=group.is_first_page,
+            split_after=group.split_after,
+        )
+        if k is None or k == group.size:
+            return 1
+        return 2
 
 
-def _spread_is_partitionable(lines: list[Line], *, left_is_first: bool) -> bool:
-    return _height_mid_split(lines, left_is_first=left_is_first) is not None
+def _page(lines: list[Line], is_first: bool) -> Page:
+    return Page(lines=lines, is_first_page=is_first)
 
 
 def _blank_vs_page() -> Page:
     return Page(lines=[], is_first_page=False, is_blank_vs=True)
 
 
-def _split_group(group: PageGroup) -> list[Page]:
+def _split_group(
+    group: PageGroup, lines: list[Line], splits: _SpreadSplits
+) -> list[Page]:
+    group_lines = lines[group.start : group.end + 1]
     if group.kind == "single":
-        return [_page(list(group.lines), group.is_first_page)]
+        return [_page(group_lines, group.is_first_page)]
 
     if group.kind == "music_plus_blank":
-        return [
-            _page(list(group.lines), group.is_first_page),
-            _blank_vs_page(),
-        ]
+        return [_page(group_lines, group.is_first_page), _blank_vs_page()]
 
-    parts = _height_mid_split(
-        list(group.lines),
+    k = splits.split(
+        group.start,
+        group.end,
         left_is_first=group.is_first_page,
         split_after=group.split_after,
     )
-    if parts is None:
+    if k is None:
         return []
-    left, right = parts
-    pages = [_page(left, group.is_first_page)]
-    if right:
-        pages.append(_page(right, is_first=False))
+    pages = [_page(group_lines[:k], group.is_first_page)]
+    if k < len(group_lines):
+        pages.append(_page(group_lines[k:], is_first=False))
     return pages
 
 
 def _group_total_cost(
     group: PageGroup,
-    next_line: Line | None,
+    lines: list[Line],
+    heights: _LineHeights,
 ) -> float:
-    turn_end: Line | None = None
-    turn_next: Line | None = next_line
+    height = heights.height(group.start, group.end)
 
     if group.kind == "music_plus_blank":
         # Blank odd page is the turn: no rest penalty after the frame.
         return group_cost(
-            height=group.height,
+            height=height,
             capacity=group.capacity,
             turn_end_line=None,
             next_line=None,
             turn_required=False,
         )
 
+    turn_end: Line | None = None
+    turn_next: Line | None = lines[group.end + 1] if group.end + 1 < len(lines) else None
     if group.turn_required:
         if (
             group.kind == "spread"
             and group.split_after is not None
-            and 0 < group.split_after < len(group.lines)
+            and 0 < group.split_after < group.size
         ):
             # Short chart: turn sits at the pinned mid split.
-            turn_end = group.lines[group.split_after - 1]
-            turn_next = group.lines[group.split_after]
+            turn_end = lines[group.start + group.split_after - 1]
+            turn_next = lines[group.start + group.split_after]
         else:
-            turn_end = group.lines[-1]
+            turn_end = lines[group.end]
 
     return group_cost(
-        height=group.height,
+        height=height,
         capacity=group.capacity,
         turn_end_line=turn_end,
         next_line=turn_next,
@@ -184,6 +272,7 @@ def pages_from_lines(
     lines: list[Line],
     *,
     optimize_for_page_turns: bool = True,
+    stats: dict[str, int] | None = None,
 ) -> list[Page]:
     """
     Build pages from planned lines.
@@ -192,175 +281,212 @@ def pages_from_lines(
     (odd-page turns, facing spreads, V.S. blanks). When False, skip page
     breaks entirely: emit a single page so only line breaks are applied and
     MuseScore handles natural paging.
+
+    ``stats`` is passed through to ``add_page_breaks``.
     """
     if not lines:
         return []
     if optimize_for_page_turns:
-        return add_page_breaks(lines)
+        return add_page_breaks(lines, stats=stats)
     return [Page(lines=list(lines), is_first_page=True)]
 
 
-def add_page_breaks(lines: list[Line]) -> list[Page]:
+def add_page_breaks(
+    lines: list[Line], *, stats: dict[str, int] | None = None
+) -> list[Page]:
+    """
+    Turn-aware page DP. When given, ``stats`` receives ``page_dp_states``
+    (planned (start, first/parity) states) and ``page_dp_groups`` (page
+    groups scored).
+    """
     n = len(lines)
     if n == 0:
         return []
 
-    @lru_cache(maxsize=None)
-    def solve(start_idx: int, page_num: int) -> tuple[float, tuple[PageGroup, ...]]:
+    heights = _LineHeights(lines)
+    splits = _SpreadSplits(heights)
+    # Costs only see whether a page is the first one and whether it is even,
+    # so the DP state is (start_idx, on_even) for later pages plus the single
+    # first-page state at line 0. Indexed [on_even][start_idx].
+    later_cost = (array("d", [inf] * n), array("d", [inf] * n))
+    later_group: tuple[list[PageGroup | None], list[PageGroup | None]] = (
+        [None] * n,
+        [None] * n,
+    )
+    scored = 0
+
+    def remaining(start_idx: int, on_even: bool) -> float:
         if start_idx >= n:
-            return 0.0, ()
+            return 0.0
+        return later_cost[on_even][start_idx]
 
+    def plan(
+        start_idx: int, is_first: bool, on_even: bool
+    ) -> tuple[float, PageGroup | None]:
         best_cost = inf
-        best_groups: tuple[PageGroup, ...] = ()
-        is_first = page_num == 1
+        best_group: PageGroup | None = None
         page_budget = FIRST_PAGE_BUDGET if is_first else LATER_PAGE_BUDGET
-        rem_h = sum(line.height for line in lines[start_idx:])
-
-        def consider(group: PageGroup, end_idx: int) -> None:
-            nonlocal best_cost, best_groups
-            next_line = lines[end_idx + 1] if end_idx + 1 < n else None
-            # When turn is internal (short spread), next_line after group is unused.
-            cost = _group_total_cost(group, next_line)
-            remaining_cost, remaining = solve(
-                end_idx + 1, page_num + _emitted_page_count(group)
-            )
-            total = cost + remaining_cost
+        rem_h = heights.suffix_height(start_idx)
+
+        def consider(group: PageGroup) -> None:
+            nonlocal best_cost, best_group, scored
+            scored += 1
+            cost = _group_total_cost(group, lines, heights)
+            # Odd page counts flip parity; even counts keep it.
+            next_even = on_even != (splits.emitted_page_count(group) % 2 == 1)
+            total = cost + remaining(group.end + 1, next_even)
             if total < best_cost:
                 best_cost = total
-                best_groups = (group,) + remaining
+                best_group = group
+
+        def done() -> tuple[float, PageGroup | None]:
+            return best_cost, best_group
 
         # --- Short chart (≤2 pages from the start): consume all remaining lines ---
         # If nothing partitions cleanly (height fits 2× budget but lines don't),
         # fall through to the 3+ page path.
         if is_first and rem_h <= FIRST_PAGE_BUDGET + LATER_PAGE_BUDGET:
-            chunk = lines[start_idx:]
             end_idx = n - 1
 
-            if _lines_fit_page(chunk, is_first=True):
+            if heights.fits(start_idx, end_idx, is_first=True):
                 consider(
                     PageGroup(
-                        lines=tuple(chunk),
+                        start=start_idx,
+                        end=end_idx,
                         kind="single",
                         is_first_page=True,
                         turn_required=False,
-                    ),
-                    end_idx,
+                    )
                 )
             else:
                 # Prefer fuller first pages on ties (iterate high → low).
-                for k in range(len(chunk) - 1, 0, -1):
-                    left, right = chunk[:k], chunk[k:]
-                    if not _lines_fit_page(left, is_first=True):
+                for k in range(n - start_idx - 1, 0, -1):
+                    if not heights.fits(start_idx, start_idx + k - 1, is_first=True):
                         continue
-                    if not _lines_fit_page(right, is_first=False):
+                    if not heights.fits(start_idx + k, end_idx, is_first=False):
                         continue
                     consider(
                         PageGroup(
-                            lines=tuple(chunk),
+                            start=start_idx,
+                            end=end_idx,
                             kind="spread",
                             is_first_page=True,
                             turn_required=True,
                             split_after=k,
-                        ),
-                        end_idx,
+                        )
                     )
             if best_cost < inf:
-                return best_cost, best_groups
+                return done()
 
         # --- Last page: remaining content fits on this page ---
-        if rem_h <= page_budget and _lines_fit_page(lines[start_idx:], is_first):
-            group = PageGroup(
-                lines=tuple(lines[start_idx:]),
+        if rem_h <= page_budget and heights.fits(start_idx, n - 1, is_first):
+            best_group = PageGroup(
+                start=start_idx,
+                end=n - 1,
                 kind="single",
                 is_first_page=is_first,
                 turn_required=False,
             )
-            return _group_total_cost(group, None), (group,)
+            best_cost = _group_total_cost(best_group, lines, heights)
+            return done()
 
         # --- Page 1 alone when chart needs 3+ pages ---
         if is_first:
             for end_idx in range(start_idx, n - 1):
-                chunk = lines[start_idx : end_idx + 1]
-                if not _lines_fit_page(chunk, is_first=True):
+                if not heights.fits(start_idx, end_idx, is_first=True):
                     break
                 consider(
                     PageGroup(
-                        lines=tuple(chunk),
+                        start=start_idx,
+                        end=end_idx,
                         kind="single",
                         is_first_page=True,
                         turn_required=True,
-                    ),
-                    end_idx,
+                    )
                 )
-            return best_cost, best_groups
+            return done()
 
         # --- Later pages ---
         # Facing spreads are even|odd pairs only (2|3, 4|5, …). Starting a
         # "spread" on an odd page would straddle a real page turn without
         # scoring it. Odd pages are singles; turn_required when more follows.
-        on_even = page_num % 2 == 0
-
         for end_idx in range(start_idx, n):
-            chunk = lines[start_idx : end_idx + 1]
-            chunk_h = sum(line.height for line in chunk)
             more_after = end_idx + 1 < n
 
-            if chunk_h > 2 * LATER_PAGE_BUDGET:
+            if not heights.covers(start_idx, end_idx) or (
+                heights.height(start_idx, end_idx) > _MAX_GROUP_HEIGHT
+            ):
                 break
 
-            if _lines_fit_page(chunk, is_first=False):
+            if heights.fits(start_idx, end_idx, is_first=False):
                 # Physical turns are only after odd pages.
                 turn_required = more_after and not on_even
                 consider(
                     PageGroup(
-                        lines=tuple(chunk),
+                        start=start_idx,
+                        end=end_idx,
                         kind="single",
                         is_first_page=False,
                         turn_required=turn_required,
-                    ),
-                    end_idx,
+                    )
                 )
 
                 # Even page ending on a rest + blank odd "V.S." page. Occupies
                 # two page numbers so the next music starts after a free turn.
                 # Require the rest on this page (not only on the next line) so
                 # the player has turn time before the blank / V.S.
-                end_m = chunk[-1].measures[-1]
+                end_m = lines[end_idx].measures[-1]
                 if on_even and more_after and (end_m.is_mm_rest or end_m.is_rest):
                     consider(
                         PageGroup(
-                            lines=tuple(chunk),
+                            start=start_idx,
+                            end=end_idx,
                             kind="music_plus_blank",
                             is_first_page=False,
                             turn_required=False,
-                        ),
-                        end_idx,
+                        )
                     )
 
             # Facing spread (even|odd only).
             if (
                 on_even
-                and len(chunk) >= 2
-                and _spread_is_partitionable(chunk, left_is_first=False)
+                and end_idx > start_idx
+                and splits.split(start_idx, end_idx, left_is_first=False) is not None
             ):
                 consider(
                     PageGroup(
-                        lines=tuple(chunk),
+                        start=start_idx,
+                        end=end_idx,
                         kind="spread",
                         is_first_page=False,
                         turn_required=more_after,
-                    ),
-                    end_idx,
+                    )
                 )
 
-        return best_cost, best_groups
+        return done()
 
-    def _emitted_page_count(group: PageGroup) -> int:
-        pages = _split_group(group)
-        return max(1, len(pages))
+    # Every transition moves forward, so fill later-page states right to left.
+    for start_idx in range(n - 1, 0, -1):
+        for on_even in (False, True):
+            cost, group = plan(start_idx, is_first=False, on_even=on_even)
+            later_cost[on_even][start_idx] = cost
+            later_group[on_even][start_idx] = group
+
+    first_cost, first_group = plan(0, is_first=True, on_even=False)
+    if stats is not None:
+        stats["page_dp_states"] = stats.get("page_dp_states", 0) + 2 * (n - 1) + 1
+        stats["page_dp_groups"] = stats.get("page_dp_groups", 0) + scored
+    if first_cost == inf:
+        return []
 
-    _, groups = solve(0, 1)
+    # Walk the chosen groups forward, rebuilding absolute page numbers.
     pages: list[Page] = []
-    for group in groups:
-        pages.extend(_split_group(group))
+    group = first_group
+    page_num = 1
+    while group is not None:
+        pages.extend(_split_group(group, lines, splits))
+        page_num += splits.emitted_page_count(group)
+        if group.end + 1 >= n:
+            break
+        group = later_group[page_num % 2 == 0][group.end + 1]
     return pages
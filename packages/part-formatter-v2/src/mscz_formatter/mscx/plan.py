@@ -0,0 +1,175 @@
+"""
+Serializable layout plans: just the breaks ``apply`` writes, by MSCX measure index.
+
+A ``LayoutPlan`` is what survives from ``add_line_breaks`` + ``pages_from_lines``
+once the planner is done, so it can be cached and re-applied to the same
+measures without loading the .mpos or re-running either DP.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import astuple, dataclass, fields
+
+from mscz_formatter.mscx.lib import line_cost, page_cost
+from mscz_formatter.mscx.models import (
+    MAX_LINE_WIDTH,
+    MAX_PAGE_HEIGHT,
+    SYSTEM_DISTANCE,
+    TITLE_BOX_OFFSET,
+    Page,
+    RenderedMeasure,
+)
+from mscz_formatter.xml_backend import ET
+
+# Bump when planner output can change for identical inputs (cost tweaks, new
+# rules) so fingerprints from older plans stop matching.
+PLAN_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class PagePlan:
+    # Per line: MSCX measure indices that receive the line's break (empty for
+    # a line with no measures).
+    line_breaks: tuple[tuple[int, ...], ...]
+    is_blank_vs: bool = False
+
+
+LayoutPlan = tuple[PagePlan, ...]
+
+
+def break_target_indices(measure: RenderedMeasure) -> tuple[int, ...]:
+    """
+    Indices of MSCX measures that need the layout break for this RenderedMeasure.
+
+    For a normal bar: just the source measure.
+    For an MM rest: both the visible span measure and the last hidden measure
+    covered by that rest (MuseScore keeps both in sync).
+    """
+    if measure.is_mm_rest and measure.mm_rest_indices:
+        return (measure.source_measure_index, measure.mm_rest_indices[-1])
+    return (measure.source_measure_index,)
+
+
+def plan_from_pages(pages: list[Page]) -> LayoutPlan:
+    return tuple(
+        PagePlan(
+            line_breaks=tuple(
+                break_target_indices(line.measures[-1]) if line.measures else ()
+                for line in page.lines
+            ),
+            is_blank_vs=page.is_blank_vs,
+        )
+        for page in pages
+    )
+
+
+def plan_to_json(plan: LayoutPlan) -> str:
+    return json.dumps(
+        [
+            {"vs": page.is_blank_vs, "lines": [list(t) for t in page.line_breaks]}
+            for page in plan
+        ],
+        separators=(",", ":"),
+    )
+
+
+def plan_from_json(text: str) -> LayoutPlan:
+    return tuple(
+        PagePlan(
+            line_breaks=tuple(tuple(targets) for targets in page["lines"]),
+            is_blank_vs=page["vs"],
+        )
+        for page in json.loads(text)
+    )
+
+
+def _hash_element(h, elem: ET.Element) -> None:
+    # Layout breaks are scrubbed before every apply, so they never count.
+    if elem.tag == "LayoutBreak":
+        return
+    h.update(elem.tag.encode())
+    for key in sorted(elem.attrib):
+        h.update(b"\x01" + key.encode() + b"=" + elem.attrib[key].encode())
+    text = (elem.text or "").strip()
+    if text:
+        h.update(b"\x02" + text.encode())
+    h.update(b"\x03")
+    for child in elem:
+        _hash_element(h, child)
+    h.update(b"\x04")
+
+
+def layout_fingerprint(
+    measures: list[ET.Element],
+    mpos_bytes: bytes,
+    *,
+    optimize_for_page_turns: bool,
+) -> str:
+    """
+    Content key for one part's layout plan.
+
+    Covers the first staff's measures (minus layout breaks and formatting
+    whitespace), the raw .mpos bytes, the layout params and the cost
+    constants, since a hit here skips planning entirely. Titles, headers and
+    styles outside the measures are not part of it, so metadata-only changes
+    keep the key.
+    """
+    h = hashlib.sha256()
+    h.update(
+        repr(
+            ("layout", PLAN_FORMAT_VERSION, optimize_for_page_turns, _cost_constants())
+        ).encode()
+    )
+    for m in measures:
+        _hash_element(h, m)
+    h.update(b"\x00mpos\x00")
+    h.update(mpos_bytes)
+    return h.hexdigest()
+
+
+def _cost_constants() -> tuple:
+    """Every tunable the line / page DPs read; part of both plan keys."""
+    return (
+        MAX_LINE_WIDTH,
+        MAX_PAGE_HEIGHT,
+        TITLE_BOX_OFFSET,
+        SYSTEM_DISTANCE,
+        line_cost.MEASURES_PER_LINE,
+        line_cost.ALTERNATE_LINE_LENGTH,
+        line_cost.MAX_LINE_C_COUNT,
+        line_cost.ABSOLUTE_MAX_LINE_C_COUNT,
+        tuple(
+            (w, fn.__name__) for w, fn in line_cost.BATCH_MULTIPLIERS_AND_FUNCTIONS
+        ),
+        page_cost.WHITESPACE_WEIGHT,
+        page_cost.TURN_WEIGHT,
+    )
+
+
+def features_fingerprint(
+    rendered_measures: list[RenderedMeasure],
+    *,
+    optimize_for_page_turns: bool,
+) -> str:
+    """
+    Key for the plan ``add_line_breaks`` + ``pages_from_lines`` produce.
+
+    Hashes each measure's planner-visible features (size, rests, marks,
+    barlines, spanners, repeats, MSCX indices) together with the cost
+    constants, so a plan is reused for any score whose rendered measures
+    match, whatever the styles, headers or other staves look like.
+    """
+    h = hashlib.sha256()
+    h.update(
+        repr(
+            (PLAN_FORMAT_VERSION, optimize_for_page_turns, _cost_constants())
+        ).encode()
+    )
+    for m in rendered_measures:
+        values = tuple(
+            getattr(m, f.name) for f in fields(m) if f.name != "source_measure"
+        )
+        h.update(repr((values, astuple(m.source_measure))).encode())
+    return h.hexdigest()
@@ -3,6 +3,15 @@ MSCZ container processing: unpack/repack, styles, excerpt discovery, and
 orchestrating one MPOS file per part to export.
 """
 
+from mscz_formatter.mscz.archive import MsczArchive
+from mscz_formatter.mscz.batch import (
+    BatchJob,
+    BatchResult,
+    jobs_from_directory,
+    load_manifest,
+    run_batch,
+)
+from mscz_formatter.mscz.documents import MscxDocuments
 from mscz_formatter.mscz.excerpts import ExcerptInfo, list_excerpts, resolve_part_mpos
 from mscz_formatter.mscz.file_processing import unpack_mscz_to_tempdir
 from mscz_formatter.mscz.format import FormattingParams, format_mscz, get_score_attributes
@@ -10,22 +19,43 @@ from mscz_formatter.mscz.inspect import ScoreInfo
 from mscz_formatter.mscz.metadata import (
     CONDUCTOR_SCORE_PART_NAME,
     apply_metadata_and_headers_to_mscx,
+    apply_metadata_and_headers_to_tree,
     set_score_properties,
 )
-from mscz_formatter.mscz.styles import Style, add_styles_to_score_and_parts
+from mscz_formatter.mscz.metrics import Metric, MetricsRecorder, MetricsSink
+from mscz_formatter.mscz.plan_cache import DirectoryPlanCache, PlanCache
+from mscz_formatter.mscz.styles import (
+    Style,
+    add_styles_to_archive,
+    add_styles_to_score_and_parts,
+)
 
 __all__ = [
+    "BatchJob",
+    "BatchResult",
     "CONDUCTOR_SCORE_PART_NAME",
+    "DirectoryPlanCache",
     "ExcerptInfo",
     "FormattingParams",
+    "Metric",
+    "MetricsRecorder",
+    "MetricsSink",
+    "MsczArchive",
+    "MscxDocuments",
+    "PlanCache",
     "ScoreInfo",
     "Style",
+    "add_styles_to_archive",
     "add_styles_to_score_and_parts",
     "apply_metadata_and_headers_to_mscx",
+    "apply_metadata_and_headers_to_tree",
     "format_mscz",
     "get_score_attributes",
+    "jobs_from_directory",
     "list_excerpts",
+    "load_manifest",
     "resolve_part_mpos",
+    "run_batch",
     "set_score_properties",
     "unpack_mscz_to_tempdir",
 ]
@@ -0,0 +1,131 @@
+"""In-memory view of an MSCZ (zip) archive: lazy reads, in-memory edits, raw copies."""
+
+from __future__ import annotations
+
+import copy
+import io
+import os
+import struct
+import zipfile
+
+# Local file header: signature … filename length, extra length (see APPNOTE 4.3.7).
+_LOCAL_HEADER = struct.Struct(zipfile.structFileHeader)
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+
+class MsczArchive:
+    """
+    Members of one ``.mscz`` read straight from the source zip.
+
+    ``read`` pulls a member on demand; ``write`` keeps a replacement in memory.
+    ``save`` writes the archive in source member order: edited members are
+    deflated once, untouched ones (thumbnails, audio, …) are copied as their
+    original compressed bytes without recompressing. Nothing is extracted to
+    disk.
+    """
+
+    def __init__(self, mscz_path: str) -> None:
+        self.path = mscz_path
+        self._zip = zipfile.ZipFile(mscz_path, "r")
+        self._infos = {info.filename: info for info in self._zip.infolist()}
+        self.names = [info.filename for info in self._zip.infolist()]
+        self._edited: dict[str, bytes] = {}
+
+    def __enter__(self) -> MsczArchive:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def names_with_suffix(self, suffix: str) -> list[str]:
+        suffix = suffix.lower()
+        return [name for name in self.names if name.lower().endswith(suffix)]
+
+    def read(self, name: str) -> bytes:
+        if name in self._edited:
+            return self._edited[name]
+        return self._zip.read(name)
+
+    def size(self, name: str) -> int:
+        """Uncompressed size of ``name`` (its in-memory replacement if edited)."""
+        if name in self._edited:
+            return len(self._edited[name])
+        return self._infos[name].file_size
+
+    def write(self, name: str, data: bytes) -> None:
+        if name not in self._infos and name not in self._edited:
+            self.names.append(name)
+        self._edited[name] = data
+
+    def save(self, output_path: str) -> None:
+        """Write the archive to ``output_path`` (may be the source path)."""
+        if os.path.abspath(output_path) == os.path.abspath(self.path):
+            buffer = io.BytesIO()
+            self._write_to(buffer)
+            with open(output_path, "wb") as f:
+                f.write(buffer.getvalue())
+            return
+        with open(output_path, "wb") as f:
+            self._write_to(f)
+
+    def _write_to(self, fp) -> None:
+        with open(self.path, "rb") as src, zipfile.ZipFile(
+            fp, "w", zipfile.ZIP_DEFLATED
+        ) as dst:
+            for name in self.names:
+                info = self._infos.get(name)
+                if name in self._edited:
+                    dst.writestr(_edited_info(name, info), self._edited[name])
+                elif _can_copy_raw(info):
+                    _copy_raw(src, dst, info)
+                else:
+                    dst.writestr(info, self._zip.read(name))
+
+
+def _edited_info(name: str, source: zipfile.ZipInfo | None) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, source.date_time if source else (1980, 1, 1, 0, 0, 0))
+    if source is not None:
+        info.external_attr = source.external_attr
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _can_copy_raw(info: zipfile.ZipInfo | None) -> bool:
+    return (
+        info is not None
+        and not info.flag_bits & _FLAG_ENCRYPTED
+        and info.compress_size < zipfile.ZIP64_LIMIT
+        and info.file_size < zipfile.ZIP64_LIMIT
+        and info.header_offset < zipfile.ZIP64_LIMIT
+    )
+
+
+def _copy_raw(src, dst: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+    """
+    Append ``info``'s compressed bytes from ``src`` to ``dst`` unchanged.
+
+    ``zipfile`` has no public raw-copy API, so this writes the local header
+    itself and registers the entry the same way ``ZipFile.writestr`` does.
+    CRC and sizes come from the central directory, so no data descriptor.
+    """
+    src.seek(info.header_offset)
+    header = _LOCAL_HEADER.unpack(src.read(_LOCAL_HEADER.size))
+    name_len, extra_len = header[zipfile._FH_FILENAME_LENGTH], header[
+        zipfile._FH_EXTRA_FIELD_LENGTH
+    ]
+    src.seek(name_len + extra_len, os.SEEK_CUR)
+    data = src.read(info.compress_size)
+
+    out = copy.copy(info)
+    out.flag_bits &= ~_FLAG_DATA_DESCRIPTOR
+    out.header_offset = dst.fp.tell()
+    dst.fp.write(out.FileHeader(zip64=False))
+    dst.fp.write(data)
+    dst.filelist.append(out)
+    dst.NameToInfo[out.filename] = out
+    dst.start_dir = dst.fp.tell()
+    dst._didModify = True
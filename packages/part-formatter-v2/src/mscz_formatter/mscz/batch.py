@@ -0,0 +1,237 @@
+"""
+Format many MSCZ files in one run (``mscz-formatter batch``).
+
+Jobs come from a directory of scores or a JSON / CSV manifest, run across a
+process pool of long-lived workers (so per-process caches carry over from one
+score to the next), and produce one ``BatchResult`` per job in job order.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from logging import getLogger
+from pathlib import Path
+
+from mscz_formatter.mscz.format import format_mscz
+from mscz_formatter.mscz.metrics import MetricsRecorder
+from mscz_formatter.mscz.plan_cache import PlanCache
+
+LOGGER = getLogger("mscz_formatter")
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    input_path: str
+    output_path: str
+    part_mpos: dict[str, str] = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+
+
+@dataclass
+class BatchResult:
+    input_path: str
+    output_path: str
+    ok: bool
+    seconds: float
+    error: str | None = None
+    # Whole-file stage timings and counts (see ``mscz_formatter.mscz.metrics``).
+    stages: dict[str, float] = field(default_factory=dict)
+
+
+def jobs_from_directory(
+    input_dir: str, output_dir: str, params: dict | None = None
+) -> list[BatchJob]:
+    """
+    One job per ``*.mscz`` under ``input_dir``, written to the same relative
+    path under ``output_dir``.
+
+    Part layouts come from the ``.mpos`` files next to each score, keyed by
+    file stem (``0_Trumpet_in_Bb.mpos``); ``<score stem>.mpos`` is the full
+    score's own export and is ignored. Scores that share a folder would share
+    those files, so that layout needs a manifest instead.
+    """
+    params = dict(params or {})
+    source = Path(input_dir).resolve()
+    target = Path(output_dir).resolve()
+
+    scores = [
+        p
+        for p in sorted(source.rglob("*.mscz"))
+        if target == source or target not in p.parents
+    ]
+    jobs: list[BatchJob] = []
+    for score in scores:
+        part_mpos: dict[str, str] = {}
+        if params.get("apply_part_layout", True):
+            siblings = [p for p in scores if p.parent == score.parent]
+            if len(siblings) > 1:
+                raise ValueError(
+                    f"{score.parent} holds {len(siblings)} scores; their .mpos files "
+                    "cannot be told apart, use a manifest"
+                )
+            part_mpos = {
+                p.stem: str(p)
+                for p in sorted(score.parent.glob("*.mpos"))
+                if p.stem != score.stem
+            }
+        jobs.append(
+            BatchJob(
+                str(score),
+                str(target / score.relative_to(source)),
+                part_mpos,
+                params,
+            )
+        )
+    return jobs
+
+
+def _json_object(value: str | dict | None, what: str) -> dict:
+    if value is None or value == "":
+        return {}
+    data = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(data, dict):
+        raise ValueError(f"{what} must be a JSON object")
+    return data
+
+
+def load_manifest(path: str, params: dict | None = None) -> list[BatchJob]:
+    """
+    Jobs from a ``.json`` or ``.csv`` manifest. Relative paths are resolved
+    against the manifest's folder, and each job's params override ``params``.
+
+    JSON is a list of jobs, or ``{"params": {...}, "jobs": [...]}`` with
+    manifest-wide params. A job is ``{"input", "output", "part_mpos", "params"}``
+    (the last two optional). CSV has ``input`` and ``output`` columns, and
+    optional ``part_mpos`` / ``params`` columns holding JSON objects.
+    """
+    base = Path(path).resolve().parent
+    defaults = dict(params or {})
+
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            entries = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            defaults.update(_json_object(data.get("params"), "Manifest params"))
+            entries = data.get("jobs", [])
+        else:
+            entries = data
+        if not isinstance(entries, list):
+            raise ValueError("Manifest jobs must be a list")
+
+    def resolve(value: str) -> str:
+        return str(base / value)
+
+    jobs: list[BatchJob] = []
+    for line, entry in enumerate(entries, start=1):
+        if not entry.get("input") or not entry.get("output"):
+            raise ValueError(f"Manifest job {line} needs an input and an output")
+        part_mpos = _json_object(entry.get("part_mpos"), f"Job {line} part_mpos")
+        jobs.append(
+            BatchJob(
+                resolve(entry["input"]),
+                resolve(entry["output"]),
+                {str(k): resolve(str(v)) for k, v in part_mpos.items()},
+                {**defaults, **_json_object(entry.get("params"), f"Job {line} params")},
+            )
+        )
+    return jobs
+
+
+class _FirstError(logging.Handler):
+    """Keeps the first ERROR record ``format_mscz`` logs (it does not raise)."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+        self.message: str | None = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.message is None:
+            self.message = record.getMessage()
+            if record.exc_info and record.exc_info[1] is not None:
+                self.message += f": {record.exc_info[1]}"
+
+
+def _run_job(job: BatchJob, plan_cache: PlanCache | None) -> BatchResult:
+    recorder = MetricsRecorder()
+    errors = _FirstError()
+    LOGGER.addHandler(errors)
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(job.output_path) or ".", exist_ok=True)
+        ok = format_mscz(
+            job.input_path,
+            job.output_path,
+            job.part_mpos,
+            job.params,
+            plan_cache=plan_cache,
+            metrics=recorder,
+        )
+    except Exception as e:
+        # Argument errors (e.g. missing part_mpos) are raised, not logged.
+        ok = False
+        errors.message = errors.message or f"{type(e).__name__}: {e}"
+    finally:
+        LOGGER.removeHandler(errors)
+
+    return BatchResult(
+        job.input_path,
+        job.output_path,
+        ok,
+        time.perf_counter() - start,
+        None if ok else errors.message or "Formatting failed",
+        recorder.stages() if ok else {},
+    )
+
+
+def run_batch(
+    jobs: list[BatchJob],
+    *,
+    max_workers: int | None = 1,
+    plan_cache: PlanCache | None = None,
+) -> list[BatchResult]:
+    """
+    Format every job, returning results in job order. A failing job does not
+    stop the others.
+
+    ``max_workers`` is the number of scores formatted at once (``None`` = one
+    per CPU); each score lays out its parts serially in its worker.
+    """
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_run_job(job, plan_cache) for job in jobs]
+
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    results: list[BatchResult] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_job, job, plan_cache) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker itself died (e.g. killed); the job never reported.
+                results.append(
+                    BatchResult(
+                        job.input_path, job.output_path, False, 0.0, f"{type(e).__name__}: {e}"
+                    )
+                )
+    return results
+
+
+def batch_report(results: list[BatchResult], seconds: float) -> dict:
+    """JSON-ready summary: totals plus one entry per job."""
+    failed = [r for r in results if not r.ok]
+    return {
+        "jobs": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "seconds": seconds,
+        "results": [asdict(r) for r in results],
+    }
@@ -0,0 +1,97 @@
+"""Parse-once, write-once registry of the MSCX documents inside an MSCZ."""
+
+from __future__ import annotations
+
+import io
+import os
+
+from mscz_formatter.mscz.archive import MsczArchive
+from mscz_formatter.xml_backend import ET, parse, serialize_document
+
+
+def serialize_mscx(tree: ET.ElementTree, *, reindent: bool = False) -> bytes:
+    """
+    Serialize ``tree`` the way MuseScore files are laid out.
+
+    Trees parsed from MuseScore output and edited through ``mscx.edits`` are
+    already indented, so by default the document is written as-is; pass
+    ``reindent=True`` for trees built or edited some other way.
+    """
+    if reindent:
+        ET.indent(tree, space="  ", level=0)
+    return serialize_document(tree)
+
+
+def write_mscx(tree: ET.ElementTree, mscx_path: str) -> None:
+    with open(mscx_path, "wb") as f:
+        f.write(serialize_mscx(tree))
+
+
+class MscxDocuments:
+    """
+    Shared parse trees for every ``.mscx`` in one MSCZ.
+
+    Paths are member names of ``archive`` when one is given (documents are
+    read from and written back to it in memory), else files on disk.
+
+    Each file is parsed on first access and every pipeline step (metadata,
+    headers, layout) mutates that same tree. ``edit`` marks a document for
+    write-back; ``write_all`` serializes each edited document exactly once,
+    right before the MSCZ is repacked. Documents only read (e.g. the score for
+    ``ScoreInfo``) are never rewritten.
+    """
+
+    def __init__(
+        self, mscx_files: list[str], archive: MsczArchive | None = None
+    ) -> None:
+        self.paths = list(mscx_files)
+        self._archive = archive
+        self._trees: dict[str, ET.ElementTree] = {}
+        self._dirty: set[str] = set()
+
+    @property
+    def score_path(self) -> str:
+        """The root score MSCX (the one not under ``Excerpts/``)."""
+        for mscx_path in self.paths:
+            if "Excerpts" not in mscx_path:
+                return mscx_path
+        raise ValueError("No score .mscx found in MSCZ (expected a non-Excerpts file)")
+
+    def get(self, mscx_path: str) -> ET.ElementTree:
+        """Parsed tree for ``mscx_path``; parses on first access only."""
+        tree = self._trees.get(mscx_path)
+        if tree is None:
+            source = (
+                io.BytesIO(self._archive.read(mscx_path))
+                if self._archive is not None
+                else mscx_path
+            )
+            tree = parse(source)
+            self._trees[mscx_path] = tree
+        return tree
+
+    def size(self, mscx_path: str) -> int:
+        """Byte size of the document as stored (before any edits here)."""
+        if self._archive is not None:
+            return self._archive.size(mscx_path)
+        return os.path.getsize(mscx_path)
+
+    def edit(self, mscx_path: str) -> ET.ElementTree:
+        """Like ``get``, but the tree is written back by ``write_all``."""
+        self._dirty.add(mscx_path)
+        return self.get(mscx_path)
+
+    def replace(self, mscx_path: str, tree: ET.ElementTree) -> None:
+        """Swap in a tree edited elsewhere (e.g. returned by a worker process)."""
+        self._trees[mscx_path] = tree
+        self._dirty.add(mscx_path)
+
+    def write_all(self) -> None:
+        for mscx_path in self.paths:
+            if mscx_path not in self._dirty:
+                continue
+            if self._archive is not None:
+                self._archive.write(mscx_path, serialize_mscx(self._trees[mscx_path]))
+            else:
+                write_mscx(self._trees[mscx_path], mscx_path)
+        self._dirty.clear()
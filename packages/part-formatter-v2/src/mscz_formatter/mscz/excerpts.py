@@ -34,6 +34,8 @@ def _parse_excerpt_key(key: str) -> tuple[int | None, str]:
 def list_excerpts(work_dir: str, mscx_files: list[str] | None = None) -> list[ExcerptInfo]:
     """
     Return every part MSCX under ``Excerpts/``, sorted by index then key.
+
+    With an empty ``work_dir``, ``mscx_files`` are archive member names.
     """
     if mscx_files is None:
         mscx_files = []
@@ -44,7 +46,7 @@ def list_excerpts(work_dir: str, mscx_files: list[str] | None = None) -> list[Ex
 
     excerpts: list[ExcerptInfo] = []
     for path in mscx_files:
-        rel = os.path.relpath(path, work_dir).replace("\\", "/")
+        rel = (os.path.relpath(path, work_dir) if work_dir else path).replace("\\", "/")
         parts = rel.split("/")
         if len(parts) < 2 or parts[0] != "Excerpts":
             continue
@@ -4,22 +4,32 @@ MSCZ-level orchestration: unpack/repack, styles, metadata, and per-part MPOS lay
 
 from __future__ import annotations
 
-from logging import getLogger
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from logging import Handler, LogRecord, getLogger
 from typing import NotRequired, TypedDict
 import os
-import shutil
-import xml.etree.ElementTree as ET
+import time
 
 from mscz_formatter.mscx.apply import apply_layout_to_tree
 from mscz_formatter.mscx.lines import add_line_breaks
-from mscz_formatter.mscx.load import load_in
+from mscz_formatter.mscx.load import first_staff_measures, load_in
 from mscz_formatter.mscx.pages import pages_from_lines
+from mscz_formatter.mscx.plan import (
+    features_fingerprint,
+    layout_fingerprint,
+    plan_from_pages,
+)
+from mscz_formatter.mscz.archive import MsczArchive
+from mscz_formatter.mscz.documents import MscxDocuments
 from mscz_formatter.mscz.excerpts import list_excerpts, resolve_part_mpos
-from mscz_formatter.mscz.file_processing import unpack_mscz_to_tempdir
 from mscz_formatter.mscz.inspect import ScoreInfo, get_all_properties
-from mscz_formatter.mscz.metadata import apply_metadata_and_headers_to_mscx
+from mscz_formatter.mscz.metadata import apply_metadata_and_headers_to_tree
+from mscz_formatter.mscz.metrics import Meter, Metric, MetricsRecorder, MetricsSink
+from mscz_formatter.mscz.plan_cache import PlanCache
 from mscz_formatter.mscz.spatium import normalize_staff_spacing_strategy
-from mscz_formatter.mscz.styles import Style, add_styles_to_score_and_parts
+from mscz_formatter.mscz.styles import Style, add_styles_to_archive
+from mscz_formatter.xml_backend import ET, from_portable, to_portable
 
 LOGGER = getLogger("mscz_formatter")
 
@@ -42,38 +52,232 @@ class FormattingParams(TypedDict):
     optimize_for_page_turns: NotRequired[bool]
 
 
+def _score_attributes(documents: MscxDocuments) -> ScoreInfo:
+    root = documents.get(documents.score_path).getroot()
+    score = root.find("Score")
+    if score is None:
+        raise ValueError("No <Score> tag found in the XML.")
+    return get_all_properties(score)
+
+
 def get_score_attributes(input_path: str) -> ScoreInfo:
     """Parse score-level metadata / staff counts from the root MSCX inside an MSCZ."""
-    with unpack_mscz_to_tempdir(input_path, repack=False) as (_work_dir, mscx_files):
-        target = ""
-        for mscx_path in mscx_files:
-            if "Excerpts" not in mscx_path:
-                target = mscx_path
-                break
-        if not target:
-            raise ValueError("No score .mscx found in MSCZ (expected a non-Excerpts file)")
-
-        tree = ET.parse(target)
-        root = tree.getroot()
-        score = root.find("Score")
-        if score is None:
-            raise ValueError("No <Score> tag found in the XML.")
-        return get_all_properties(score)
+    with MsczArchive(input_path) as archive:
+        return _score_attributes(
+            MscxDocuments(archive.names_with_suffix(".mscx"), archive)
+        )
 
 
 def _format_part_with_mpos(
+    tree: ET.ElementTree,
     mscx_path: str,
     mpos_path: str,
     *,
     optimize_for_page_turns: bool = True,
+    plan_cache: PlanCache | None = None,
+    meter: Meter | None = None,
 ) -> None:
-    data = load_in(mscx_path, mpos_path)
-    lines = add_line_breaks(data["rendered_measures"])
-    pages = pages_from_lines(lines, optimize_for_page_turns=optimize_for_page_turns)
-    apply_layout_to_tree(data["tree"], pages, data["measures_by_hash"], mscx_path)
+    """
+    Plan and apply layout onto the already-parsed part ``tree`` in place.
+
+    With a ``plan_cache``, a part whose measures, .mpos and layout params are
+    unchanged since a previous run gets its cached breaks applied directly;
+    the .mpos is not parsed and neither DP runs. Failing that, a plan cached
+    for the same rendered-measure features still skips both DPs.
+
+    ``meter`` receives the part's stage timings and sizes (see ``metrics``).
+    """
+    meter = meter or Meter(None)
+    stats: dict[str, int] | None = {} if meter.enabled else None
+
+    def plan_pages(rendered_measures):
+        with meter.time("lines"):
+            lines = add_line_breaks(rendered_measures, stats=stats)
+        with meter.time("pages"):
+            pages = pages_from_lines(
+                lines, optimize_for_page_turns=optimize_for_page_turns, stats=stats
+            )
+        meter.count("line_count", len(lines))
+        meter.count("page_count", len(pages))
+        return pages
+
+    def report(measure_count: int, cache_hit: bool) -> None:
+        meter.count("measure_count", measure_count)
+        meter.count("plan_cache_hit", int(cache_hit))
+        for name, value in (stats or {}).items():
+            meter.count(name, value)
+
+    if plan_cache is None:
+        with meter.time("load"):
+            data = load_in(mscx_path, mpos_path, tree)
+        pages = plan_pages(data["rendered_measures"])
+        with meter.time("apply"):
+            apply_layout_to_tree(data["tree"], pages, data["measures"], mscx_path)
+        report(len(data["measures"]), False)
+        return
+
+    with meter.time("plan_lookup"):
+        measures = first_staff_measures(tree)
+        with open(mpos_path, "rb") as f:
+            part_key = layout_fingerprint(
+                measures, f.read(), optimize_for_page_turns=optimize_for_page_turns
+            )
+        plan = plan_cache.get(part_key)
+    if plan is not None:
+        LOGGER.info("Reusing cached layout plan for %s", mscx_path)
+        with meter.time("apply"):
+            apply_layout_to_tree(tree, plan, measures, mscx_path)
+        report(len(measures), True)
+        return
 
+    # The features lookup needs the rendered measures, so it counts as load.
+    with meter.time("load"):
+        data = load_in(mscx_path, mpos_path, tree)
+        features_key = features_fingerprint(
+            data["rendered_measures"], optimize_for_page_turns=optimize_for_page_turns
+        )
+        plan = plan_cache.get(features_key)
+    cache_hit = plan is not None
+    if plan is None:
+        plan = plan_from_pages(plan_pages(data["rendered_measures"]))
+        plan_cache.put(features_key, plan)
+    else:
+        LOGGER.info("Reusing cached layout plan (same measure features) for %s", mscx_path)
+    with meter.time("apply"):
+        apply_layout_to_tree(data["tree"], plan, data["measures"], mscx_path)
+    plan_cache.put(part_key, plan)
+    report(len(data["measures"]), cache_hit)
+
+
+class _RecordBuffer(Handler):
+    """Collect log records in a worker so the parent can replay them in order."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[LogRecord] = []
 
-def _apply_metadata_and_headers(mscx_files: list[str], params: dict, style: Style) -> None:
+    def emit(self, record: LogRecord) -> None:
+        # Flatten to plain strings so the record pickles back to the parent.
+        record.msg = self.format(record) if record.exc_info else record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        self.records.append(record)
+
+
+def _format_part_in_worker(
+    portable_tree: ET.ElementTree | bytes,
+    mscx_path: str,
+    mpos_path: str,
+    optimize_for_page_turns: bool,
+    plan_cache: PlanCache | None,
+    log_level: int,
+    collect_metrics: bool,
+) -> tuple[ET.ElementTree | bytes, list[LogRecord], tuple[int, int], list[Metric]]:
+    """
+    Process-pool entry point for ``_format_part_with_mpos``.
+
+    The part's tree travels to the worker and back pickled (serialized first
+    under the lxml backend, whose trees do not pickle), so it is never
+    written to disk here. Records are buffered instead of
+    emitted, so parts never interleave in the log; ``format_mscz`` replays
+    them in part order. Metrics are returned the same way.
+    """
+    tree = from_portable(portable_tree)
+    # The cache is a pickled copy: report only this part's lookups back.
+    before = (plan_cache.hits, plan_cache.misses) if plan_cache is not None else (0, 0)
+    buffer = _RecordBuffer()
+    recorder = MetricsRecorder() if collect_metrics else None
+    handlers, propagate, level = LOGGER.handlers[:], LOGGER.propagate, LOGGER.level
+    LOGGER.handlers = [buffer]
+    LOGGER.propagate = False
+    LOGGER.setLevel(log_level)
+    try:
+        _format_part_with_mpos(
+            tree,
+            mscx_path,
+            mpos_path,
+            optimize_for_page_turns=optimize_for_page_turns,
+            plan_cache=plan_cache,
+            meter=Meter(recorder),
+        )
+    finally:
+        LOGGER.handlers = handlers
+        LOGGER.propagate = propagate
+        LOGGER.setLevel(level)
+    counts = (
+        (plan_cache.hits - before[0], plan_cache.misses - before[1])
+        if plan_cache is not None
+        else (0, 0)
+    )
+    return to_portable(tree), buffer.records, counts, recorder.metrics if recorder else []
+
+
+def _format_parts(
+    documents: MscxDocuments,
+    jobs: list[tuple[str, str, str]],
+    *,
+    optimize_for_page_turns: bool,
+    max_workers: int | None,
+    plan_cache: PlanCache | None = None,
+    meter: Meter | None = None,
+) -> None:
+    """
+    Run MPOS layout for each ``(excerpt_key, mscx_path, mpos_path)`` job.
+
+    Each part only touches its own MSCX tree, so with ``max_workers`` other
+    than 1 the parts fan out across a process pool. Output files are identical
+    to a serial run, and logs and metrics come out in job order either way.
+    """
+    meter = meter or Meter(None)
+    for excerpt_key, mscx_path, _mpos_path in jobs:
+        meter.for_part(excerpt_key).count("mscx_bytes", documents.size(mscx_path))
+
+    if max_workers == 1 or len(jobs) <= 1:
+        for excerpt_key, mscx_path, mpos_path in jobs:
+            LOGGER.info("Formatting part %s with MPOS %s", excerpt_key, mpos_path)
+            _format_part_with_mpos(
+                documents.edit(mscx_path),
+                mscx_path,
+                mpos_path,
+                optimize_for_page_turns=optimize_for_page_turns,
+                plan_cache=plan_cache,
+                meter=meter.for_part(excerpt_key),
+            )
+        return
+
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    log_level = LOGGER.getEffectiveLevel()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _format_part_in_worker,
+                to_portable(documents.get(mscx_path)),
+                mscx_path,
+                mpos_path,
+                optimize_for_page_turns,
+                plan_cache,
+                log_level,
+                meter.enabled,
+            )
+            for _excerpt_key, mscx_path, mpos_path in jobs
+        ]
+        for (excerpt_key, mscx_path, mpos_path), future in zip(jobs, futures):
+            LOGGER.info("Formatting part %s with MPOS %s", excerpt_key, mpos_path)
+            tree, records, (hits, misses), metrics = future.result()
+            if plan_cache is not None:
+                plan_cache.add_counts(hits, misses)
+            for record in records:
+                LOGGER.handle(record)
+            part_meter = meter.for_part(excerpt_key)
+            for metric in metrics:
+                part_meter.forward(replace(metric, part=excerpt_key))
+            documents.replace(mscx_path, from_portable(tree))
+
+
+def _apply_metadata_and_headers(
+    documents: MscxDocuments, params: dict, style: Style
+) -> None:
     show_title = params.get("show_title") or ""
     show_number = params.get("show_number") or ""
     version_num = params.get("version_num") or ""
@@ -91,10 +295,11 @@ def _apply_metadata_and_headers(mscx_files: list[str], params: dict, style: Styl
     ):
         return
 
-    for mscx_path in mscx_files:
+    for mscx_path in documents.paths:
         LOGGER.info("Applying metadata/headers to %s", mscx_path)
-        apply_metadata_and_headers_to_mscx(
-            mscx_path,
+        apply_metadata_and_headers_to_tree(
+            documents.edit(mscx_path),
+            mscx_path=mscx_path,
             show_title=show_title,
             show_number=show_number,
             version_num=version_num,
@@ -113,6 +318,10 @@ def format_mscz(
     output_path: str,
     part_mpos: dict[str, str],
     params: FormattingParams | dict | None = None,
+    *,
+    max_workers: int | None = 1,
+    plan_cache: PlanCache | None = None,
+    metrics: MetricsSink | None = None,
 ) -> bool:
     """
     Format one MSCZ using one MPOS file per part that should be exported.
@@ -126,12 +335,27 @@ def format_mscz(
             (``Trumpet_in_Bb``), or excerpt indices (``0``). May be empty when
             ``apply_part_layout`` is False.
         params: Style, metadata, spatium, and step toggles.
+        max_workers: Process pool size for per-part layout. ``1`` (default)
+            formats parts serially in this process; ``None`` uses one worker
+            per CPU.
+        plan_cache: Persistent store of per-part layout plans. Parts whose
+            measures, .mpos and layout params match a previous run, or whose
+            rendered-measure features do, reuse that plan instead of
+            re-running line/page planning. Hit/miss counts are logged.
+        metrics: Callable or ``record(metric)`` object receiving per-stage
+            timings, DP state counts and per-part sizes as ``Metric`` values
+            (see ``mscz_formatter.mscz.metrics``).
 
     Pipeline:
       1. Optional MSS styles (score + excerpts)
       2. Optional score metaTags + Broadway / part-name VBox headers
       3. Optional MPOS-based line/page layout on listed parts
 
+    The input is never extracted: each MSCX is parsed once into a shared
+    ``MscxDocuments`` registry that steps 2 and 3 mutate, edited members are
+    serialized once into ``output_path``, and untouched members are copied
+    without recompression (see ``MsczArchive``).
+
     When ``optimize_for_page_turns`` is False, line breaks are still planned
     and applied, but the page-turn DP (page breaks / V.S. blanks) is skipped.
     """
@@ -156,40 +380,63 @@ def format_mscz(
         raw_val = str(raw_val)
     staff_spacing_value = (raw_val or "").strip() or None
 
-    shutil.copyfile(input_path, output_path)
-    score_info = get_score_attributes(input_path)
-
+    meter = Meter(metrics)
     try:
-        with unpack_mscz_to_tempdir(output_path) as (work_dir, mscx_files):
-            if apply_mss_style:
-                add_styles_to_score_and_parts(
-                    style,
-                    work_dir,
-                    score_info=score_info,
-                    staff_spacing_strategy=staff_spacing_strategy,
-                    staff_spacing_value=staff_spacing_value,
-                )
-
-            _apply_metadata_and_headers(mscx_files, params, style)
-
-            excerpts = list_excerpts(work_dir, mscx_files)
-            if not excerpts:
-                LOGGER.warning("No Excerpts/*.mscx parts found in %s", input_path)
-
-            resolved = resolve_part_mpos(excerpts, part_mpos)
-
-            if apply_part_layout:
-                for excerpt_key, (excerpt, mpos_path) in resolved.items():
-                    LOGGER.info(
-                        "Formatting part %s with MPOS %s",
-                        excerpt_key,
-                        mpos_path,
-                    )
-                    _format_part_with_mpos(
-                        excerpt.mscx_path,
-                        mpos_path,
-                        optimize_for_page_turns=optimize_for_page_turns,
-                    )
+        with meter.time("total"):
+            # Members are read lazily from the input zip and edited in memory;
+            # nothing is extracted to disk. Every MSCX is parsed at most once
+            # and all steps share those trees.
+            unpack_start = time.perf_counter()
+            with MsczArchive(input_path) as archive:
+                mscx_files = archive.names_with_suffix(".mscx")
+                documents = MscxDocuments(mscx_files, archive)
+                score_info = _score_attributes(documents)
+                meter.timing("unpack", time.perf_counter() - unpack_start)
+
+                if apply_mss_style:
+                    with meter.time("styles"):
+                        add_styles_to_archive(
+                            style,
+                            archive,
+                            score_info=score_info,
+                            staff_spacing_strategy=staff_spacing_strategy,
+                            staff_spacing_value=staff_spacing_value,
+                        )
+
+                with meter.time("metadata"):
+                    _apply_metadata_and_headers(documents, params, style)
+
+                excerpts = list_excerpts("", mscx_files)
+                if not excerpts:
+                    LOGGER.warning("No Excerpts/*.mscx parts found in %s", input_path)
+
+                resolved = resolve_part_mpos(excerpts, part_mpos)
+
+                if apply_part_layout:
+                    meter.count("parts", len(resolved))
+                    with meter.time("layout"):
+                        _format_parts(
+                            documents,
+                            [
+                                (excerpt_key, excerpt.mscx_path, mpos_path)
+                                for excerpt_key, (excerpt, mpos_path) in resolved.items()
+                            ],
+                            optimize_for_page_turns=optimize_for_page_turns,
+                            max_workers=max_workers,
+                            plan_cache=plan_cache,
+                            meter=meter,
+                        )
+                    if plan_cache is not None:
+                        LOGGER.info(
+                            "Layout plan cache: %(hits)d hits, %(misses)d misses",
+                            plan_cache.stats(),
+                        )
+
+                with meter.time("write"):
+                    documents.write_all()
+                with meter.time("repack"):
+                    archive.save(output_path)
+        meter.count("output_bytes", os.path.getsize(output_path))
 
     except Exception:
         LOGGER.exception("Failed to process %s", input_path)
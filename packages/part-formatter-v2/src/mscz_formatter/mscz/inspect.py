@@ -1,7 +1,8 @@
 """Inspect / mutate score metadata inside an unpacked MSCX."""
 
 from typing import TypedDict
-import xml.etree.ElementTree as ET
+
+from mscz_formatter.xml_backend import ET
 
 
 class ScoreInfo(TypedDict):
@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
-import xml.etree.ElementTree as ET
 from logging import getLogger
 
+from mscz_formatter.mscx.edits import append_child, insert_child
+from mscz_formatter.mscz.documents import write_mscx
+from mscz_formatter.xml_backend import ET, parse
+
 LOGGER = getLogger("mscz_formatter")
 
 CONDUCTOR_SCORE_PART_NAME = "CONDUCTOR SCORE"
@@ -29,7 +32,7 @@ def set_score_properties(score: ET.Element, properties: dict[str, str | None]) -
             new_tag = ET.Element("metaTag")
             new_tag.set("name", key)
             new_tag.text = text
-            score.insert(insert_index, new_tag)
+            insert_child(score, insert_index, new_tag)
             insert_index += 1
 
 
@@ -64,8 +67,8 @@ def add_broadway_header(staff: ET.Element, show_number: str, show_title: str) ->
     """Append MvtNo / MvtTitle text to the first title VBox on ``staff``."""
     for elem in staff:
         if elem.tag == "VBox":
-            elem.append(_make_show_number_text(show_number))
-            elem.append(_make_show_title_text(show_title))
+            append_child(elem, _make_show_number_text(show_number))
+            append_child(elem, _make_show_title_text(show_title))
             return
 
 
@@ -84,13 +87,14 @@ def add_part_name(
                 style = child.find("style")
                 if style is not None and style.text == "instrument_excerpt":
                     return
-            elem.append(_make_part_name_text(part_name))
+            append_child(elem, _make_part_name_text(part_name))
             return
 
 
-def apply_metadata_and_headers_to_mscx(
-    mscx_path: str,
+def apply_metadata_and_headers_to_tree(
+    tree: ET.ElementTree,
     *,
+    mscx_path: str = "<mscx>",
     show_title: str = "",
     show_number: str = "",
     version_num: str = "",
@@ -103,11 +107,10 @@ def apply_metadata_and_headers_to_mscx(
     is_broadway: bool = False,
 ) -> None:
     """
-    Write metaTags and optional VBox header texts into one ``.mscx`` file.
+    Write metaTags and optional VBox header texts into a parsed MSCX tree.
 
-    Safe to call when layout is skipped (metadata-only export).
+    ``mscx_path`` is only used in messages; the caller owns serialization.
     """
-    tree = ET.parse(mscx_path)
     root = tree.getroot()
     score = root.find("Score")
     if score is None:
@@ -137,6 +140,39 @@ def apply_metadata_and_headers_to_mscx(
     else:
         LOGGER.warning("No <Staff> in %s; skipping VBox header updates", mscx_path)
 
-    with open(mscx_path, "wb") as f:
-        ET.indent(tree, space="  ", level=0)
-        tree.write(f, encoding="utf-8", xml_declaration=True)
+
+def apply_metadata_and_headers_to_mscx(
+    mscx_path: str,
+    *,
+    show_title: str = "",
+    show_number: str = "",
+    version_num: str = "",
+    work_title: str = "",
+    composer: str | None = None,
+    arranger: str | None = None,
+    apply_score_metadata: bool = True,
+    apply_broadway_vbox_header: bool = True,
+    apply_part_name_in_header: bool = True,
+    is_broadway: bool = False,
+) -> None:
+    """
+    Write metaTags and optional VBox header texts into one ``.mscx`` file.
+
+    Safe to call when layout is skipped (metadata-only export).
+    """
+    tree = parse(mscx_path)
+    apply_metadata_and_headers_to_tree(
+        tree,
+        mscx_path=mscx_path,
+        show_title=show_title,
+        show_number=show_number,
+        version_num=version_num,
+        work_title=work_title,
+        composer=composer,
+        arranger=arranger,
+        apply_score_metadata=apply_score_metadata,
+        apply_broadway_vbox_header=apply_broadway_vbox_header,
+        apply_part_name_in_header=apply_part_name_in_header,
+        is_broadway=is_broadway,
+    )
+    write_mscx(tree, mscx_path)
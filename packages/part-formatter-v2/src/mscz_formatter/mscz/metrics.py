@@ -0,0 +1,107 @@
+"""
+Structured timings and counters from ``format_mscz``.
+
+Pass ``metrics=`` a callable taking one ``Metric``, or any object with a
+``record(metric)`` method (e.g. ``MetricsRecorder``). Whole-file stages are
+emitted with ``part=None``; per-part stages carry the excerpt key.
+
+Timings (seconds): ``unpack``, ``styles``, ``metadata``, ``layout``,
+``write``, ``repack``, ``total``; per part ``plan_lookup`` (layout plan
+cache key + lookup, with a cache only), ``load``, ``lines``, ``pages``,
+``apply``. Stages a part skips (e.g. both DPs on a cache hit) are not emitted.
+
+Counts: ``parts``, ``output_bytes``; per part ``mscx_bytes``,
+``measure_count``, ``line_count``, ``page_count``, ``line_dp_states`` / ``line_dp_candidates`` (start
+indices and scored (start, end) windows of the line DP), ``page_dp_states``
+/ ``page_dp_groups`` (DP states and page groups scored by the page DP) and
+``plan_cache_hit``.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Literal, Protocol
+
+
+@dataclass(frozen=True)
+class Metric:
+    name: str
+    kind: Literal["timing", "count"]
+    value: float
+    part: str | None = None
+
+
+class _Recorder(Protocol):
+    def record(self, metric: Metric) -> None: ...
+
+
+MetricsSink = Callable[[Metric], None] | _Recorder
+
+
+class MetricsRecorder:
+    """Sink that keeps every metric it receives, in order."""
+
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+
+    def record(self, metric: Metric) -> None:
+        self.metrics.append(metric)
+
+    def stages(self) -> dict[str, float]:
+        """Whole-file values by name (per-part metrics summed across parts)."""
+        totals: dict[str, float] = {}
+        for metric in self.metrics:
+            totals[metric.name] = totals.get(metric.name, 0.0) + metric.value
+        return totals
+
+    def parts(self) -> dict[str, dict[str, float]]:
+        """Per-part values: ``{excerpt_key: {name: value}}``."""
+        by_part: dict[str, dict[str, float]] = {}
+        for metric in self.metrics:
+            if metric.part is not None:
+                by_part.setdefault(metric.part, {})[metric.name] = metric.value
+        return by_part
+
+
+class Meter:
+    """Emit metrics to ``sink``; every method is a no-op without one."""
+
+    def __init__(self, sink: MetricsSink | None, part: str | None = None) -> None:
+        if sink is None or callable(sink):
+            self._emit = sink
+        else:
+            self._emit = sink.record
+        self.part = part
+
+    @property
+    def enabled(self) -> bool:
+        return self._emit is not None
+
+    def for_part(self, part: str) -> Meter:
+        meter = Meter(None, part)
+        meter._emit = self._emit
+        return meter
+
+    def forward(self, metric: Metric) -> None:
+        """Re-emit a metric recorded elsewhere (e.g. in a worker process)."""
+        if self._emit is not None:
+            self._emit(metric)
+
+    def timing(self, name: str, seconds: float) -> None:
+        if self._emit is not None:
+            self._emit(Metric(name, "timing", seconds, self.part))
+
+    def count(self, name: str, value: float) -> None:
+        if self._emit is not None:
+            self._emit(Metric(name, "count", value, self.part))
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timing(name, time.perf_counter() - start)
@@ -0,0 +1,176 @@
+"""
+Persistent cache of per-part layout plans.
+
+Keys are ``layout_fingerprint`` (part content + .mpos) or
+``features_fingerprint`` (rendered-measure features + cost constants) hashes;
+values are ``LayoutPlan`` JSON. ``DirectoryPlanCache`` is the default store;
+other backends (e.g. a Django / Redis cache) subclass ``PlanCache``.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from logging import getLogger
+
+from mscz_formatter.mscx.plan import LayoutPlan, plan_from_json, plan_to_json
+
+LOGGER = getLogger("mscz_formatter")
+
+# Stores between directory rescans when this process's own estimate stays in
+# bounds; other processes sharing the directory only show up in a rescan.
+_RESCAN_EVERY = 200
+
+
+def default_plan_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "mscz-formatter", "plans")
+
+
+class PlanCache(ABC):
+    """
+    Key → ``LayoutPlan`` store. Subclasses implement ``_load`` / ``_store``
+    over serialized plan text; a broken or unreadable entry is a miss.
+
+    ``hits`` / ``misses`` count lookups made through this instance (worker
+    processes report theirs back via ``add_counts``).
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> LayoutPlan | None:
+        plan: LayoutPlan | None = None
+        text = self._load(key)
+        if text is not None:
+            try:
+                plan = plan_from_json(text)
+            except (ValueError, KeyError, TypeError):
+                LOGGER.warning("Discarding unreadable cached layout plan %s", key)
+        if plan is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return plan
+
+    def put(self, key: str, plan: LayoutPlan) -> None:
+        self._store(key, plan_to_json(plan))
+
+    def add_counts(self, hits: int, misses: int) -> None:
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @abstractmethod
+    def _load(self, key: str) -> str | None: ...
+
+    @abstractmethod
+    def _store(self, key: str, text: str) -> None: ...
+
+
+class DirectoryPlanCache(PlanCache):
+    """
+    One JSON file per key under ``directory``; safe across processes.
+
+    Size-bounded LRU: a hit refreshes the file's mtime, and the least
+    recently used files are evicted until at most ``max_entries`` files and
+    ``max_bytes`` bytes remain. The directory is scanned on the first store,
+    then only when the last scan plus this instance's stores since passes a
+    bound (or every ``_RESCAN_EVERY`` stores), not on every store.
+
+    An unwritable directory degrades to no caching.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        *,
+        max_entries: int = 5000,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        super().__init__()
+        self.directory = directory or default_plan_cache_dir()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Entries / bytes as of the last scan plus stores since (None: never scanned).
+        self._entries: int | None = None
+        self._bytes = 0
+        self._stores_since_scan = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return text
+
+    def _store(self, key: str, text: str) -> None:
+        tmp_path: str | None = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write-then-rename so concurrent readers never see a partial plan.
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            LOGGER.warning("Could not store layout plan %s", key, exc_info=True)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        if self._entries is not None and self._stores_since_scan < _RESCAN_EVERY:
+            # Overwrites count as new entries; that only makes a rescan come sooner.
+            self._entries += 1
+            self._bytes += len(text)
+            self._stores_since_scan += 1
+            if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+                return
+        self._evict()
+
+    def _evict(self) -> None:
+        entries: list[tuple[float, int, str]] = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError:
+            LOGGER.warning("Could not scan layout plan cache %s", self.directory, exc_info=True)
+            return
+
+        self._entries, self._bytes, self._stores_since_scan = len(entries), total, 0
+        if len(entries) <= self.max_entries and total <= self.max_bytes:
+            return
+
+        entries.sort()
+        count = len(entries)
+        for _mtime, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            count -= 1
+            total -= size
+        self._entries, self._bytes = count, total
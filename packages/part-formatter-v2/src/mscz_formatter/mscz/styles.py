@@ -5,11 +5,13 @@ from __future__ import annotations
 import os
 import re
 from enum import Enum
+from functools import lru_cache
 from logging import getLogger
 from pathlib import Path
 
 import importlib.resources as resources
 
+from mscz_formatter.mscz.archive import MsczArchive
 from mscz_formatter.mscz.inspect import set_style_params
 from mscz_formatter.mscz.spatium import (
     normalize_staff_spacing_strategy,
@@ -34,6 +36,16 @@ JAZZ_SCORE_STYLE_PATH = get_resource_path("jazz_score.mss")
 JAZZ_PART_STYLE_PATH = get_resource_path("jazz_part.mss")
 
 
+def _spatium_from_mss_text(txt: str) -> str | None:
+    m = re.search(r"<spatium>\s*([^<]+?)\s*</spatium>", txt)
+    if not m:
+        return None
+    val = m.group(1).strip()
+    if val and not val.startswith("DIVISI:"):
+        return val
+    return None
+
+
 def collect_spatium_from_existing_mss_files(work_dir: str) -> dict[str, str]:
     """
     Read <spatium> from each .mss under work_dir before templates overwrite them.
@@ -51,11 +63,8 @@ def collect_spatium_from_existing_mss_files(work_dir: str) -> dict[str, str]:
                     txt = f.read()
             except OSError:
                 continue
-            m = re.search(r"<spatium>\s*([^<]+?)\s*</spatium>", txt)
-            if not m:
-                continue
-            val = m.group(1).strip()
-            if val and not val.startswith("DIVISI:"):
+            val = _spatium_from_mss_text(txt)
+            if val:
                 found[rel] = val
     return found
 
@@ -81,6 +90,105 @@ def _style_params_for_mss(
     return predict_style_params(score_info)
 
 
+def _template_paths(style: Style) -> tuple[Path, Path]:
+    """(score template, part template) for ``style``."""
+    if style == Style.BROADWAY:
+        return BROADWAY_SCORE_STYLE_PATH, BROADWAY_PART_STYLE_PATH
+    if style == Style.JAZZ:
+        return JAZZ_SCORE_STYLE_PATH, JAZZ_PART_STYLE_PATH
+    raise ValueError(f"Unsupported style: {style}")
+
+
+@lru_cache(maxsize=None)
+def _template_text(path: Path) -> str:
+    """Template file contents, read once per process."""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=256)
+def _rendered_template(style: Style, is_excerpt: bool, staff_spacing: str | None) -> bytes:
+    """
+    Encoded template with its spatium filled in. Every part of a score (and
+    every score in a batch) shares one of a handful of keys.
+    """
+    score_style_path, part_style_path = _template_paths(style)
+    text = _template_text(part_style_path if is_excerpt else score_style_path)
+    style_params = {} if staff_spacing is None else {"staff_spacing": staff_spacing}
+    return set_style_params(text, **style_params).encode("utf-8")
+
+
+def render_style_templates(
+    style: Style,
+    mss_keys: list[str],
+    score_info=None,
+    staff_spacing_strategy: str = "predict",
+    staff_spacing_value: str | None = None,
+    preserved: dict[str, str] | None = None,
+) -> dict[str, bytes]:
+    """
+    Encoded template for each .mss, keyed like ``mss_keys`` (forward-slash
+    paths relative to the MSCZ root). ``preserved`` holds existing spatium
+    values for the ``preserve`` strategy.
+    """
+    _template_paths(style)  # unsupported styles fail even with no .mss files
+    strategy = normalize_staff_spacing_strategy(staff_spacing_strategy)
+    override_val = (staff_spacing_value or "").strip() or None
+
+    rendered: dict[str, bytes] = {}
+    for rel_key in mss_keys:
+        is_excerpt = "Excerpts" in rel_key
+        style_params = _style_params_for_mss(
+            strategy=strategy,
+            rel_key=rel_key,
+            is_excerpt=is_excerpt,
+            score_info=score_info,
+            preserved=preserved or {},
+            override_value=override_val,
+        )
+        staff_spacing = style_params.get("staff_spacing")
+        rendered[rel_key] = _rendered_template(
+            style, is_excerpt, None if staff_spacing is None else str(staff_spacing)
+        )
+    return rendered
+
+
+def add_styles_to_archive(
+    style: Style,
+    archive: MsczArchive,
+    score_info=None,
+    staff_spacing_strategy: str = "predict",
+    staff_spacing_value: str | None = None,
+) -> None:
+    """
+    Replace every .mss member of an in-memory MSCZ with the Broadway/Jazz
+    score or part template.
+    """
+    mss_keys = archive.names_with_suffix(".mss")
+    preserved: dict[str, str] = {}
+    if normalize_staff_spacing_strategy(staff_spacing_strategy) == "preserve":
+        for rel_key in mss_keys:
+            val = _spatium_from_mss_text(archive.read(rel_key).decode("utf-8"))
+            if val:
+                preserved[rel_key] = val
+
+    rendered = render_style_templates(
+        style,
+        mss_keys,
+        score_info=score_info,
+        staff_spacing_strategy=staff_spacing_strategy,
+        staff_spacing_value=staff_spacing_value,
+        preserved=preserved,
+    )
+    for rel_key, style_bytes in rendered.items():
+        archive.write(rel_key, style_bytes)
+        LOGGER.info(
+            "Replaced %s style: %s",
+            "part" if "Excerpts" in rel_key else "score",
+            rel_key,
+        )
+
+
 def add_styles_to_score_and_parts(
     style: Style,
     work_dir: str,
@@ -91,49 +199,35 @@ def add_styles_to_score_and_parts(
     """
     Replace every .mss under work_dir with the Broadway/Jazz score or part template.
     """
-    if style == Style.BROADWAY:
-        score_style_path = BROADWAY_SCORE_STYLE_PATH
-        part_style_path = BROADWAY_PART_STYLE_PATH
-    elif style == Style.JAZZ:
-        score_style_path = JAZZ_SCORE_STYLE_PATH
-        part_style_path = JAZZ_PART_STYLE_PATH
-    else:
-        raise ValueError(f"Unsupported style: {style}")
-
     strategy = normalize_staff_spacing_strategy(staff_spacing_strategy)
-    override_val = (staff_spacing_value or "").strip() or None
     preserved: dict[str, str] = {}
     if strategy == "preserve":
         preserved = collect_spatium_from_existing_mss_files(work_dir)
 
+    full_paths: dict[str, str] = {}
     for root, _, files in os.walk(work_dir):
         for filename in files:
             if not filename.lower().endswith(".mss"):
                 continue
-
             full_path = os.path.join(root, filename)
-            rel_path = os.path.relpath(full_path, work_dir)
-            rel_key = rel_path.replace("\\", "/")
-            is_excerpt = "Excerpts" in rel_path
-
-            source_style = part_style_path if is_excerpt else score_style_path
-            style_params = _style_params_for_mss(
-                strategy=strategy,
-                rel_key=rel_key,
-                is_excerpt=is_excerpt,
-                score_info=score_info,
-                preserved=preserved,
-                override_value=override_val,
-            )
-
-            with open(source_style, "r", encoding="utf-8") as f:
-                style_text = set_style_params(f.read(), **style_params)
-
-            with open(full_path, "w", encoding="utf-8") as out_f:
-                out_f.write(style_text)
-
-            LOGGER.info(
-                "Replaced %s style: %s",
-                "part" if is_excerpt else "score",
-                full_path,
-            )
+            rel_key = os.path.relpath(full_path, work_dir).replace("\\", "/")
+            full_paths[rel_key] = full_path
+
+    rendered = render_style_templates(
+        style,
+        list(full_paths),
+        score_info=score_info,
+        staff_spacing_strategy=strategy,
+        staff_spacing_value=staff_spacing_value,
+        preserved=preserved,
+    )
+    for rel_key, style_bytes in rendered.items():
+        full_path = full_paths[rel_key]
+        with open(full_path, "wb") as out_f:
+            out_f.write(style_bytes)
+
+        LOGGER.info(
+            "Replaced %s style: %s",
+            "part" if "Excerpts" in rel_key else "score",
+            full_path,
+        )
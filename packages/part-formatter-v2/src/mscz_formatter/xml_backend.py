@@ -0,0 +1,94 @@
+"""
+ElementTree implementation used for every MSCX tree.
+
+``ET`` is ``lxml.etree`` when ``MSCZ_XML_BACKEND=lxml`` (or ``auto``) and lxml
+is installed, else the stdlib ``xml.etree.ElementTree``. Modules build and
+inspect elements through ``ET`` so trees never mix implementations, and go
+through ``parse`` / ``serialize_document`` so the bytes written are the same
+whichever backend is active.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import xml.etree.ElementTree as STDLIB
+from logging import getLogger
+from types import ModuleType
+
+LOGGER = getLogger("mscz_formatter")
+
+
+def _select_backend() -> ModuleType:
+    wanted = os.environ.get("MSCZ_XML_BACKEND", "stdlib").strip().lower()
+    if wanted in ("lxml", "auto"):
+        try:
+            from lxml import etree
+        except ImportError:
+            if wanted == "lxml":
+                LOGGER.warning("MSCZ_XML_BACKEND=lxml but lxml is not installed; using stdlib")
+        else:
+            return etree
+    return STDLIB
+
+
+ET = _select_backend()
+BACKEND = "stdlib" if ET is STDLIB else "lxml"
+
+
+def _is_stdlib(etree: ModuleType) -> bool:
+    return etree is STDLIB
+
+
+def parse(source, *, etree: ModuleType = ET):
+    """Parse a path or binary file object. Comments and PIs are dropped, as stdlib does."""
+    if _is_stdlib(etree):
+        return etree.parse(source, etree.XMLParser())
+    return etree.parse(source, etree.XMLParser(remove_comments=True, remove_pis=True))
+
+
+def serialize_document(tree, encoding: str = "utf-8", *, etree: ModuleType = ET) -> bytes:
+    """
+    ``tree.write(f, encoding=encoding, xml_declaration=True)`` bytes, exactly
+    as the stdlib writes them.
+
+    lxml differs only in spelling: ``<a/>`` for ``<a />``, ``&#9;`` for
+    ``&#09;`` in attributes, its own XML declaration, and ``<a></a>`` for an
+    element whose text is ``""`` (stdlib writes that like ``None``). ``<`` and
+    ``>`` are always escaped in text and attributes, so every ``/>`` in its
+    output closes a tag.
+    """
+    if _is_stdlib(etree):
+        buffer = io.BytesIO()
+        tree.write(buffer, encoding=encoding, xml_declaration=True)
+        return buffer.getvalue()
+
+    # Serialize ``text == ""`` as ``None`` (a short tag), then put it back.
+    emptied = [elem for elem in tree.getroot().iter() if elem.text == ""]
+    for elem in emptied:
+        elem.text = None
+    try:
+        body = etree.tostring(tree.getroot(), encoding=encoding, xml_declaration=False)
+    finally:
+        for elem in emptied:
+            elem.text = ""
+    body = body.replace(b"/>", b" />").replace(b"&#9;", b"&#09;")
+    return f"<?xml version='1.0' encoding='{encoding}'?>\n".encode(encoding) + body
+
+
+def write_document(tree, path: str, encoding: str = "utf-8") -> None:
+    with open(path, "wb") as f:
+        f.write(serialize_document(tree, encoding))
+
+
+def to_portable(tree):
+    """``tree`` in a form that pickles (lxml trees do not)."""
+    if _is_stdlib(ET):
+        return tree
+    return ET.tostring(tree.getroot())
+
+
+def from_portable(value):
+    if isinstance(value, bytes):
+        return ET.ElementTree(ET.fromstring(value))
+    return value
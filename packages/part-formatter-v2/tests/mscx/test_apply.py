@@ -1,7 +1,7 @@
-import xml.etree.ElementTree as ET
-
-from mscz_formatter.mscx.apply import apply_pages_to_staff
+from mscz_formatter.mscx.apply import apply_pages_to_staff, apply_plan_to_staff
 from mscz_formatter.mscx.models import Line, Page, RenderedMeasure, SourceMeasure
+from mscz_formatter.mscx.plan import PagePlan
+from mscz_formatter.xml_backend import ET
 
 
 def _measure_el(voice: bool = True) -> ET.Element:
@@ -12,23 +12,23 @@ def _measure_el(voice: bool = True) -> ET.Element:
 
 
 def _rendered(
-    hash_key: int,
+    index: int,
     *,
     is_mm_rest: bool = False,
-    mm_rest_hashes: list[int] | None = None,
+    mm_rest_indices: list[int] | None = None,
 ) -> RenderedMeasure:
     return RenderedMeasure(
-        num=hash_key,
+        num=index,
         width=100,
         height=100,
-        source_measure_hash=hash_key,
-        source_measure=SourceMeasure(num=hash_key, hash_key=hash_key, is_rest=False),
+        source_measure_index=index,
+        source_measure=SourceMeasure(num=index, index=index, is_rest=False),
         has_double_bar=False,
         has_existing_line_break=False,
         has_rehearsal_mark=False,
         is_mm_rest=is_mm_rest,
-        mm_rest_hashes=mm_rest_hashes or [],
-        mm_rest_span=1 + len(mm_rest_hashes or []) if is_mm_rest else None,
+        mm_rest_indices=mm_rest_indices or [],
+        mm_rest_span=1 + len(mm_rest_indices or []) if is_mm_rest else None,
     )
 
 
@@ -43,21 +43,21 @@ def _line_break_subtype(measure: ET.Element) -> str | None:
 def test_line_break_on_normal_measure_only_targets_source():
     m1 = _measure_el()
     m2 = _measure_el()
-    measures_by_hash = {1: m1, 2: m2}
+    measures = [m1, m2]
     staff = ET.Element("Staff")
     staff.extend([m1, m2])
 
     pages = [
         Page(
             lines=[
+                Line(measures=[_rendered(0)], rm_count=1, c_count=1),
                 Line(measures=[_rendered(1)], rm_count=1, c_count=1),
-                Line(measures=[_rendered(2)], rm_count=1, c_count=1),
             ],
             is_first_page=True,
         )
     ]
 
-    apply_pages_to_staff(staff, pages, measures_by_hash)
+    apply_pages_to_staff(staff, pages, measures)
 
     assert _line_break_subtype(m1) == "line"
     assert _line_break_subtype(m2) is None
@@ -69,28 +69,22 @@ def test_line_break_on_mm_rest_targets_visible_and_last_hidden():
     hidden2 = _measure_el()
     hidden3 = _measure_el()
     next_bar = _measure_el()
-    measures_by_hash = {
-        10: visible,
-        11: hidden1,
-        12: hidden2,
-        13: hidden3,
-        14: next_bar,
-    }
+    measures = [visible, hidden1, hidden2, hidden3, next_bar]
     staff = ET.Element("Staff")
     staff.extend([visible, hidden1, hidden2, hidden3, next_bar])
 
-    mm_rest = _rendered(10, is_mm_rest=True, mm_rest_hashes=[11, 12, 13])
+    mm_rest = _rendered(0, is_mm_rest=True, mm_rest_indices=[1, 2, 3])
     pages = [
         Page(
             lines=[
                 Line(measures=[mm_rest], rm_count=1, c_count=4),
-                Line(measures=[_rendered(14)], rm_count=1, c_count=1),
+                Line(measures=[_rendered(4)], rm_count=1, c_count=1),
             ],
             is_first_page=True,
         )
     ]
 
-    apply_pages_to_staff(staff, pages, measures_by_hash)
+    apply_pages_to_staff(staff, pages, measures)
 
     assert _line_break_subtype(visible) == "line"
     assert _line_break_subtype(hidden1) is None
@@ -104,23 +98,23 @@ def test_page_break_on_mm_rest_targets_visible_and_last_hidden():
     hidden1 = _measure_el()
     hidden2 = _measure_el()
     next_bar = _measure_el()
-    measures_by_hash = {10: visible, 11: hidden1, 12: hidden2, 20: next_bar}
+    measures = [visible, hidden1, hidden2, next_bar]
     staff = ET.Element("Staff")
     staff.extend([visible, hidden1, hidden2, next_bar])
 
-    mm_rest = _rendered(10, is_mm_rest=True, mm_rest_hashes=[11, 12])
+    mm_rest = _rendered(0, is_mm_rest=True, mm_rest_indices=[1, 2])
     pages = [
         Page(
             lines=[Line(measures=[mm_rest], rm_count=1, c_count=3)],
             is_first_page=True,
         ),
         Page(
-            lines=[Line(measures=[_rendered(20)], rm_count=1, c_count=1)],
+            lines=[Line(measures=[_rendered(3)], rm_count=1, c_count=1)],
             is_first_page=False,
         ),
     ]
 
-    apply_pages_to_staff(staff, pages, measures_by_hash)
+    apply_pages_to_staff(staff, pages, measures)
 
     assert _line_break_subtype(visible) == "page"
     assert _line_break_subtype(hidden1) is None
@@ -131,23 +125,23 @@ def test_page_break_on_mm_rest_targets_visible_and_last_hidden():
 def test_blank_vs_page_inserts_vbox_with_page_break():
     m1 = _measure_el()
     m2 = _measure_el()
-    measures_by_hash = {1: m1, 2: m2}
+    measures = [m1, m2]
     staff = ET.Element("Staff")
     staff.extend([m1, m2])
 
     pages = [
         Page(
-            lines=[Line(measures=[_rendered(1)], rm_count=1, c_count=1)],
+            lines=[Line(measures=[_rendered(0)], rm_count=1, c_count=1)],
             is_first_page=True,
         ),
         Page(lines=[], is_first_page=False, is_blank_vs=True),
         Page(
-            lines=[Line(measures=[_rendered(2)], rm_count=1, c_count=1)],
+            lines=[Line(measures=[_rendered(1)], rm_count=1, c_count=1)],
             is_first_page=False,
         ),
     ]
 
-    apply_pages_to_staff(staff, pages, measures_by_hash)
+    apply_pages_to_staff(staff, pages, measures)
 
     assert _line_break_subtype(m1) == "page"
     assert staff[1].tag == "VBox"
@@ -162,24 +156,52 @@ def test_blank_vs_page_inserts_vbox_with_page_break():
 def test_blank_vs_frames_are_scrubbed_on_reapply():
     m1 = _measure_el()
     m2 = _measure_el()
-    measures_by_hash = {1: m1, 2: m2}
+    measures = [m1, m2]
     staff = ET.Element("Staff")
     staff.extend([m1, m2])
 
     pages = [
         Page(
-            lines=[Line(measures=[_rendered(1)], rm_count=1, c_count=1)],
+            lines=[Line(measures=[_rendered(0)], rm_count=1, c_count=1)],
             is_first_page=True,
         ),
         Page(lines=[], is_first_page=False, is_blank_vs=True),
         Page(
-            lines=[Line(measures=[_rendered(2)], rm_count=1, c_count=1)],
+            lines=[Line(measures=[_rendered(1)], rm_count=1, c_count=1)],
             is_first_page=False,
         ),
     ]
 
-    apply_pages_to_staff(staff, pages, measures_by_hash)
-    apply_pages_to_staff(staff, pages, measures_by_hash)
+    apply_pages_to_staff(staff, pages, measures)
+    apply_pages_to_staff(staff, pages, measures)
 
     vboxes = [c for c in staff if c.tag == "VBox"]
     assert len(vboxes) == 1
+
+
+def test_several_blank_vs_pages_land_after_their_measures():
+    measures = [_measure_el() for _ in range(6)]
+    title = ET.Element("VBox")
+    staff = ET.Element("Staff")
+    staff.extend([title, *measures])
+
+    plan = (
+        PagePlan(line_breaks=((0,), (1,))),
+        PagePlan(line_breaks=(), is_blank_vs=True),
+        PagePlan(line_breaks=((3,),)),
+        PagePlan(line_breaks=(), is_blank_vs=True),
+        PagePlan(line_breaks=((5,),)),
+    )
+
+    for _ in range(2):
+        apply_plan_to_staff(staff, plan, measures)
+
+        tags = ["VS" if c.tag == "VBox" and c is not title else c.tag for c in staff]
+        assert tags == [
+            "VBox", "Measure", "Measure", "VS", "Measure", "Measure", "VS", "Measure", "Measure",
+        ]
+        assert list(staff)[2] is measures[1]
+        assert list(staff)[5] is measures[3]
+        assert [_line_break_subtype(m) for m in measures] == [
+            "line", "page", None, "page", None, None,
+        ]
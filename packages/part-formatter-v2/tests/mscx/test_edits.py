@@ -0,0 +1,80 @@
+from pathlib import Path
+
+from mscz_formatter.mscx.apply import apply_layout_to_tree
+from mscz_formatter.mscx.edits import append_child, insert_child, remove_child
+from mscz_formatter.mscx.load import first_staff_measures
+from mscz_formatter.mscx.plan import PagePlan
+from mscz_formatter.mscz.documents import serialize_mscx
+from mscz_formatter.mscz.metadata import apply_metadata_and_headers_to_tree
+from mscz_formatter.xml_backend import ET
+
+TEST_DATA_DIR = Path(__file__).resolve().parents[1] / "test-data"
+SAMPLE_MSCX = TEST_DATA_DIR / "sample-mscx" / "Test_Regular_Line_Breaks.mscx"
+
+
+def _indented_sample() -> ET.ElementTree:
+    tree = ET.parse(SAMPLE_MSCX)
+    ET.indent(tree, space="  ", level=0)
+    return tree
+
+
+def _assert_needs_no_reindent(tree: ET.ElementTree) -> None:
+    assert serialize_mscx(tree) == serialize_mscx(tree, reindent=True)
+
+
+def test_edits_keep_indentation_at_every_position():
+    root = ET.fromstring("<a>\n  <b>\n    <c />\n  </b>\n  <d />\n</a>")
+    tree = ET.ElementTree(root)
+    b = root[0]
+
+    insert_child(root, 0, ET.fromstring("<first><x>1</x></first>"))
+    insert_child(b, 1, ET.Element("mid"))
+    append_child(root, ET.Element("last"))
+    empty = ET.Element("empty")
+    insert_child(root, 1, empty)
+    append_child(empty, ET.Element("only"))
+    _assert_needs_no_reindent(tree)
+
+    remove_child(root, root[-1])
+    remove_child(b, b[0])
+    _assert_needs_no_reindent(tree)
+
+
+def test_layout_and_headers_need_no_reindent():
+    tree = _indented_sample()
+    measures = first_staff_measures(tree)
+    plan = (
+        PagePlan(line_breaks=((3,), (7,))),
+        PagePlan(line_breaks=(), is_blank_vs=True),
+        PagePlan(line_breaks=((11,), (len(measures) - 1,))),
+    )
+
+    apply_layout_to_tree(tree, plan, measures, "sample")
+    apply_metadata_and_headers_to_tree(
+        tree, show_title="Show", show_number="1", version_num="2", is_broadway=True
+    )
+    _assert_needs_no_reindent(tree)
+
+    # Re-applying scrubs the old breaks and V.S. frame first.
+    apply_layout_to_tree(tree, plan[:1], measures, "sample")
+    _assert_needs_no_reindent(tree)
+
+
+def test_write_back_keeps_untouched_whitespace():
+    untouched = serialize_mscx(ET.parse(SAMPLE_MSCX))
+    tree = ET.parse(SAMPLE_MSCX)
+
+    apply_layout_to_tree(
+        tree, (PagePlan(line_breaks=((3,), (7,))),), first_staff_measures(tree), "sample"
+    )
+    written = serialize_mscx(tree).decode()
+
+    # Every line of the round-tripped source survives; only the break is added.
+    original_lines = untouched.decode().splitlines()
+    written_lines = written.splitlines()
+    added = [line for line in written_lines if line not in original_lines]
+    assert [line.strip() for line in added] == [
+        "<LayoutBreak>",
+        "<subtype>line</subtype>",
+        "</LayoutBreak>",
+    ]
@@ -1,9 +1,19 @@
+import tracemalloc
+
+from mscz_formatter.mscx.lib.line_cost import (
+    ABSOLUTE_MAX_LINE_C_COUNT,
+    MAX_LINE_C_COUNT,
+    line_cost,
+    line_costs,
+)
 from mscz_formatter.mscx.lines import (
     ALTERNATE_LINE_LENGTH,
     MEASURES_PER_LINE,
+    _breakable_ends,
+    _furthest_feasible_ends,
     generate_lines,
 )
-from mscz_formatter.mscx.models import RenderedMeasure, SourceMeasure
+from mscz_formatter.mscx.models import Line, MeasureColumns, RenderedMeasure, SourceMeasure
 
 
 def _measure(
@@ -22,10 +32,10 @@ def _measure(
         num=num,
         width=width,
         height=10,
-        source_measure_hash=num,
+        source_measure_index=num,
         source_measure=SourceMeasure(
             num=num,
-            hash_key=num,
+            index=num,
             is_rest=False,
             measure_repeat_span=measure_repeat_span,
             measure_repeat_index=measure_repeat_index,
@@ -34,7 +44,7 @@ def _measure(
         has_existing_line_break=False,
         has_rehearsal_mark=has_rehearsal_mark,
         is_mm_rest=is_mm_rest,
-        mm_rest_hashes=[],
+        mm_rest_indices=[],
         mm_rest_span=mm_rest_span,
         has_slur_or_tie_into_next=has_slur_or_tie_into_next,
         measure_repeat_span=measure_repeat_span,
@@ -419,3 +429,119 @@ def test_multi_measure_repeat_can_share_line_when_complete():
     assert [m.num for m in lines[0].measures] == [1, 2, 3, 4, 5, 6]
     assert lines[0].measures[-1].measure_repeat_index == 4
     assert not lines[0].measures[-1].continues_measure_repeat
+
+
+def test_measure_columns_match_materialized_lines():
+    measures = [
+        _measure(1, width=120.5),
+        _measure(2, is_mm_rest=True, mm_rest_span=4, has_rehearsal_mark=True),
+        _measure(6, is_mm_rest=True, mm_rest_span=2, has_rehearsal_mark=True),
+        _measure(8, has_rehearsal_mark=True, has_double_bar=True),
+        _measure(9, width=333.25),
+    ]
+    cols = MeasureColumns.from_measures(measures)
+
+    for start in range(len(measures)):
+        for end in range(start, len(measures)):
+            line = Line(measures=[], rm_count=0, c_count=0)
+            for m in measures[start : end + 1]:
+                line.add_measure(m)
+            assert cols.line_width(start, end) == line.width
+            assert cols.line_height(start, end) == line.height
+            assert cols.line_c_count(start, end) == line.c_count
+            assert cols.line_mm_rest_count(start, end) == sum(
+                m.is_mm_rest for m in line.measures
+            )
+
+    # RM on the second of two consecutive MM rests is not buried mid-line;
+    # the RM on M8 is.
+    assert cols.line_buried_rehearsal_marks(0, 4) == 2
+    assert cols.line_buried_rehearsal_marks(1, 2) == 0
+
+
+def test_furthest_feasible_ends_match_growing_each_line():
+    measures = [
+        _measure(1, width=9000),
+        _measure(2, is_mm_rest=True, mm_rest_span=30),
+        _measure(32),
+        *_four_bar_repeat(33),
+        *[_measure(i, width=2000) for i in range(37, 52)],
+        _measure(52, is_mm_rest=True, mm_rest_span=8),
+        _measure(60, is_mm_rest=True, mm_rest_span=14),
+        *[_measure(i, width=30000) for i in range(74, 78)],
+        _measure(78, width=200000),
+        _measure(79),
+    ]
+    cols = MeasureColumns.from_measures(measures)
+    n = len(cols)
+    limit = _furthest_feasible_ends(cols)
+    breakable, position = _breakable_ends(cols)
+
+    for start in range(n):
+        # Reference: grow the line until a ceiling stops it.
+        end = start
+        while end < n:
+            c_count = cols.line_c_count(start, end)
+            if not cols.line_is_valid(start, end):
+                break
+            if c_count > ABSOLUTE_MAX_LINE_C_COUNT and not (
+                end == start and cols.is_mm_rest[start]
+            ):
+                break
+            if c_count > MAX_LINE_C_COUNT and not cols.line_mm_rest_count(start, end):
+                break
+            end += 1
+        assert limit[start] == end - 1
+
+        ends = breakable[position[start] : position[limit[start] + 1]]
+        assert ends == [
+            e for e in range(start, end) if not cols.continues_measure_repeat[e]
+        ]
+
+
+def _long_part(count: int) -> list[RenderedMeasure]:
+    return [
+        _measure(
+            i,
+            width=15000 + (i * 37) % 5000,
+            has_rehearsal_mark=i % 16 == 0,
+        )
+        for i in range(count)
+    ]
+
+
+def test_long_part_plans_without_recursion_in_linear_memory():
+    """5,000 rendered measures: no RecursionError, DP memory grows ~linearly."""
+    peaks: dict[int, int] = {}
+    for count in (1000, 5000):
+        measures = _long_part(count)
+        tracemalloc.start()
+        try:
+            lines = generate_lines(measures)
+            _, peaks[count] = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert sum(line.rm_count for line in lines) == count
+
+    # 5x the measures must stay well under the ~25x a quadratic table costs.
+    assert peaks[5000] < 7 * peaks[1000]
+
+
+def test_batch_line_costs_match_scalar_reference():
+    measures = [
+        _measure(1),
+        _measure(2, has_rehearsal_mark=True),
+        _measure(3, is_mm_rest=True, mm_rest_span=4, has_double_bar=True),
+        _measure(7, is_mm_rest=True, mm_rest_span=8, has_rehearsal_mark=True),
+        _measure(15, has_double_bar=True),
+        _measure(16, is_mm_rest=True, mm_rest_span=2),
+        _measure(18, has_rehearsal_mark=True),
+        *[_measure(i) for i in range(19, 27)],
+    ]
+    cols = MeasureColumns.from_measures(measures)
+
+    for start in range(len(measures)):
+        ends = list(range(start, len(measures)))
+        expected = [line_cost(cols, start, end) for end in ends]
+        assert line_costs(cols, start, ends) == expected
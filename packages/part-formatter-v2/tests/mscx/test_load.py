@@ -1,4 +1,4 @@
-import xml.etree.ElementTree as ET
+import pickle
 from pathlib import Path
 
 import pytest
@@ -11,6 +11,7 @@ from mscz_formatter.mscx.load import (
 )
 from mscz_formatter.mscx.models import (
     Line,
+    MeasureFeatures,
     Page,
     SourceMeasure,
     MAX_LINE_WIDTH,
@@ -18,6 +19,7 @@ from mscz_formatter.mscx.models import (
     SYSTEM_DISTANCE,
     TITLE_BOX_OFFSET,
 )
+from mscz_formatter.xml_backend import ET
 
 TEST_DATA_DIR = Path(__file__).resolve().parents[1] / "test-data"
 SAMPLE_MSCX_DIR = TEST_DATA_DIR / "sample-mscx"
@@ -30,25 +32,25 @@ def _visible_source_measures(source_measures):
 
 
 def test_load_mscx_regular_line_breaks():
-    _tree, measures_by_hash, source_measures = load_mscx_file(str(LINE_BREAKS_MSCX))
+    _tree, measures, source_measures = load_mscx_file(str(LINE_BREAKS_MSCX))
 
     assert len(source_measures) == 32
-    assert len(measures_by_hash) == 32
+    assert len(measures) == 32
     assert source_measures[0].num == 1
     assert source_measures[-1].num == 32
     assert all(not sm.is_mm_rest_span for sm in source_measures)
     assert all(not sm.is_hidden_by_mm_rest for sm in source_measures)
 
-    for sm in source_measures:
-        assert sm.hash_key in measures_by_hash
-        assert isinstance(measures_by_hash[sm.hash_key], ET.Element)
+    for i, sm in enumerate(source_measures):
+        assert sm.index == i
+        assert isinstance(measures[sm.index], ET.Element)
 
 
 def test_load_mscx_with_mm_rests():
-    _tree, measures_by_hash, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
+    _tree, measures, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
 
     assert len(source_measures) == 34
-    assert len(measures_by_hash) == 34
+    assert len(measures) == 34
 
     mm_spans = [sm for sm in source_measures if sm.is_mm_rest_span]
     hidden = [sm for sm in source_measures if sm.is_hidden_by_mm_rest]
@@ -96,6 +98,33 @@ def test_source_measure_detects_nested_barline():
     assert SourceMeasure.get_has_double_bar(measure_with_barline)
 
 
+def test_measure_features_match_subtree_lookups():
+    root = ET.parse(MM_RESTS_MSCX).getroot()
+    staff = root.find("Score").findall("Staff")[0]
+
+    for m in staff.findall("Measure"):
+        features = MeasureFeatures.from_element(m)
+        assert features.mm_rest_len == measure_is_mm_rest_start(m)
+        assert features.has_double_bar == (m.find(".//BarLine") is not None)
+        assert features.has_rehearsal_mark == (m.find(".//RehearsalMark") is not None)
+        assert features.has_line_break == (m.find(".//LayoutBreak") is not None)
+
+
+def test_load_mpos_uses_cached_source_measure_flags(tmp_path):
+    """Rendered flags come from SourceMeasure; the XML tree is not needed."""
+    _tree, _measures, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
+    visible = _visible_source_measures(source_measures)
+
+    mpos_path = tmp_path / "sample.mpos"
+    _write_mpos(mpos_path, len(visible))
+    rendered = load_mpos_file(str(mpos_path), source_measures)
+
+    assert [m.has_double_bar for m in rendered] == [sm.has_double_bar for sm in visible]
+    assert [m.has_rehearsal_mark for m in rendered] == [
+        sm.has_rehearsal_mark for sm in visible
+    ]
+
+
 def _measure_with_spanner(spanner_xml: str) -> ET.Element:
     measure = ET.fromstring(
         f"""
@@ -244,11 +273,11 @@ def test_load_mpos_marks_slur_or_tie_into_next(tmp_path):
         """,
         encoding="utf-8",
     )
-    _tree, measures_by_hash, source_measures = load_mscx_file(str(mscx_path))
+    _tree, measures, source_measures = load_mscx_file(str(mscx_path))
     mpos_path = tmp_path / "slur.mpos"
     _write_mpos(mpos_path, len(source_measures))
 
-    rendered = load_mpos_file(str(mpos_path), measures_by_hash, source_measures)
+    rendered = load_mpos_file(str(mpos_path), source_measures)
 
     assert [m.has_slur_or_tie_into_next for m in rendered] == [
         True,
@@ -305,7 +334,7 @@ def test_load_detects_multi_measure_repeats_and_scales_width(tmp_path):
         """,
         encoding="utf-8",
     )
-    _tree, measures_by_hash, source_measures = load_mscx_file(str(mscx_path))
+    _tree, measures, source_measures = load_mscx_file(str(mscx_path))
 
     assert source_measures[0].measure_repeat_span is None
     for i, expected_index in enumerate((1, 2, 3, 4), start=1):
@@ -314,7 +343,7 @@ def test_load_detects_multi_measure_repeats_and_scales_width(tmp_path):
 
     mpos_path = tmp_path / "measure_repeats.mpos"
     _write_mpos(mpos_path, len(source_measures))
-    rendered = load_mpos_file(str(mpos_path), measures_by_hash, source_measures)
+    rendered = load_mpos_file(str(mpos_path), source_measures)
 
     assert rendered[0].width == 1000.0
     assert rendered[0].continues_measure_repeat is False
@@ -338,13 +367,13 @@ def _write_mpos(path: Path, count: int) -> None:
 
 
 def test_load_mpos_file_matches_visible_measures(tmp_path):
-    _tree, measures_by_hash, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
+    _tree, measures, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
     visible_count = len(_visible_source_measures(source_measures))
 
     mpos_path = tmp_path / "sample.mpos"
     _write_mpos(mpos_path, visible_count)
 
-    rendered = load_mpos_file(str(mpos_path), measures_by_hash, source_measures)
+    rendered = load_mpos_file(str(mpos_path), source_measures)
 
     assert len(rendered) == visible_count
     assert rendered[0].width == 1000.0
@@ -353,22 +382,36 @@ def test_load_mpos_file_matches_visible_measures(tmp_path):
     assert rendered[8].is_mm_rest
     assert rendered[8].mm_rest_span == 4
     assert rendered[8].source_measure.num == 9
-    assert len(rendered[8].mm_rest_hashes) == 4
+    assert rendered[8].source_measure_index == 9
+    assert rendered[8].mm_rest_indices == [8, 10, 11, 12]
     assert rendered[8].width == 1008.0
 
 
+def test_rendered_measures_pickle_without_xml_tree(tmp_path):
+    _tree, measures, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
+    mpos_path = tmp_path / "sample.mpos"
+    _write_mpos(mpos_path, len(_visible_source_measures(source_measures)))
+    rendered = load_mpos_file(str(mpos_path), source_measures)
+
+    restored = pickle.loads(pickle.dumps(rendered))
+
+    assert restored == rendered
+    for m in restored:
+        assert measures[m.source_measure_index].tag == "Measure"
+
+
 def test_load_mpos_file_raises_when_too_many_elements(tmp_path):
-    _tree, measures_by_hash, source_measures = load_mscx_file(str(LINE_BREAKS_MSCX))
+    _tree, measures, source_measures = load_mscx_file(str(LINE_BREAKS_MSCX))
 
     mpos_path = tmp_path / "too_many.mpos"
     _write_mpos(mpos_path, 40)
 
     with pytest.raises(ValueError, match="more rendered measures"):
-        load_mpos_file(str(mpos_path), measures_by_hash, source_measures)
+        load_mpos_file(str(mpos_path), source_measures)
 
 
 def test_load_in(tmp_path):
-    _tree, measures_by_hash, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
+    _tree, measures, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
     visible_count = len(_visible_source_measures(source_measures))
 
     mpos_path = tmp_path / "sample.mpos"
@@ -378,7 +421,8 @@ def test_load_in(tmp_path):
 
     assert len(data["source_measures"]) == 34
     assert len(data["rendered_measures"]) == visible_count
-    assert data["rendered_measures"][0].source_measure_hash in data["measures_by_hash"]
+    first = data["rendered_measures"][0]
+    assert data["measures"][first.source_measure_index] is not None
     assert data["tree"].getroot() is not None
 
 
@@ -389,37 +433,37 @@ def test_line_width_and_validity():
         num=0,
         width=100,
         height=10,
-        source_measure_hash=1,
-        source_measure=SourceMeasure(num=1, hash_key=1, is_rest=False),
+        source_measure_index=1,
+        source_measure=SourceMeasure(num=1, index=1, is_rest=False),
         has_double_bar=False,
         has_existing_line_break=False,
         has_rehearsal_mark=False,
         is_mm_rest=False,
-        mm_rest_hashes=[],
+        mm_rest_indices=[],
     )
     fits_exactly = RenderedMeasure(
         num=1,
         width=MAX_LINE_WIDTH - 100,
         height=10,
-        source_measure_hash=2,
-        source_measure=SourceMeasure(num=2, hash_key=2, is_rest=False),
+        source_measure_index=2,
+        source_measure=SourceMeasure(num=2, index=2, is_rest=False),
         has_double_bar=False,
         has_existing_line_break=False,
         has_rehearsal_mark=False,
         is_mm_rest=False,
-        mm_rest_hashes=[],
+        mm_rest_indices=[],
     )
     too_wide = RenderedMeasure(
         num=2,
         width=MAX_LINE_WIDTH + 1,
         height=10,
-        source_measure_hash=3,
-        source_measure=SourceMeasure(num=3, hash_key=3, is_rest=False),
+        source_measure_index=3,
+        source_measure=SourceMeasure(num=3, index=3, is_rest=False),
         has_double_bar=False,
         has_existing_line_break=False,
         has_rehearsal_mark=False,
         is_mm_rest=False,
-        mm_rest_hashes=[],
+        mm_rest_indices=[],
     )
 
     line = Line(measures=[narrow, fits_exactly], rm_count=2, c_count=2)
@@ -437,25 +481,25 @@ def test_page_height_and_validity():
         num=0,
         width=100,
         height=400,
-        source_measure_hash=1,
-        source_measure=SourceMeasure(num=1, hash_key=1, is_rest=False),
+        source_measure_index=1,
+        source_measure=SourceMeasure(num=1, index=1, is_rest=False),
         has_double_bar=False,
         has_existing_line_break=False,
         has_rehearsal_mark=False,
         is_mm_rest=False,
-        mm_rest_hashes=[],
+        mm_rest_indices=[],
     )
     oversized_measure = RenderedMeasure(
         num=1,
         width=100,
         height=MAX_PAGE_HEIGHT + 1,
-        source_measure_hash=2,
-        source_measure=SourceMeasure(num=2, hash_key=2, is_rest=False),
+        source_measure_index=2,
+        source_measure=SourceMeasure(num=2, index=2, is_rest=False),
         has_double_bar=False,
         has_existing_line_break=False,
         has_rehearsal_mark=False,
         is_mm_rest=False,
-        mm_rest_hashes=[],
+        mm_rest_indices=[],
     )
     line = Line(measures=[small_measure], rm_count=1, c_count=1)
 
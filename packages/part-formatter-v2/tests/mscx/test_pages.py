@@ -34,13 +34,13 @@ def _measure(
         num=num,
         width=100,
         height=height,
-        source_measure_hash=num,
-        source_measure=SourceMeasure(num=num, hash_key=num, is_rest=is_rest),
+        source_measure_index=num,
+        source_measure=SourceMeasure(num=num, index=num, is_rest=is_rest),
         has_double_bar=False,
         has_existing_line_break=False,
         has_rehearsal_mark=False,
         is_mm_rest=is_mm_rest,
-        mm_rest_hashes=[],
+        mm_rest_indices=[],
         mm_rest_span=mm_rest_span if is_mm_rest else None,
     )
 
@@ -157,6 +157,27 @@ def test_long_chart_first_page_then_spread():
     assert all(page.is_valid() for page in pages)
 
 
+def test_long_part_paginates_every_line_onto_valid_pages():
+    """A 12+ page book with mixed heights and rests keeps order and fits."""
+    lines = [
+        _line(
+            i,
+            height=8_000 + (i * 1_337) % 6_000,
+            is_rest=i % 7 == 3,
+            is_mm_rest=i % 11 == 5,
+        )
+        for i in range(120)
+    ]
+
+    pages = add_page_breaks(lines)
+
+    assert len(pages) >= 12
+    assert pages[0].is_first_page
+    assert not any(page.is_first_page for page in pages[1:])
+    assert _flatten(pages) == lines
+    assert all(page.is_valid() for page in pages if not page.is_blank_vs)
+
+
 def test_oversized_line_yields_no_valid_pages():
     """A single line taller than the page budget cannot form a valid page."""
     lines = [_line(0, height=MAX_PAGE_HEIGHT + 1)]
@@ -263,3 +284,17 @@ def test_pages_from_lines_delegates_to_add_page_breaks_when_enabled():
     lines = [_line(i, height=content_h) for i in range(5)]
 
     assert pages_from_lines(lines, optimize_for_page_turns=True) == add_page_breaks(lines)
+
+
+def test_conductor_length_score_paginates_without_recursion():
+    """60+ pages: state is bounded per line, not per (line, page number)."""
+    lines = [
+        _line(i, height=20_000 + (i * 977) % 9_000, is_rest=i % 5 == 4)
+        for i in range(400)
+    ]
+
+    pages = add_page_breaks(lines)
+
+    assert len(pages) >= 60
+    assert _flatten(pages) == lines
+    assert all(page.is_valid() for page in pages if not page.is_blank_vs)
@@ -0,0 +1,104 @@
+from pathlib import Path
+
+from mscz_formatter.mscx.apply import apply_layout_to_tree
+from mscz_formatter.mscx.lib import line_cost
+from mscz_formatter.mscx.lines import add_line_breaks
+from mscz_formatter.mscx.load import load_in, load_mscx_file
+from mscz_formatter.mscx.pages import pages_from_lines
+from mscz_formatter.mscx.plan import (
+    features_fingerprint,
+    layout_fingerprint,
+    plan_from_json,
+    plan_from_pages,
+    plan_to_json,
+)
+from mscz_formatter.xml_backend import ET
+
+TEST_DATA_DIR = Path(__file__).resolve().parents[1] / "test-data"
+MM_RESTS_MSCX = TEST_DATA_DIR / "sample-mscx" / "Test_Regular_Line_Breaks_with_mm_rests.mscx"
+
+
+def _write_mpos(path: Path, count: int) -> None:
+    elements = "\n".join(
+        f'    <element id="{i}" x="0" y="0" sx="{30000 + i}" sy="8000" page="0"></element>'
+        for i in range(count)
+    )
+    path.write_text(
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<score><elements>\n{elements}\n  </elements></score>',
+        encoding="utf-8",
+    )
+
+
+def _planned(tmp_path):
+    _tree, _measures, source_measures = load_mscx_file(str(MM_RESTS_MSCX))
+    mpos_path = tmp_path / "part.mpos"
+    _write_mpos(mpos_path, sum(not m.is_hidden_by_mm_rest for m in source_measures))
+    data = load_in(str(MM_RESTS_MSCX), str(mpos_path))
+    pages = pages_from_lines(add_line_breaks(data["rendered_measures"]))
+    return data, pages, mpos_path
+
+
+def test_plan_round_trips_through_json(tmp_path):
+    _data, pages, _mpos = _planned(tmp_path)
+    plan = plan_from_pages(pages)
+
+    assert plan
+    assert plan_from_json(plan_to_json(plan)) == plan
+
+
+def test_applying_plan_matches_applying_pages(tmp_path):
+    data, pages, _mpos = _planned(tmp_path)
+    from_plan = load_in(str(MM_RESTS_MSCX), str(tmp_path / "part.mpos"))
+
+    apply_layout_to_tree(data["tree"], pages, data["measures"], "pages")
+    apply_layout_to_tree(
+        from_plan["tree"],
+        plan_from_json(plan_to_json(plan_from_pages(pages))),
+        from_plan["measures"],
+        "plan",
+    )
+
+    assert ET.tostring(data["tree"].getroot()) == ET.tostring(from_plan["tree"].getroot())
+
+
+def test_fingerprint_ignores_layout_breaks_but_not_content(tmp_path):
+    data, pages, mpos_path = _planned(tmp_path)
+    mpos = mpos_path.read_bytes()
+    before = layout_fingerprint(data["measures"], mpos, optimize_for_page_turns=True)
+
+    apply_layout_to_tree(data["tree"], pages, data["measures"], "part")
+    assert layout_fingerprint(data["measures"], mpos, optimize_for_page_turns=True) == before
+
+    assert layout_fingerprint(data["measures"], mpos, optimize_for_page_turns=False) != before
+    assert layout_fingerprint(data["measures"], mpos + b" ", optimize_for_page_turns=True) != before
+
+    data["measures"][0].append(ET.Element("Dynamic"))
+    assert layout_fingerprint(data["measures"], mpos, optimize_for_page_turns=True) != before
+
+
+def test_fingerprints_track_cost_constants(tmp_path, monkeypatch):
+    data, _pages, mpos_path = _planned(tmp_path)
+    mpos = mpos_path.read_bytes()
+    layout_key = layout_fingerprint(data["measures"], mpos, optimize_for_page_turns=True)
+    features_key = features_fingerprint(data["rendered_measures"], optimize_for_page_turns=True)
+
+    monkeypatch.setattr(line_cost, "MEASURES_PER_LINE", line_cost.MEASURES_PER_LINE + 3)
+    assert layout_fingerprint(data["measures"], mpos, optimize_for_page_turns=True) != layout_key
+    assert features_fingerprint(data["rendered_measures"], optimize_for_page_turns=True) != features_key
+    monkeypatch.undo()
+
+    (weight, batch), *rest = line_cost.BATCH_MULTIPLIERS_AND_FUNCTIONS
+    monkeypatch.setattr(line_cost, "BATCH_MULTIPLIERS_AND_FUNCTIONS", [(weight + 1, batch), *rest])
+    assert layout_fingerprint(data["measures"], mpos, optimize_for_page_turns=True) != layout_key
+
+
+def test_features_fingerprint_tracks_planner_inputs(tmp_path):
+    data, _pages, mpos_path = _planned(tmp_path)
+    reloaded = load_in(str(MM_RESTS_MSCX), str(mpos_path))
+    key = features_fingerprint(data["rendered_measures"], optimize_for_page_turns=True)
+
+    assert features_fingerprint(reloaded["rendered_measures"], optimize_for_page_turns=True) == key
+    assert features_fingerprint(data["rendered_measures"], optimize_for_page_turns=False) != key
+
+    reloaded["rendered_measures"][0].width += 1
+    assert features_fingerprint(reloaded["rendered_measures"], optimize_for_page_turns=True) != key
@@ -0,0 +1,132 @@
+"""Tests for batch formatting (``mscz-formatter batch``)."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import zipfile
+from pathlib import Path
+
+from mscz_formatter.main import main
+from mscz_formatter.mscz import jobs_from_directory, load_manifest, run_batch
+
+TEST_DATA_DIR = Path(__file__).resolve().parents[1] / "test-data"
+NEW_TEST_SCORE = TEST_DATA_DIR / "New-Test-Score.mscz"
+BOWS_DIR = TEST_DATA_DIR / "e2e" / "bows"
+
+
+def _zip_members(path: Path) -> dict[str, bytes]:
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def test_directory_jobs_pair_scores_with_sibling_mpos(tmp_path):
+    show = tmp_path / "shows" / "bows"
+    show.mkdir(parents=True)
+    shutil.copy(BOWS_DIR / "bows.mscz", show)
+    for mpos in BOWS_DIR.glob("*.mpos"):
+        shutil.copy(mpos, show)
+
+    (job,) = jobs_from_directory(str(tmp_path / "shows"), str(tmp_path / "out"))
+
+    assert job.output_path == str(tmp_path / "out" / "bows" / "bows.mscz")
+    assert "bows" not in job.part_mpos
+    assert sorted(job.part_mpos) == sorted(
+        p.stem for p in BOWS_DIR.glob("*.mpos") if p.stem != "bows"
+    )
+
+
+def test_manifest_resolves_paths_and_layers_params(tmp_path):
+    (tmp_path / "jobs.csv").write_text(
+        "input,output,part_mpos,params\n"
+        'a.mscz,out/a.mscz,"{""0"": ""parts/a0.mpos""}","{""show_number"": ""3""}"\n'
+        "b.mscz,out/b.mscz,,\n",
+        encoding="utf-8",
+    )
+
+    a, b = load_manifest(str(tmp_path / "jobs.csv"), {"show_number": "1", "show_title": "T"})
+
+    assert a.input_path == str(tmp_path / "a.mscz")
+    assert a.part_mpos == {"0": str(tmp_path / "parts" / "a0.mpos")}
+    assert a.params == {"show_number": "3", "show_title": "T"}
+    assert b.part_mpos == {}
+    assert b.params == {"show_number": "1", "show_title": "T"}
+
+
+def test_batch_matches_single_runs_and_reports_failures(tmp_path):
+    part_mpos = {
+        p.stem: str(p) for p in sorted(BOWS_DIR.glob("*.mpos")) if p.stem != "bows"
+    }
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "params": {"show_title": "Skule Nite"},
+                "jobs": [
+                    {
+                        "input": str(BOWS_DIR / "bows.mscz"),
+                        "output": "out/bows.mscz",
+                        "part_mpos": part_mpos,
+                    },
+                    {"input": "missing.mscz", "output": "out/missing.mscz"},
+                    {
+                        "input": str(NEW_TEST_SCORE),
+                        "output": "out/new.mscz",
+                        "params": {"apply_part_layout": False},
+                    },
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    report_path = tmp_path / "report.json"
+
+    code = main(
+        ["batch", str(manifest), "--jobs", "2", "--no-plan-cache", "--report", str(report_path)]
+    )
+
+    assert code == 1
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert (report["jobs"], report["succeeded"], report["failed"]) == (3, 2, 1)
+    bows, missing, new = report["results"]
+    assert bows["ok"] and new["ok"]
+    assert bows["stages"]["parts"] == len(part_mpos)
+    assert not missing["ok"]
+    assert "part_mpos is required" in missing["error"]
+
+    single = tmp_path / "single.mscz"
+    assert (
+        main(
+            [
+                str(BOWS_DIR / "bows.mscz"),
+                str(single),
+                "--part-mpos",
+                json.dumps(part_mpos),
+                "--show-title",
+                "Skule Nite",
+                "--no-plan-cache",
+            ]
+        )
+        == 0
+    )
+    assert _zip_members(tmp_path / "out" / "bows.mscz") == _zip_members(single)
+
+
+def test_failed_job_does_not_stop_the_rest(tmp_path):
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(
+        json.dumps(
+            [
+                {"input": "nope.mscz", "output": "out/nope.mscz"},
+                {"input": str(NEW_TEST_SCORE), "output": "out/ok.mscz"},
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    results = run_batch(load_manifest(str(manifest), {"apply_part_layout": False}))
+
+    assert [r.ok for r in results] == [False, True]
+    assert results[0].error
+    assert not (tmp_path / "out" / "nope.mscz").exists()
+    assert (tmp_path / "out" / "ok.mscz").is_file()
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import re
 import zipfile
 from pathlib import Path
 
@@ -15,7 +16,10 @@ from mscz_formatter.mscz import (
     resolve_part_mpos,
     unpack_mscz_to_tempdir,
 )
-from mscz_formatter.mscz.styles import add_styles_to_score_and_parts
+from mscz_formatter.mscz import styles
+from mscz_formatter.mscz.inspect import set_style_params
+from mscz_formatter.mscz.spatium import predict_style_params
+from mscz_formatter.mscz.styles import add_styles_to_score_and_parts, render_style_templates
 
 TEST_DATA_DIR = Path(__file__).resolve().parents[1] / "test-data"
 NEW_TEST_SCORE = TEST_DATA_DIR / "New-Test-Score.mscz"
@@ -102,6 +106,28 @@ def test_add_styles_replaces_mss_files():
         assert "<Style>" in part_mss.read_text(encoding="utf-8")
 
 
+def test_style_templates_are_read_and_rendered_once_per_key():
+    styles._template_text.cache_clear()
+    styles._rendered_template.cache_clear()
+    keys = ["score_style.mss"] + [
+        f"Excerpts/{i}_Part/{i}_Part.mss" for i in range(40)
+    ]
+
+    for _ in range(3):
+        rendered = render_style_templates(
+            Style.JAZZ, keys, score_info={"num_staves": 12}, staff_spacing_strategy="predict"
+        )
+
+    assert styles._template_text.cache_info().misses == 2
+    assert styles._rendered_template.cache_info().misses == 2
+    expected_score = set_style_params(
+        styles.JAZZ_SCORE_STYLE_PATH.read_text(encoding="utf-8"),
+        **predict_style_params({"num_staves": 12}),
+    )
+    assert rendered["score_style.mss"] == expected_score.encode("utf-8")
+    assert rendered["Excerpts/7_Part/7_Part.mss"] is rendered["Excerpts/0_Part/0_Part.mss"]
+
+
 def test_get_score_attributes():
     info = get_score_attributes(str(NEW_TEST_SCORE))
     assert info["num_staves"] >= 1
@@ -149,3 +175,169 @@ def test_format_mscz_styles_only(tmp_path):
         score_style = z.read("score_style.mss").decode("utf-8")
         assert "<Style>" in score_style
         assert "DIVISI:staff_spacing" not in score_style
+
+
+BOWS_DIR = TEST_DATA_DIR / "e2e" / "bows"
+
+
+def _bows_part_mpos() -> dict[str, str]:
+    return {
+        p.stem: str(p) for p in sorted(BOWS_DIR.glob("*.mpos")) if p.stem != "bows"
+    }
+
+
+def _zip_members(path: Path) -> dict[str, bytes]:
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def _log_messages(caplog) -> list[str]:
+    # Unpack dirs are fresh temp dirs per run.
+    return [re.sub(r"tmp\w+", "<work>", r.getMessage()) for r in caplog.records]
+
+
+def test_format_mscz_parallel_parts_match_serial_output(tmp_path, caplog):
+    serial = tmp_path / "serial.mscz"
+    parallel = tmp_path / "parallel.mscz"
+    part_mpos = _bows_part_mpos()
+
+    with caplog.at_level("INFO", logger="mscz_formatter"):
+        assert format_mscz(str(BOWS_DIR / "bows.mscz"), str(serial), part_mpos)
+        serial_log = _log_messages(caplog)
+        caplog.clear()
+        assert format_mscz(
+            str(BOWS_DIR / "bows.mscz"), str(parallel), part_mpos, max_workers=4
+        )
+        parallel_log = _log_messages(caplog)
+
+    assert _zip_members(parallel) == _zip_members(serial)
+    assert parallel_log == serial_log
+
+
+def test_format_mscz_parses_each_mscx_once(tmp_path, monkeypatch):
+    from mscz_formatter.xml_backend import ET
+
+    parse = ET.parse
+    parsed: list[object] = []
+
+    def counting_parse(source, *args, **kwargs):
+        if not str(source).endswith(".mpos"):
+            parsed.append(source)
+        return parse(source, *args, **kwargs)
+
+    monkeypatch.setattr(ET, "parse", counting_parse)
+    out = tmp_path / "out.mscz"
+    source = BOWS_DIR / "bows.mscz"
+
+    assert format_mscz(str(source), str(out), _bows_part_mpos())
+
+    with zipfile.ZipFile(source) as z:
+        mscx_members = [n for n in z.namelist() if n.endswith(".mscx")]
+    assert len(parsed) == len(mscx_members)
+
+
+def test_format_mscz_copies_untouched_members_without_recompressing(tmp_path):
+    source = BOWS_DIR / "bows.mscz"
+    out = tmp_path / "out.mscz"
+
+    assert format_mscz(str(source), str(out), _bows_part_mpos())
+
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(out) as dst:
+        assert dst.testzip() is None
+        assert dst.namelist() == src.namelist()
+        thumb_src = src.getinfo("Thumbnails/thumbnail.png")
+        thumb_dst = dst.getinfo("Thumbnails/thumbnail.png")
+        assert thumb_dst.compress_size == thumb_src.compress_size
+        assert thumb_dst.CRC == thumb_src.CRC
+        assert dst.read("Excerpts/0_Reed_1/0_Reed_1.mscx") != src.read(
+            "Excerpts/0_Reed_1/0_Reed_1.mscx"
+        )
+
+
+def test_format_mscz_in_place(tmp_path):
+    target = tmp_path / "in_place.mscz"
+    target.write_bytes((BOWS_DIR / "bows.mscz").read_bytes())
+
+    assert format_mscz(str(target), str(target), _bows_part_mpos())
+
+    with zipfile.ZipFile(target) as z:
+        assert z.testzip() is None
+
+
+def test_format_mscz_reuses_cached_plans_for_unchanged_parts(tmp_path, monkeypatch):
+    from mscz_formatter.mscz import DirectoryPlanCache
+    from mscz_formatter.mscz import format as format_module
+
+    cache = DirectoryPlanCache(str(tmp_path / "plans"))
+    first = tmp_path / "first.mscz"
+    second = tmp_path / "second.mscz"
+    part_mpos = _bows_part_mpos()
+
+    assert format_mscz(
+        str(BOWS_DIR / "bows.mscz"), str(first), part_mpos, plan_cache=cache
+    )
+    # One entry per part content key and one per rendered-feature key.
+    assert len(list((tmp_path / "plans").glob("*.json"))) == 2 * len(part_mpos)
+    assert cache.stats() == {"hits": 0, "misses": 2 * len(part_mpos)}
+
+    def no_planning(*_args, **_kwargs):
+        raise AssertionError("layout was re-planned despite a cached plan")
+
+    monkeypatch.setattr(format_module, "add_line_breaks", no_planning)
+    # Metadata-only change: headers differ, layout plan is still reused.
+    assert format_mscz(
+        str(BOWS_DIR / "bows.mscz"),
+        str(second),
+        part_mpos,
+        {"show_title": "Other Show"},
+        plan_cache=cache,
+    )
+
+    assert cache.hits == len(part_mpos)
+
+    reference = tmp_path / "reference.mscz"
+    monkeypatch.undo()
+    assert format_mscz(
+        str(BOWS_DIR / "bows.mscz"), str(reference), part_mpos, {"show_title": "Other Show"}
+    )
+    assert _zip_members(second) == _zip_members(reference)
+
+
+def test_format_mscz_reports_stage_metrics(tmp_path):
+    from mscz_formatter.mscz import MetricsRecorder
+
+    part_mpos = _bows_part_mpos()
+    serial = MetricsRecorder()
+    seen: list[object] = []
+
+    assert format_mscz(
+        str(BOWS_DIR / "bows.mscz"), str(tmp_path / "serial.mscz"), part_mpos, metrics=serial
+    )
+    assert format_mscz(
+        str(BOWS_DIR / "bows.mscz"),
+        str(tmp_path / "parallel.mscz"),
+        part_mpos,
+        max_workers=2,
+        metrics=seen.append,
+    )
+
+    stages = serial.stages()
+    for name in ("unpack", "styles", "metadata", "layout", "write", "repack", "total"):
+        assert stages[name] >= 0
+    assert stages["parts"] == len(part_mpos)
+    assert stages["output_bytes"] == (tmp_path / "serial.mscz").stat().st_size
+
+    parts = serial.parts()
+    assert set(parts) == set(part_mpos)
+    for values in parts.values():
+        assert {"load", "lines", "pages", "apply"} <= set(values)
+        assert values["mscx_bytes"] > 0
+        assert 0 < values["line_dp_states"] <= values["measure_count"]
+        assert values["page_dp_groups"] > 0
+
+    def counts(metrics):
+        return sorted(
+            (m.part or "", m.name, m.value) for m in metrics if m.kind == "count"
+        )
+
+    assert counts(seen) == counts(serial.metrics)
@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import zipfile
-import xml.etree.ElementTree as ET
 from pathlib import Path
 
 from mscz_formatter.mscz.metadata import (
@@ -14,6 +13,7 @@ from mscz_formatter.mscz.metadata import (
     set_score_properties,
 )
 from mscz_formatter.mscz.format import format_mscz
+from mscz_formatter.xml_backend import ET
 
 TEST_DATA_DIR = Path(__file__).resolve().parents[1] / "test-data"
 NEW_TEST_SCORE = TEST_DATA_DIR / "New-Test-Score.mscz"
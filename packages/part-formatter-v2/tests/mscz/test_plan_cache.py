@@ -0,0 +1,93 @@
+"""Tests for the persistent layout-plan cache."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from mscz_formatter.mscx.plan import PagePlan
+from mscz_formatter.mscz import DirectoryPlanCache, PlanCache
+
+PLAN = (PagePlan(line_breaks=((3,), (7, 9))), PagePlan(line_breaks=(), is_blank_vs=True))
+
+
+def test_round_trip_counts_hits_and_misses(tmp_path):
+    cache = DirectoryPlanCache(str(tmp_path))
+
+    assert cache.get("a") is None
+    cache.put("a", PLAN)
+
+    assert cache.get("a") == PLAN
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = DirectoryPlanCache(str(tmp_path))
+    (tmp_path / "bad.json").write_text("{not json", encoding="utf-8")
+
+    assert cache.get("bad") is None
+    assert cache.misses == 1
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = DirectoryPlanCache(str(tmp_path), max_entries=2)
+    cache.put("old", PLAN)
+    cache.put("used", PLAN)
+    os.utime(tmp_path / "old.json", (1, 1))
+    os.utime(tmp_path / "used.json", (2, 2))
+    assert cache.get("used") == PLAN  # refreshes its recency
+
+    cache.put("new", PLAN)
+
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["new", "used"]
+
+
+def test_evicts_down_to_byte_budget(tmp_path):
+    cache = DirectoryPlanCache(str(tmp_path), max_bytes=1)
+    cache.put("a", PLAN)
+
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_stores_do_not_rescan_the_directory_while_in_bounds(tmp_path, monkeypatch):
+    scandir = os.scandir
+    scans: list[object] = []
+
+    def counting_scandir(path):
+        scans.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    cache = DirectoryPlanCache(str(tmp_path), max_entries=10)
+    for key in "abcdef":
+        cache.put(key, PLAN)
+
+    assert len(scans) == 1  # the first store only
+
+    for key in "ghijk":
+        cache.put(key, PLAN)
+
+    # Past max_entries: rescanned and trimmed back to the bound.
+    assert len(list(tmp_path.glob("*.json"))) == 10
+
+
+def test_unwritable_directory_is_no_cache(tmp_path):
+    blocker = tmp_path / "plans"
+    blocker.write_text("not a directory", encoding="utf-8")
+    cache = DirectoryPlanCache(str(blocker))
+
+    cache.put("a", PLAN)
+
+    assert cache.get("a") is None
+
+
+def test_plan_cache_backends_must_implement_load_and_store():
+    class LoadOnly(PlanCache):
+        def _load(self, key: str) -> str | None:
+            return None
+
+    with pytest.raises(TypeError):
+        PlanCache()
+    with pytest.raises(TypeError):
+        LoadOnly()
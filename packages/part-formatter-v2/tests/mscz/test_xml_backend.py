@@ -0,0 +1,75 @@
+"""Byte-for-byte output compatibility of the XML backends."""
+
+from __future__ import annotations
+
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+
+import pytest
+from mscz_formatter import xml_backend
+from mscz_formatter.xml_backend import STDLIB, from_portable, parse, serialize_document, to_portable
+
+TEST_DATA_DIR = Path(__file__).resolve().parents[1] / "test-data"
+BOWS_MSCZ = TEST_DATA_DIR / "e2e" / "bows" / "bows.mscz"
+SAMPLE_MSCX = sorted((TEST_DATA_DIR / "sample-mscx").glob("*.mscx"))
+
+
+def _mscx_sources() -> list[tuple[str, bytes]]:
+    with zipfile.ZipFile(BOWS_MSCZ) as z:
+        sources = [(n, z.read(n)) for n in z.namelist() if n.endswith(".mscx")]
+    return sources + [(p.name, p.read_bytes()) for p in SAMPLE_MSCX]
+
+
+def _edit(etree, tree) -> None:
+    """Touch the tree the way the formatter does: new elements, attributes, text."""
+    root = tree.getroot()
+    lb = etree.SubElement(root, "LayoutBreak")
+    etree.SubElement(lb, "subtype").text = "page"
+    text = etree.SubElement(root, "Text", {"note": 'tab\there "quoted" <&>'})
+    text.text = "Show & Tell <1>"
+    etree.SubElement(root, "empty")
+    # Metadata writes "" for unset metaTags and header texts.
+    etree.SubElement(root, "metaTag", {"name": "albumTitle"}).text = ""
+
+
+def _serialized(etree, source: bytes, encoding: str) -> bytes:
+    tree = parse(io.BytesIO(source), etree=etree)
+    _edit(etree, tree)
+    etree.indent(tree, space="  ", level=0)
+    return serialize_document(tree, encoding, etree=etree)
+
+
+def test_stdlib_serialization_matches_tree_write():
+    name, source = _mscx_sources()[0]
+    tree = ET.parse(io.BytesIO(source))
+    buffer = io.BytesIO()
+    tree.write(buffer, encoding="UTF-8", xml_declaration=True)
+
+    assert serialize_document(tree, "UTF-8", etree=STDLIB) == buffer.getvalue(), name
+
+
+def test_portable_tree_round_trips():
+    _name, source = _mscx_sources()[0]
+    tree = parse(io.BytesIO(source))
+
+    restored = from_portable(to_portable(tree))
+
+    assert serialize_document(restored) == serialize_document(tree)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "UTF-8"])
+def test_lxml_output_is_byte_identical_to_stdlib(encoding):
+    lxml_etree = pytest.importorskip("lxml.etree")
+
+    for name, source in _mscx_sources():
+        assert _serialized(lxml_etree, source, encoding) == _serialized(
+            STDLIB, source, encoding
+        ), name
+
+
+def test_default_backend_is_stdlib(monkeypatch):
+    monkeypatch.delenv("MSCZ_XML_BACKEND", raising=False)
+
+    assert xml_backend._select_backend() is STDLIB
@@ -0,0 +1,263 @@
+"""
+Time each formatter stage on the e2e fixtures and on synthetic scale-ups.
+
+Stages per part: ``load`` (parse + .mpos pairing), ``lines`` (line DP),
+``pages`` (page DP) and ``apply`` (write breaks), summed over the parts of a
+fixture, plus one full ``format_mscz`` per fixture. Synthetic cases time the
+same per-part stages on generated N-measure parts, and on many parts at once.
+
+Each stage reports the fastest of ``--repeat`` runs, in seconds. Results are
+written as JSON; with ``--baseline`` the run fails (exit 1) when any stage is
+slower than the stored result by more than ``--threshold`` (relative) and
+``--min-delta`` (absolute seconds, to ignore timer noise).
+
+Example::
+
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --threshold 0.2
+    python benchmark.py --fixtures bows --sizes 1000 --parts 0 --output out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+# Allow running from the fixtures dir without an editable install.
+# .../tests/test-data/e2e/this.py → package root is parents[3]
+_SRC = Path(__file__).resolve().parents[3] / "src"
+if _SRC.is_dir() and str(_SRC) not in sys.path:
+    sys.path.insert(0, str(_SRC))
+
+from mscz_formatter.mscx.apply import apply_layout_to_tree  # noqa: E402
+from mscz_formatter.mscx.lines import add_line_breaks  # noqa: E402
+from mscz_formatter.mscx.load import load_in  # noqa: E402
+from mscz_formatter.mscx.pages import pages_from_lines  # noqa: E402
+from mscz_formatter.mscz import MsczArchive, format_mscz, list_excerpts  # noqa: E402
+from mscz_formatter.xml_backend import BACKEND, parse  # noqa: E402
+
+E2E_DIR = Path(__file__).resolve().parent
+FIXTURES = ("bows", "breathe", "stars", "fight")
+PART_STAGES = ("load", "lines", "pages", "apply")
+
+Results = dict[str, dict[str, float]]
+
+
+def _part_mpos_map(fixture_dir: Path, score_stem: str) -> dict[str, Path]:
+    return {
+        p.stem: p for p in sorted(fixture_dir.glob("*.mpos")) if p.stem != score_stem
+    }
+
+
+def _time_part(mscx_bytes: bytes, mscx_name: str, mpos_path: Path) -> dict[str, float]:
+    """One pass of every per-part stage on a freshly parsed tree."""
+    timings: dict[str, float] = {}
+
+    t0 = time.perf_counter()
+    tree = parse(io.BytesIO(mscx_bytes))
+    data = load_in(mscx_name, str(mpos_path), tree)
+    t1 = time.perf_counter()
+    lines = add_line_breaks(data["rendered_measures"])
+    t2 = time.perf_counter()
+    pages = pages_from_lines(lines)
+    t3 = time.perf_counter()
+    apply_layout_to_tree(data["tree"], pages, data["measures"], mscx_name)
+    t4 = time.perf_counter()
+
+    timings["load"] = t1 - t0
+    timings["lines"] = t2 - t1
+    timings["pages"] = t3 - t2
+    timings["apply"] = t4 - t3
+    return timings
+
+
+def _best_of(repeat: int, run: Callable[[], dict[str, float]]) -> dict[str, float]:
+    best: dict[str, float] = {}
+    for _ in range(repeat):
+        for stage, seconds in run().items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    return best
+
+
+def _sum_parts(parts: list[tuple[bytes, str, Path]]) -> dict[str, float]:
+    totals = dict.fromkeys(PART_STAGES, 0.0)
+    for mscx_bytes, name, mpos_path in parts:
+        for stage, seconds in _time_part(mscx_bytes, name, mpos_path).items():
+            totals[stage] += seconds
+    return totals
+
+
+def bench_fixture(name: str, repeat: int, *, with_format: bool) -> dict[str, float]:
+    fixture_dir = E2E_DIR / name
+    mscz_path = fixture_dir / f"{name}.mscz"
+    part_mpos = _part_mpos_map(fixture_dir, name)
+
+    with MsczArchive(str(mscz_path)) as archive:
+        excerpts = {
+            e.key: e for e in list_excerpts("", archive.names_with_suffix(".mscx"))
+        }
+        parts = [
+            (archive.read(excerpts[key].mscx_path), excerpts[key].mscx_path, mpos)
+            for key, mpos in part_mpos.items()
+            if key in excerpts
+        ]
+
+    result = _best_of(repeat, lambda: _sum_parts(parts))
+
+    if with_format:
+        mpos_args = {key: str(path) for key, path in part_mpos.items()}
+        with tempfile.TemporaryDirectory() as tmp:
+            out = str(Path(tmp) / "out.mscz")
+
+            def run_format() -> dict[str, float]:
+                t0 = time.perf_counter()
+                if not format_mscz(str(mscz_path), out, mpos_args):
+                    raise RuntimeError(f"format_mscz failed for {name}")
+                return {"format_mscz": time.perf_counter() - t0}
+
+            result.update(_best_of(repeat, run_format))
+    return result
+
+
+def _synthetic_mscx(n_measures: int) -> bytes:
+    """
+    One staff of ``n_measures`` bars cycling through the features the planner
+    reacts to: rehearsal marks + double bars, full-bar rests and slurs.
+    """
+    bars: list[str] = []
+    for i in range(n_measures):
+        inner: list[str] = []
+        if i % 16 == 0:
+            inner.append("<RehearsalMark><text>A</text></RehearsalMark>")
+        if i % 7 == 3:
+            inner.append("<Rest><durationType>measure</durationType></Rest>")
+        else:
+            inner.append("<Chord><durationType>whole</durationType></Chord>")
+        if i % 11 == 5:
+            inner.append(
+                '<Spanner type="Slur"><Slur/><next><location>'
+                "<measures>1</measures></location></next></Spanner>"
+            )
+        voice = f"<voice>{''.join(inner)}</voice>"
+        barline = "<BarLine><subtype>double</subtype></BarLine>" if i % 16 == 15 else ""
+        bars.append(f"<Measure>{voice}{barline}</Measure>")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f"<museScore><Score><Staff id=\"1\">{''.join(bars)}</Staff></Score></museScore>"
+    ).encode()
+
+
+def _synthetic_mpos(path: Path, n_measures: int) -> None:
+    elements = "".join(
+        f'<element id="{i}" x="0" y="0" sx="{14000 + (i * 2_311) % 9_000}" '
+        f'sy="{7000 + (i * 1_093) % 5_000}" page="0"/>'
+        for i in range(n_measures)
+    )
+    path.write_text(f"<score><elements>{elements}</elements></score>", encoding="utf-8")
+
+
+def bench_synthetic(n_measures: int, n_parts: int, repeat: int, tmp: Path) -> dict[str, float]:
+    mpos_path = tmp / f"synthetic-{n_measures}.mpos"
+    _synthetic_mpos(mpos_path, n_measures)
+    mscx = _synthetic_mscx(n_measures)
+    parts = [(mscx, f"synthetic-{n_measures}-{i}.mscx", mpos_path) for i in range(n_parts)]
+    return _best_of(repeat, lambda: _sum_parts(parts))
+
+
+def run(args: argparse.Namespace) -> Results:
+    results: Results = {}
+    for name in args.fixtures:
+        print(f"fixture {name} …", file=sys.stderr)
+        results[f"fixture/{name}"] = bench_fixture(
+            name, args.repeat, with_format=not args.skip_format
+        )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        for size in args.sizes:
+            print(f"synthetic {size} measures …", file=sys.stderr)
+            results[f"synthetic/{size}-measures"] = bench_synthetic(
+                size, 1, args.repeat, tmp
+            )
+        if args.parts:
+            print(f"synthetic {args.parts} parts …", file=sys.stderr)
+            results[f"synthetic/{args.parts}-parts"] = bench_synthetic(
+                args.part_measures, args.parts, args.repeat, tmp
+            )
+    return results
+
+
+def find_regressions(
+    results: Results,
+    baseline: Results,
+    *,
+    threshold: float,
+    min_delta: float,
+) -> list[str]:
+    """Human-readable lines for every stage slower than the baseline allows."""
+    regressions: list[str] = []
+    for case, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(case, {}).get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + threshold) and seconds - before > min_delta:
+                regressions.append(
+                    f"{case} {stage}: {seconds:.4f}s vs baseline {before:.4f}s "
+                    f"(+{(seconds / before - 1) * 100 if before else float('inf'):.0f}%)"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--fixtures", nargs="*", default=list(FIXTURES), choices=FIXTURES)
+    parser.add_argument("--sizes", nargs="*", type=int, default=[1000, 5000, 10000])
+    parser.add_argument("--parts", type=int, default=60, help="Synthetic part count (0 = skip)")
+    parser.add_argument("--part-measures", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-format", action="store_true", help="Skip full format_mscz runs")
+    parser.add_argument("--output", type=Path, default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--save-baseline", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-delta", type=float, default=0.005)
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    payload = {
+        "python": platform.python_version(),
+        "xml_backend": BACKEND,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(payload, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    if args.save_baseline:
+        args.save_baseline.write_text(text + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = find_regressions(
+            results, baseline, threshold=args.threshold, min_delta=args.min_delta
+        )
+        if regressions:
+            print("Regressions vs baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())